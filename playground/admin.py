@@ -2,25 +2,105 @@
 # Replace your entire admin.py with this
 
 from django.contrib import admin
+from django.db.models import Count, Q
 from django.utils.html import format_html
+from django.utils.translation import gettext_lazy as _
+from .counters import related_count
+from .facets import facet_counts
 from .models import (
     Field, Subfield, Problem, Researcher, ResearchWork,
     FundingInstitution, ProjectColab, QueryPost, FundingProposal,
     Conversation, Message, Mentor, CoWorker, Collaboration
 )
 
+
+class ForDisplayAdmin(admin.ModelAdmin):
+    """
+    Admin for models whose __str__ follows foreign keys (DisplayQuerySet).
+    Change/delete pages and log entries render str(obj) too, so every page
+    joins str_related; the changelist adds list_select_related on top
+    (Django skips list_select_related once select_related is already set).
+    """
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).for_display()
+        return queryset.select_related(*self.list_select_related)
+
+
+class CachedFacetListFilter(admin.FieldListFilter):
+    """
+    Sidebar filter over a plain column or foreign key, fed by facet_counts
+    instead of a DISTINCT scan. Lists the FACET_CHOICES most common values
+    with their row counts; a foreign key lists only parents that have rows.
+    Usage: list_filter = (('country', CachedFacetListFilter), ...)
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = field_path
+        self.lookup_val = params.get(self.lookup_kwarg)
+        self.attname = field.attname
+        self.facet_model = model
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.lookup_choices = facet_counts.top(model, self.attname)
+        self.labels = self.choice_labels([value for value, count in self.lookup_choices])
+
+    def choice_labels(self, values):
+        """
+        Labels for a foreign key come with the facet build; only parents
+        first counted by a signal since then need one lookup query
+        """
+        if not self.field.is_relation:
+            return {}
+        labels = facet_counts.labels(self.facet_model, self.attname)
+        missing = [value for value in values if value not in labels]
+        if missing:
+            related = self.field.related_model._default_manager.in_bulk(missing)
+            new_labels = {value: str(obj) for value, obj in related.items()}
+            facet_counts.add_labels(self.facet_model, self.attname, new_labels)
+            labels.update(new_labels)
+        return labels
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return bool(self.lookup_choices)
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {
+            f"{i}__c": Count(pk_attname, filter=Q((self.lookup_kwarg, value)))
+            for i, (value, count) in enumerate(self.lookup_choices)
+        }
+
+    def choices(self, changelist):
+        add_facets = changelist.add_facets
+        facet_queryset = self.get_facet_queryset(changelist) if add_facets else None
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+            'display': _('All'),
+        }
+        for i, (value, count) in enumerate(self.lookup_choices):
+            if value is None:
+                continue
+            if add_facets:
+                # ?_facets=1 asks for counts within the current filters
+                count = facet_queryset[f"{i}__c"]
+            yield {
+                'selected': self.lookup_val is not None and str(value) in self.lookup_val,
+                'query_string': changelist.get_query_string({self.lookup_kwarg: value}),
+                'display': '%s (%s)' % (self.labels.get(value, value), count),
+            }
+
+
 # ============================================================================
 # FIELD ADMIN
 # ============================================================================
 @admin.register(Field)
 class FieldAdmin(admin.ModelAdmin):
     list_display = ('name', 'domain', 'area', 'field_type', 'subfield_count')
-    list_filter = ('domain', 'field_type')
+    list_filter = (('domain', CachedFacetListFilter), ('field_type', CachedFacetListFilter))
     search_fields = ('name', 'domain', 'area')
-    
-    def subfield_count(self, obj):
-        return obj.subfields.count()
-    subfield_count.short_description = 'Subfields'
 
 
 # ============================================================================
@@ -29,12 +109,9 @@ class FieldAdmin(admin.ModelAdmin):
 @admin.register(Subfield)
 class SubfieldAdmin(admin.ModelAdmin):
     list_display = ('name', 'field', 'field_type', 'domain', 'problem_count')
-    list_filter = ('field', 'field_type')
+    list_filter = (('field', CachedFacetListFilter), ('field_type', CachedFacetListFilter))
     search_fields = ('name', 'field__name')
-    
-    def problem_count(self, obj):
-        return obj.problems.count()
-    problem_count.short_description = 'Problems'
+    autocomplete_fields = ('field',)
 
 
 # ============================================================================
@@ -43,8 +120,11 @@ class SubfieldAdmin(admin.ModelAdmin):
 @admin.register(Problem)
 class ProblemAdmin(admin.ModelAdmin):
     list_display = ('name', 'subfield', 'severity_display', 'funding_reserves', 'has_solution')
-    list_filter = ('severity_color', 'subfield')
+    list_filter = ('severity_color', ('subfield', CachedFacetListFilter))
     search_fields = ('name', 'description')
+    # has_solution follows the reverse one-to-one, so join it too
+    list_select_related = ('subfield', 'solved_by_research')
+    autocomplete_fields = ('subfield',)
     
     def severity_display(self, obj):
         colors = {
@@ -60,6 +140,7 @@ class ProblemAdmin(admin.ModelAdmin):
             obj.get_severity_color_display()
         )
     severity_display.short_description = 'Priority'
+    severity_display.admin_order_field = 'severity_rank'
     
     def has_solution(self, obj):
         return hasattr(obj, 'solved_by_research') and obj.solved_by_research is not None
@@ -72,17 +153,28 @@ class ProblemAdmin(admin.ModelAdmin):
 # ============================================================================
 @admin.register(Researcher)
 class ResearcherAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'institution', 'country', 'total_star', 'expert_count', 'friends_count')
-    list_filter = ('country', 'institution')
+    list_display = ('name', 'email', 'institution', 'country', 'total_star', 'expert_field_count', 'friend_count', 'work_count', 'coauthor_count', 'pagerank')
+    list_filter = (('country', CachedFacetListFilter), ('institution', CachedFacetListFilter))
     search_fields = ('name', 'email', 'institution')
-    filter_horizontal = ('expert_fields', 'friends')
+    # Search-as-you-type widgets that load 20 matches per page on demand,
+    # instead of rendering every Field/Researcher into the change form
+    autocomplete_fields = ('expert_fields', 'friends')
+    readonly_fields = (
+        'total_star', 'peer_rating', 'mentor_review_count', 'peer_review_count',
+        'coauthor_count', 'collaboration_count', 'pagerank', 'network_size',
+    )
     
     fieldsets = (
         ('Basic Info', {
             'fields': ('name', 'email', 'country', 'institution')
         }),
         ('Ratings', {
-            'fields': ('total_star', 'peer_rating')
+            # Derived from the mentor / co-worker reviews (reputation.py)
+            'fields': ('total_star', 'peer_rating', 'mentor_review_count', 'peer_review_count')
+        }),
+        ('Co-authorship', {
+            # From the last `manage.py analyze_coauthorship` run
+            'fields': ('coauthor_count', 'collaboration_count', 'pagerank', 'network_size')
         }),
         ('Profile', {
             'fields': ('interest', 'research_work', 'project', 'cv', 'github')
@@ -91,14 +183,6 @@ class ResearcherAdmin(admin.ModelAdmin):
             'fields': ('expert_fields', 'friends')
         }),
     )
-    
-    def expert_count(self, obj):
-        return obj.expert_fields.count()
-    expert_count.short_description = 'Expert Fields'
-    
-    def friends_count(self, obj):
-        return obj.friends.count()
-    friends_count.short_description = 'Friends'
 
 
 # ============================================================================
@@ -107,9 +191,9 @@ class ResearcherAdmin(admin.ModelAdmin):
 @admin.register(ResearchWork)
 class ResearchWorkAdmin(admin.ModelAdmin):
     list_display = ('title', 'author_name', 'status', 'citation', 'vacancy_status', 'researcher_count')
-    list_filter = ('status', 'vacancy_status', 'subfield')
+    list_filter = ('status', 'vacancy_status', ('subfield', CachedFacetListFilter))
     search_fields = ('title', 'author_name', 'name')
-    filter_horizontal = ('researchers',)
+    autocomplete_fields = ('researchers', 'subfield', 'solves_problem')
     
     fieldsets = (
         ('Basic Info', {
@@ -123,9 +207,15 @@ class ResearchWorkAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _researcher_count=related_count(ResearchWork.researchers.through, 'researchwork'),
+        )
+    
     def researcher_count(self, obj):
-        return obj.researchers.count()
+        return obj._researcher_count
     researcher_count.short_description = 'Researchers'
+    researcher_count.admin_order_field = '_researcher_count'
 
 
 # ============================================================================
@@ -134,12 +224,8 @@ class ResearchWorkAdmin(admin.ModelAdmin):
 @admin.register(FundingInstitution)
 class FundingInstitutionAdmin(admin.ModelAdmin):
     list_display = ('name', 'country', 'amount', 'budget', 'proposal_count')
-    list_filter = ('country',)
+    list_filter = (('country', CachedFacetListFilter),)
     search_fields = ('name', 'country')
-    
-    def proposal_count(self, obj):
-        return obj.proposals.count()
-    proposal_count.short_description = 'Proposals'
 
 
 # ============================================================================
@@ -150,6 +236,7 @@ class ProjectColabAdmin(admin.ModelAdmin):
     list_display = ('project_name', 'posted_by', 'duration', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('project_name', 'title', 'posted_by__name')
+    autocomplete_fields = ('posted_by',)
     
     fieldsets = (
         ('Post Info', {
@@ -169,11 +256,7 @@ class QueryPostAdmin(admin.ModelAdmin):
     list_display = ('title', 'posted_by', 'query_type', 'is_answered', 'feedback_count', 'created_at')
     list_filter = ('query_type', 'is_answered', 'created_at')
     search_fields = ('title', 'content', 'posted_by__name')
-    filter_horizontal = ('feedback_from',)
-    
-    def feedback_count(self, obj):
-        return obj.feedback_from.count()
-    feedback_count.short_description = 'Feedback Count'
+    autocomplete_fields = ('posted_by', 'feedback_from')
 
 
 # ============================================================================
@@ -182,8 +265,9 @@ class QueryPostAdmin(admin.ModelAdmin):
 @admin.register(FundingProposal)
 class FundingProposalAdmin(admin.ModelAdmin):
     list_display = ('title', 'posted_by', 'funding_institution', 'requested_amount', 'proposal_status', 'created_at')
-    list_filter = ('proposal_status', 'funding_institution', 'created_at')
+    list_filter = ('proposal_status', ('funding_institution', CachedFacetListFilter), 'created_at')
     search_fields = ('title', 'posted_by__name')
+    autocomplete_fields = ('posted_by', 'funding_institution', 'research_work')
     
     fieldsets = (
         ('Post Info', {
@@ -202,25 +286,19 @@ class FundingProposalAdmin(admin.ModelAdmin):
 class ConversationAdmin(admin.ModelAdmin):
     list_display = ('conversation_id', 'title', 'participant_count', 'message_count', 'updated_at')
     search_fields = ('title',)
-    filter_horizontal = ('participants',)
-    
-    def participant_count(self, obj):
-        return obj.participants.count()
-    participant_count.short_description = 'Participants'
-    
-    def message_count(self, obj):
-        return obj.messages.count()
-    message_count.short_description = 'Messages'
+    autocomplete_fields = ('participants',)
 
 
 # ============================================================================
 # MESSAGE ADMIN
 # ============================================================================
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
+class MessageAdmin(ForDisplayAdmin):
     list_display = ('message_id', 'sender', 'receiver', 'conversation', 'time_date', 'body_preview')
     list_filter = ('time_date',)
     search_fields = ('body', 'sender__name', 'receiver__name')
+    list_select_related = ('sender', 'receiver', 'conversation')
+    autocomplete_fields = ('sender', 'receiver', 'conversation')
     
     def body_preview(self, obj):
         return obj.body[:50] + '...' if len(obj.body) > 50 else obj.body
@@ -231,10 +309,12 @@ class MessageAdmin(admin.ModelAdmin):
 # MENTOR ADMIN
 # ============================================================================
 @admin.register(Mentor)
-class MentorAdmin(admin.ModelAdmin):
+class MentorAdmin(ForDisplayAdmin):
     list_display = ('researcher', 'research_work', 'rating', 'punctual_score', 'consistency', 'hard_working', 'created_at')
-    list_filter = ('rating', 'created_at')
+    list_filter = (('rating', CachedFacetListFilter), 'created_at')
     search_fields = ('researcher__name', 'research_work__title', 'content')
+    list_select_related = ('researcher', 'research_work')
+    autocomplete_fields = ('researcher', 'research_work')
     
     fieldsets = (
         ('Comment Info', {
@@ -250,10 +330,12 @@ class MentorAdmin(admin.ModelAdmin):
 # CO-WORKER ADMIN
 # ============================================================================
 @admin.register(CoWorker)
-class CoWorkerAdmin(admin.ModelAdmin):
+class CoWorkerAdmin(ForDisplayAdmin):
     list_display = ('researcher', 'research_work', 'rating', 'hard_working', 'created_at')
-    list_filter = ('rating', 'created_at')
+    list_filter = (('rating', CachedFacetListFilter), 'created_at')
     search_fields = ('researcher__name', 'research_work__title', 'content', 'strength')
+    list_select_related = ('researcher', 'research_work')
+    autocomplete_fields = ('researcher', 'research_work')
     
     fieldsets = (
         ('Comment Info', {
@@ -269,10 +351,12 @@ class CoWorkerAdmin(admin.ModelAdmin):
 # COLLABORATION ADMIN (Ternary Relationship)
 # ============================================================================
 @admin.register(Collaboration)
-class CollaborationAdmin(admin.ModelAdmin):
+class CollaborationAdmin(ForDisplayAdmin):
     list_display = ('researcher', 'funding_institution', 'research_work', 'contribution_amount', 'start_date', 'end_date')
-    list_filter = ('start_date', 'funding_institution')
+    list_filter = ('start_date', ('funding_institution', CachedFacetListFilter))
     search_fields = ('researcher__name', 'funding_institution__name', 'research_work__title')
+    list_select_related = ('researcher', 'funding_institution', 'research_work')
+    autocomplete_fields = ('researcher', 'funding_institution', 'research_work')
     
     fieldsets = (
         ('Collaboration Parties', {
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PlaygroundConfig(AppConfig):
     name = 'playground'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registers the receivers
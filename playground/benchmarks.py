@@ -0,0 +1,679 @@
+# benchmarks.py
+# Latency benchmarks for the search and data paths
+#
+# Run with: python manage.py benchmark [name ...] [--scale N]
+# The command builds a throwaway test database, so synthetic rows never
+# touch the real one. Each benchmark seeds its own data at the requested
+# scale and returns rows of (label, timings) for the command to print.
+
+import random
+import statistics
+import time
+
+from django.utils import timezone
+
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork, FundingInstitution,
+    QueryPost, FundingProposal, Conversation, Message,
+)
+
+BENCHMARKS = {}
+
+# Deterministic synthetic names so runs are comparable
+VOCABULARY = [
+    'machine', 'learning', 'database', 'systems', 'quantum', 'computing',
+    'neural', 'networks', 'genomics', 'robotics', 'vision', 'language',
+    'security', 'cryptography', 'graphics', 'optimization', 'statistics',
+    'materials', 'climate', 'energy', 'signal', 'processing', 'control',
+    'theory', 'biology', 'chemistry', 'economics', 'linguistics', 'ethics',
+    'distributed', 'parallel', 'embedded', 'wireless', 'astronomy',
+]
+
+
+def benchmark(name):
+    """Register a benchmark function taking (scale) under `name`"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def measure(func, repeat=30):
+    """Run func() `repeat` times; median / p95 / min wall time in ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'median_ms': statistics.median(timings),
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'min_ms': timings[0],
+    }
+
+
+def synthetic_name(rng, words=2):
+    return ' '.join(rng.choice(VOCABULARY).title() for _ in range(words))
+
+
+def seed_fields(scale, subfields_each=3, seed=370):
+    """`scale` Fields (plus subfields) with unique synthetic names, bulk-inserted"""
+    rng = random.Random(seed)
+    now = timezone.now()
+    fields = []
+    subfields = []
+    for i in range(scale):
+        name = '%s %d' % (synthetic_name(rng), i)
+        fields.append(Field(
+            name=name, domain=synthetic_name(rng, 1), area=synthetic_name(rng),
+            field_type='Applied', created_at=now, updated_at=now,
+        ))
+        for j in range(subfields_each):
+            subfields.append(Subfield(
+                name='%s / %d' % (name, j), field_id=name, domain=synthetic_name(rng, 1),
+                field_type='Applied', created_at=now, updated_at=now,
+            ))
+    Field.objects.bulk_create(fields, batch_size=1000)
+    Subfield.objects.bulk_create(subfields, batch_size=1000)
+    return fields
+
+
+def seed_researchers(scale, seed=370):
+    rng = random.Random(seed)
+    researchers = [
+        Researcher(
+            name='%s %d' % (synthetic_name(rng), i), email='bench%d@example.com' % i,
+            country=rng.choice(['Bangladesh', 'India', 'Japan', 'Germany', 'Canada']),
+            institution='%s Institute' % synthetic_name(rng, 1),
+            interest=synthetic_name(rng, 4),
+        )
+        for i in range(scale)
+    ]
+    Researcher.objects.bulk_create(researchers, batch_size=1000)
+    return researchers
+
+
+def sort_plan(queryset):
+    """'index' if the database reads rows in order, 'FILESORT' if it sorts them"""
+    plan = queryset.explain().upper()
+    # SQLite: "USE TEMP B-TREE FOR ORDER BY"; MySQL: "Using filesort"
+    return 'FILESORT' if 'TEMP B-TREE' in plan or 'FILESORT' in plan else 'index'
+
+
+# ============================================================================
+# FIELD SEARCH: EXACT VS FUZZY FALLBACK
+# ============================================================================
+@benchmark('field_search')
+def field_search_benchmark(scale):
+    from . import trigram
+    from .views import search_page_with_subfields
+
+    seed_fields(scale)
+    seed_researchers(scale)
+    trigram.rebuild('field')
+    trigram.rebuild('researcher')
+
+    exact = measure(lambda: search_page_with_subfields('machine learning'))
+    fuzzy = measure(lambda: search_page_with_subfields('machne lerning'))
+    researcher = measure(lambda: trigram.similar_objects('researcher', 'quantm computng'))
+    return [
+        ('exact match "machine learning"', exact),
+        ('zero hits -> fuzzy "machne lerning"', fuzzy),
+        ('fuzzy fallback added latency', {
+            key: fuzzy[key] - exact[key] for key in exact
+        }),
+        ('researcher fuzzy "quantm computng"', researcher),
+    ]
+
+
+# ============================================================================
+# DEFAULT ORDERINGS AND ADMIN FILTERS
+# ============================================================================
+@benchmark('orderings')
+def orderings_benchmark(scale):
+    """First changelist page (100 rows) of each model's default ordering"""
+    rng = random.Random(370)
+    fields = seed_fields(max(1, scale // 100), subfields_each=1)
+    subfield = Subfield.objects.get(field_id=fields[0].name)
+    seed_researchers(scale)
+    FundingInstitution.objects.bulk_create(
+        FundingInstitution(name='Fund %d' % i, country=rng.choice(['Bangladesh', 'Japan', 'Canada']))
+        for i in range(scale // 10 + 1)
+    )
+    # Re-read rather than trust bulk_create() to set pks (MySQL doesn't)
+    researchers = list(Researcher.objects.order_by('pk'))
+    institutions = list(FundingInstitution.objects.order_by('pk'))
+    severities = ['green', 'yellow', 'orange', 'red']
+    statuses = ['published', 'under_review', 'in_progress', 'draft']
+    Problem.objects.bulk_create((
+        Problem(
+            name='Problem %d' % i, current_proceedings='-', description='-',
+            severity_color=rng.choice(severities), subfield=subfield,
+        )
+        for i in range(scale)
+    ), batch_size=1000)
+    ResearchWork.objects.bulk_create((
+        ResearchWork(
+            title=synthetic_name(rng, 4), author_name='-', publisher='-', name='-',
+            citation=rng.randrange(10000), status=rng.choice(statuses),
+            vacancy_status=rng.random() < 0.1, subfield=subfield,
+        )
+        for _ in range(scale)
+    ), batch_size=1000)
+    QueryPost.objects.bulk_create((
+        QueryPost(title='Query %d' % i, content='-', is_answered=rng.random() < 0.5,
+                  posted_by=rng.choice(researchers))
+        for i in range(scale)
+    ), batch_size=1000)
+    FundingProposal.objects.bulk_create((
+        FundingProposal(title='Proposal %d' % i, content='-', requested_amount=1000,
+                        proposal_status=rng.choice(['pending', 'approved', 'rejected', 'under_review']),
+                        posted_by=rng.choice(researchers), funding_institution=rng.choice(institutions))
+        for i in range(scale)
+    ), batch_size=1000)
+    Conversation.objects.bulk_create(
+        Conversation(title='Chat %d' % i) for i in range(scale // 10 + 1)
+    )
+    conversations = list(Conversation.objects.order_by('pk'))
+    Message.objects.bulk_create((
+        Message(body='-', sender=rng.choice(researchers), receiver=rng.choice(researchers),
+                conversation=rng.choice(conversations))
+        for _ in range(scale)
+    ), batch_size=1000)
+
+    queries = [
+        ('Researcher', Researcher.objects.all()),
+        ('Researcher country=', Researcher.objects.filter(country='Japan')),
+        ('ResearchWork', ResearchWork.objects.all()),
+        ('ResearchWork status=', ResearchWork.objects.filter(status='published')),
+        ('ResearchWork vacancy_status=', ResearchWork.objects.filter(vacancy_status=True)),
+        ('Problem', Problem.objects.all()),
+        ('Problem most critical in subfield=', subfield.problems.most_critical(100)),
+        ('FundingInstitution country=', FundingInstitution.objects.filter(country='Japan')),
+        ('QueryPost is_answered= by -pk', QueryPost.objects.filter(is_answered=False).order_by('-pk')),
+        ('FundingProposal status= by -pk',
+         FundingProposal.objects.filter(proposal_status='pending').order_by('-pk')),
+        ('Conversation', Conversation.objects.all()),
+        ('Message', Message.objects.all()),
+    ]
+    rows = []
+    for label, queryset in queries:
+        page = queryset if queryset.query.is_sliced else queryset[:100]
+        rows.append(('%s [%s]' % (label, sort_plan(page)), measure(lambda: list(page.all()))))
+    return rows
+
+
+# ============================================================================
+# MESSAGE HISTORY: NEWEST PAGE VS DEEP SCROLL-BACK
+# ============================================================================
+@benchmark('message_history')
+def message_history_benchmark(scale):
+    from .messaging import encode_cursor, message_history
+
+    seed_researchers(2)
+    alice, bob = Researcher.objects.order_by('pk')
+    conversation = Conversation.objects.create(title='Long thread')
+    Message.objects.bulk_create((
+        Message(body='message %d' % i, sender=alice, receiver=bob, conversation=conversation)
+        for i in range(scale)
+    ), batch_size=1000)
+
+    ordered = Message.objects.filter(conversation=conversation).order_by('time_date', 'message_id')
+    def cursor_at(position):
+        message = ordered[position]
+        return encode_cursor(message.time_date, message.pk)
+
+    middle = cursor_at(scale // 2)
+    oldest = cursor_at(min(scale - 1, 50))
+    return [
+        ('newest page', measure(lambda: message_history(conversation.pk))),
+        ('page at the middle of the thread', measure(lambda: message_history(conversation.pk, before=middle))),
+        ('oldest page', measure(lambda: message_history(conversation.pk, before=oldest))),
+        ('plan', sort_plan(Message.objects.filter(conversation=conversation).order_by('-time_date', '-message_id')[:51])),
+    ]
+
+
+# ============================================================================
+# LIVE DELIVERY: IDLE SSE CONNECTIONS THROUGH THE ASGI APP
+# ============================================================================
+@benchmark('realtime')
+def realtime_benchmark(scale, participants=50):
+    """
+    Opens `scale` /stream/ connections against storefront.asgi.application
+    (spread over `participants` researchers of one conversation), then
+    creates one Message and times its arrival on every connection.
+    """
+    import asyncio
+    import threading
+
+    from asgiref.sync import sync_to_async
+
+    from .realtime import get_broker
+
+    seed_researchers(participants)
+    researchers = list(Researcher.objects.order_by('pk'))
+    conversation = Conversation.objects.create(title='Load test')
+    conversation.participants.add(*researchers)
+    from storefront.asgi import application
+
+    async def run():
+        connected = 0
+        all_connected = asyncio.Event()
+        arrivals = []
+        all_delivered = asyncio.Event()
+        hang_up = asyncio.Event()
+
+        async def client(researcher_id):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': '/stream/', 'raw_path': b'/stream/',
+                'query_string': b'researcher=%d' % researcher_id, 'root_path': '',
+                'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 0),
+                'server': ('localhost', 80),
+            }
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await hang_up.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(event):
+                nonlocal connected
+                body = event.get('body', b'')
+                if body.startswith(b': connected'):
+                    connected += 1
+                    if connected == scale:
+                        all_connected.set()
+                elif b'event: message' in body:
+                    arrivals.append(time.perf_counter())
+                    if len(arrivals) == scale:
+                        all_delivered.set()
+
+            await application(scope, receive, send)
+
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(client(researchers[i % participants].pk))
+            for i in range(scale)
+        ]
+        await asyncio.wait_for(all_connected.wait(), timeout=600)
+        connect_ms = (time.perf_counter() - start) * 1000
+        threads = threading.active_count()
+        subscribers = get_broker().subscriber_count()
+
+        def send_message():
+            Message.objects.create(
+                body='ping', sender=researchers[0], receiver=researchers[1], conversation=conversation,
+            )
+
+        sent = time.perf_counter()
+        await sync_to_async(send_message)()
+        await asyncio.wait_for(all_delivered.wait(), timeout=600)
+        latencies = sorted((arrival - sent) * 1000 for arrival in arrivals)
+
+        hang_up.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return connect_ms, threads, subscribers, latencies
+
+    connect_ms, threads, subscribers, latencies = asyncio.run(run())
+    return [
+        ('open connections / subscriptions / threads', '%d / %d / %d' % (scale, subscribers, threads)),
+        ('open every connection', {'total_ms': connect_ms, 'per_conn_ms': connect_ms / scale}),
+        ('one message -> every connection', {
+            'median_ms': statistics.median(latencies),
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            'max_ms': latencies[-1],
+        }),
+    ]
+
+
+# ============================================================================
+# BULK IMPORT THROUGHPUT
+# ============================================================================
+@benchmark('bulk_import')
+def bulk_import_benchmark(scale):
+    """
+    `manage.py import_data` throughput: `scale` researchers from a CSV file,
+    two expertise links each, then the researchers file again (all upserts)
+    """
+    import csv
+    import os
+    import tempfile
+
+    from .importer import import_file
+
+    rng = random.Random(370)
+    fields = [field.name for field in seed_fields(50, subfields_each=0)]
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        people = os.path.join(directory, 'researchers.csv')
+        links = os.path.join(directory, 'expertise.csv')
+        with open(people, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['name', 'email', 'country', 'institution', 'interest'])
+            for i in range(scale):
+                writer.writerow([synthetic_name(rng), 'r%d@example.com' % i, 'Bangladesh', 'BUET', synthetic_name(rng, 3)])
+        with open(links, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['researcher', 'field'])
+            for i in range(scale):
+                for field in rng.sample(fields, 2):
+                    writer.writerow(['r%d@example.com' % i, field])
+
+        for label, kind, path in (
+            ('researchers (insert)', 'researcher', people),
+            ('expertise links', 'expert_fields', links),
+            ('researchers (upsert)', 'researcher', people),
+        ):
+            run = import_file(kind, path, restart=True)
+            rows.append((label, {
+                'rows': run.rows,
+                'seconds': time.perf_counter() - run.started,
+                'rows_per_s': run.rate,
+            }))
+    return rows
+
+
+# ============================================================================
+# STREAMING EXPORT: THROUGHPUT AND PEAK MEMORY
+# ============================================================================
+@benchmark('export')
+def export_benchmark(scale):
+    """
+    Full researcher export at `scale` rows, each format plain and gzipped:
+    rows/s, output size and the peak Python memory while streaming (which
+    should track the page size, not the table size).
+    """
+    import tracemalloc
+
+    from .exporter import export_stream
+
+    seed_researchers(scale)
+    rows = []
+    for format in ('csv', 'jsonl'):
+        for compress in (False, True):
+            tracemalloc.start()
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in export_stream('researcher', format, compress=compress))
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rows.append(('%s%s' % (format, ' + gzip' if compress else ''), {
+                'rows_per_s': scale / seconds,
+                'output_mb': size / 1e6,
+                'peak_mem_mb': peak / 1e6,
+            }))
+    return rows
+
+
+# ============================================================================
+# CHANGE FEED
+# ============================================================================
+@benchmark('change_feed')
+def change_feed_benchmark(scale):
+    """
+    A 500-event page of the researcher feed from the start, from halfway
+    and at the head (nothing new), with `scale` rows and scale / 10
+    tombstones. Each page is two index seeks, so depth shouldn't matter.
+    """
+    from datetime import timedelta
+
+    from .changes import changes, encode_cursor
+    from .models import Tombstone
+
+    seed_researchers(scale)
+    # Spread the timestamps over the last days, in random order
+    rng = random.Random(370)
+    start = timezone.now() - timedelta(days=3)
+    pks = list(Researcher.objects.values_list('pk', flat=True))
+    rng.shuffle(pks)
+    step = timedelta(days=2) / max(len(pks), 1)
+    for position in range(0, len(pks), 1000):
+        batch = [Researcher(pk=pk, updated_at=start + step * (position + i)) for i, pk in enumerate(pks[position:position + 1000])]
+        Researcher.objects.bulk_update(batch, ['updated_at'])
+    Tombstone.objects.bulk_create(
+        [Tombstone(kind='researcher', object_pk=str(-i), deleted_at=start + step * i * 10) for i in range(scale // 10)],
+        batch_size=1000,
+    )
+
+    middle = start + step * (len(pks) // 2)
+    from_middle = encode_cursor((middle, 0), (middle, 0))
+    head = changes('researcher', limit=1)[1]
+    while True:
+        events, head, more = changes('researcher', head, limit=5000)
+        if not more:
+            break
+    seek = Researcher.objects.filter(updated_at__gte=middle).order_by('updated_at', 'pk')
+    return [
+        ('first page', measure(lambda: changes('researcher', limit=500))),
+        ('page from halfway', measure(lambda: changes('researcher', from_middle, limit=500))),
+        ('caught up (empty page)', measure(lambda: changes('researcher', head, limit=500))),
+        ('row seek order', sort_plan(seek)),
+    ]
+
+
+# ============================================================================
+# FRIEND GRAPH
+# ============================================================================
+@benchmark('friend_graph')
+def friend_graph_benchmark(scale, degree=20):
+    """
+    `scale` researchers with ~`degree` random friends each: the one-off
+    load, then graph queries against the ORM's query-per-hop equivalent
+    """
+    from .friend_graph import FriendGraph
+
+    seed_researchers(scale)
+    rng = random.Random(370)
+    pks = list(Researcher.objects.values_list('pk', flat=True))
+    through = Researcher.friends.through
+    pairs = set()
+    for _ in range(scale * degree // 2):
+        a, b = rng.sample(pks, 2)
+        pairs.update([(a, b), (b, a)])
+    pairs = list(pairs)
+    for start in range(0, len(pairs), 5000):
+        through.objects.bulk_create(
+            [through(from_researcher_id=a, to_researcher_id=b) for a, b in pairs[start:start + 5000]],
+        )
+
+    graph = FriendGraph()
+    start = time.perf_counter()
+    graph.build()
+    build_seconds = time.perf_counter() - start
+    samples = iter(rng.choices(pks, k=10000))
+
+    def orm_two_hops():
+        pk = next(samples)
+        friends = set(through.objects.filter(from_researcher_id=pk).values_list('to_researcher_id', flat=True))
+        set(through.objects.filter(from_researcher_id__in=friends).values_list('to_researcher_id', flat=True))
+
+    return [
+        ('load %d directed edges' % len(pairs), {'seconds': build_seconds, 'edges_per_s': len(pairs) / build_seconds}),
+        ('friends', measure(lambda: graph.friends(next(samples)))),
+        ('2-hop circle (ORM, 2 queries)', measure(orm_two_hops)),
+        ('2-hop circle', measure(lambda: graph.within(next(samples), 2))),
+        ('3-hop circle', measure(lambda: graph.within(next(samples), 3))),
+        ('mutual friends', measure(lambda: graph.mutual_friends(next(samples), next(samples)))),
+        ('people you may know', measure(lambda: graph.suggestions(next(samples)))),
+        ('shortest path, random pair', measure(lambda: graph.shortest_path(next(samples), next(samples)))),
+    ]
+
+
+# ============================================================================
+# COLLABORATOR RECOMMENDATIONS
+# ============================================================================
+@benchmark('recommend')
+def recommend_benchmark(scale):
+    """
+    `scale` researchers (three expert fields each) against scale / 100
+    open works: building the matrices, scoring every work in one batch,
+    one work on its own, and a cached read
+    """
+    from . import recommend
+
+    rng = random.Random(370)
+    fields = seed_fields(100, subfields_each=1)
+    subfields = list(Subfield.objects.values_list('pk', flat=True))
+    seed_researchers(scale)
+    pks = list(Researcher.objects.values_list('pk', flat=True))
+    Researcher.objects.filter(pk__in=pks[::7]).update(total_star=4.5)
+    through = Researcher.expert_fields.through
+    links = {(pk, rng.choice(fields).name) for pk in pks for _ in range(3)}
+    through.objects.bulk_create([through(researcher_id=pk, field_id=name) for pk, name in links], batch_size=5000)
+    ResearchWork.objects.bulk_create([
+        ResearchWork(
+            title=synthetic_name(rng, 5), author_name='-', publisher='-', name='-',
+            subfield_id=rng.choice(subfields), vacancy_status=True,
+        )
+        for _ in range(max(1, scale // 100))
+    ], batch_size=1000)
+    works = recommend.open_works()
+    work_pks = iter(rng.choices([work[0] for work in works], k=10000))
+
+    start = time.perf_counter()
+    recommend.collaborator_index.build(recommend.collaborator_cache.generation())
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    recommend.collaborator_index.score(works)
+    batch_seconds = time.perf_counter() - start
+
+    recommend.recommend_all()
+    return [
+        ('build researcher matrices', {'seconds': build_seconds}),
+        ('score %d open works in one batch' % len(works), {
+            'seconds': batch_seconds, 'works_per_s': len(works) / batch_seconds,
+        }),
+        ('one work, uncached', measure(
+            lambda: recommend.collaborator_index.score(recommend.open_works([next(work_pks)])), repeat=10,
+        )),
+        ('one work, cached', measure(lambda: recommend.recommend_collaborators(next(work_pks)))),
+    ]
+
+
+# ============================================================================
+# REPUTATION
+# ============================================================================
+@benchmark('reputation')
+def reputation_benchmark(scale):
+    """
+    `scale` reviews (half mentor, half co-worker) over scale / 10
+    researchers: rerating everyone from the review tables, then adding one
+    review through the signals, and the top of the -total_star ranking
+    """
+    from . import reputation
+    from .models import Mentor, CoWorker
+
+    rng = random.Random(370)
+    fields = seed_fields(10, subfields_each=1)
+    subfield = Subfield.objects.filter(field_id=fields[0].name).first()
+    seed_researchers(max(1, scale // 10))
+    researcher_pks = list(Researcher.objects.values_list('pk', flat=True))
+    ResearchWork.objects.bulk_create([
+        ResearchWork(title='Work %d' % i, author_name='-', publisher='-', name='-', subfield=subfield)
+        for i in range(1000)
+    ])
+    work_pks = list(ResearchWork.objects.values_list('pk', flat=True))
+    for start in range(0, scale, 10000):
+        batch = range(start, min(scale, start + 10000))
+        Mentor.objects.bulk_create([
+            Mentor(
+                researcher_id=rng.choice(researcher_pks), research_work_id=rng.choice(work_pks), content='-',
+                rating=rng.randint(1, 5), punctual_score=rng.randint(1, 10),
+                consistency=rng.randint(1, 10), hard_working=rng.randint(1, 10),
+            )
+            for i in batch if i % 2 == 0
+        ])
+        CoWorker.objects.bulk_create([
+            CoWorker(
+                researcher_id=rng.choice(researcher_pks), research_work_id=rng.choice(work_pks), content='-',
+                strength='-', rating=rng.randint(1, 5), hard_working=rng.randint(1, 10),
+            )
+            for i in batch if i % 2 == 1
+        ])
+
+    start = time.perf_counter()
+    reputation.rebuild()
+    rebuild_seconds = time.perf_counter() - start
+
+    def add_review():
+        Mentor.objects.create(
+            researcher_id=rng.choice(researcher_pks), research_work_id=rng.choice(work_pks), content='-',
+            rating=5, punctual_score=10, consistency=10, hard_working=10,
+        )
+
+    top = Researcher.objects.order_by('-total_star', 'name')
+    return [
+        ('rerate %d researchers from %d reviews' % (len(researcher_pks), scale), {
+            'seconds': rebuild_seconds, 'reviews_per_s': scale / rebuild_seconds,
+        }),
+        ('add one review (incremental)', measure(add_review)),
+        ('top 100 by -total_star', measure(lambda: list(top[:100]))),
+        ('ranking order', sort_plan(top[:100])),
+    ]
+
+
+# ============================================================================
+# CO-AUTHORSHIP ANALYTICS
+# ============================================================================
+@benchmark('coauthorship')
+def coauthorship_benchmark(scale):
+    """
+    `scale` authorship links (works of 2-10 authors, skewed towards a core
+    of prolific researchers) over scale / 10 researchers: loading the
+    network and computing every column, storing them, a re-run that
+    changes nothing, and the top of the -pagerank ranking
+    """
+    from . import coauthorship
+
+    rng = random.Random(370)
+    fields = seed_fields(1, subfields_each=1)
+    subfield = Subfield.objects.filter(field_id=fields[0].name).first()
+    seed_researchers(max(10, scale // 10))
+    researcher_pks = list(Researcher.objects.order_by('pk').values_list('pk', flat=True))
+    links, total = [], 0
+    while total < scale:
+        links.append(rng.randint(2, 10))
+        total += links[-1]
+    ResearchWork.objects.bulk_create([
+        ResearchWork(title='Work %d' % i, author_name='-', publisher='-', name='-', subfield=subfield)
+        for i in range(len(links))
+    ], batch_size=1000)
+    work_pks = list(ResearchWork.objects.order_by('pk').values_list('pk', flat=True))
+    Through = ResearchWork.researchers.through
+    rows = []
+    for work_pk, authors in zip(work_pks, links):
+        # Squaring the draw favours the low pks: a few researchers on many works
+        members = {researcher_pks[int(len(researcher_pks) * rng.random() ** 2)] for _ in range(authors)}
+        rows.extend(Through(researchwork_id=work_pk, researcher_id=pk) for pk in members)
+        if len(rows) >= 10000:
+            Through.objects.bulk_create(rows)
+            rows = []
+    Through.objects.bulk_create(rows)
+
+    start = time.perf_counter()
+    analysis = coauthorship.analyze()
+    analyze_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    written = coauthorship.store(analysis)
+    store_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    rewritten = coauthorship.store(coauthorship.analyze())
+    rerun_seconds = time.perf_counter() - start
+
+    top = Researcher.objects.order_by('-pagerank', 'name')
+    return [
+        ('analyze %d researchers, %d co-author pairs' % (len(analysis.pks), analysis.edges), {
+            'seconds': analyze_seconds, 'pairs_per_s': analysis.edges / analyze_seconds,
+            'iterations': analysis.iterations, 'components': analysis.components,
+        }),
+        ('store', {'seconds': store_seconds, 'researchers_written': written}),
+        ('re-run, unchanged graph', {'seconds': rerun_seconds, 'researchers_written': rewritten}),
+        ('top 100 by -pagerank', measure(lambda: list(top[:100]))),
+        ('ranking order', sort_plan(top[:100])),
+    ]
@@ -0,0 +1,111 @@
+# cache.py
+# Versioned result cache for field searches
+#
+# Entries are keyed on (generation, normalized query). Any change to Field
+# or Subfield bumps the generation (see signals.py), so every older entry
+# simply stops being read and ages out through the cache's TTL/size bound.
+# The storage itself is whatever Django cache is configured under
+# settings.SEARCH_CACHE_ALIAS (local-memory or file-based, see settings.py).
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .search import tokenize
+
+
+class VersionedResultCache:
+    """Generation-versioned cache with in-process hit/miss counters"""
+
+    def __init__(self, namespace, alias=None):
+        self.namespace = namespace
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        # Looked up on every call so override_settings() works in tests
+        return caches[self.alias or getattr(settings, 'SEARCH_CACHE_ALIAS', 'default')]
+
+    @property
+    def generation_key(self):
+        return '%s:generation' % self.namespace
+
+    def normalize(self, query):
+        """Word order, case and punctuation don't change search results"""
+        return ' '.join(sorted(set(tokenize(query))))
+
+    def generation(self):
+        return self.counter(self.generation_key)
+
+    def invalidate(self):
+        """Start a new generation; existing entries are never read again"""
+        self.bump(self.generation_key)
+
+    def counter(self, key):
+        """Current value of a generation counter stored under `key`"""
+        generation = self.cache.get(key)
+        if generation is None:
+            # First use, or the counter was culled: start from the clock so
+            # a fresh generation can never collide with one used before
+            self.cache.add(key, int(time.time() * 1000), timeout=None)
+            generation = self.cache.get(key)
+        return generation
+
+    def bump(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # No generation yet - the next read will create one
+            pass
+
+    def make_key(self, query, variant=''):
+        # `variant` separates entries for the same query, e.g. one per page
+        raw = '%s|%s' % (self.normalize(query), variant)
+        digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return '%s:%s:%s' % (self.namespace, self.generation(), digest)
+
+    def get_or_compute(self, query, compute, variant=''):
+        """Return the cached value for `query`, calling compute(query) on a miss"""
+        key = self.make_key(query, variant)
+        value = self.cache.get(key)
+        if value is not None:
+            self._count(hit=True)
+            return value
+
+        self._count(hit=False)
+        value = compute(query)
+        self.cache.set(key, value)  # TTL and size bound come from CACHES
+        return value
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'generation': self.generation(),
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared by the field_search view and the invalidation signals
+field_search_cache = VersionedResultCache('field_search')
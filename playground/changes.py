@@ -0,0 +1,169 @@
+# changes.py
+# "Changes since" feed for incremental downstream sync
+#
+# Every table in FEEDS has an auto_now updated_at and an (updated_at, pk)
+# index, so "rows changed after position P" is an index seek in stable
+# (updated_at, pk) order however large the table is. Deletes leave no row
+# behind, so signals.py records each one as a Tombstone (kind, pk,
+# deleted_at) and the feed merges both into one timeline:
+#
+#     GET /changes/<kind>/?cursor=<cursor>&limit=<n>
+#     -> events: [{op: upsert, pk, at, row}, {op: delete, pk, at}, ...]
+#        cursor: where to continue from; more: whether to call again now
+#
+# A consumer applies the events in order, stores the cursor and polls again.
+#
+# Rows only enter the feed SETTLE_SECONDS after their updated_at: the
+# timestamp is taken when the row is saved, not when its transaction
+# commits, and a cursor that had already moved past a late commit would
+# skip it for good. Keep transactions shorter than that.
+#
+# Not in the feed: counter-cache and pointer columns maintained with
+# QuerySet.update() (they don't bump updated_at - recompute them
+# downstream, or re-export them), the many-to-many link tables (export
+# those whole), and rows removed with raw SQL, which leaves no tombstone.
+
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork, FundingInstitution,
+    ProjectColab, QueryPost, FundingProposal, Conversation, Message,
+    Mentor, CoWorker, Collaboration, Tombstone,
+)
+
+CHANGES_PAGE_SIZE = 500
+MAX_CHANGES_PAGE_SIZE = 5000
+
+# How long after updated_at a row is assumed committed
+SETTLE_SECONDS = 5
+
+# Feed name (the table name) -> model
+FEEDS = {
+    model._meta.db_table: model
+    for model in (
+        Field, Subfield, Problem, Researcher, ResearchWork, FundingInstitution,
+        ProjectColab, QueryPost, FundingProposal, Conversation, Message,
+        Mentor, CoWorker, Collaboration,
+    )
+}
+KIND_BY_MODEL = {model: kind for kind, model in FEEDS.items()}
+
+
+class CursorError(ValueError):
+    """A cursor that wasn't issued by this feed"""
+
+
+# ============================================================================
+# CURSORS
+# ============================================================================
+# A cursor holds two positions: the last row seen, (updated_at, pk), and
+# the last tombstone seen, (deleted_at, tombstone_id). None means "from the
+# start".
+def encode_cursor(rows_after, deletes_after):
+    raw = json.dumps([
+        [moment.isoformat(), pk] if moment is not None else None
+        for moment, pk in (rows_after, deletes_after)
+    ]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(model, cursor):
+    """(rows_after, deletes_after) positions; raises CursorError"""
+    if not cursor:
+        return (None, None), (None, None)
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        rows_after, deletes_after = [
+            (None, None) if position is None else (parse_datetime(position[0]), position[1])
+            for position in positions
+        ]
+        if rows_after[0] is not None:
+            rows_after = rows_after[0], model._meta.pk.to_python(rows_after[1])
+        if deletes_after[0] is not None and not isinstance(deletes_after[1], int):
+            raise ValueError
+    except (ValueError, TypeError, IndexError, KeyError, binascii.Error, UnicodeError, ValidationError):
+        raise CursorError('invalid cursor')
+    for position in (rows_after, deletes_after):
+        if position[1] is not None and position[0] is None:
+            raise CursorError('invalid cursor')
+    return rows_after, deletes_after
+
+
+# ============================================================================
+# FEED
+# ============================================================================
+def changes(kind, cursor=None, limit=CHANGES_PAGE_SIZE, settle=timedelta(seconds=SETTLE_SECONDS)):
+    """
+    Up to `limit` events of one feed after `cursor`, oldest first. Returns
+    (events, next_cursor, more). Raises KeyError for an unknown kind and
+    CursorError for a bad cursor.
+    """
+    model = FEEDS[kind]
+    (row_moment, row_pk), (delete_moment, delete_id) = decode_cursor(model, cursor)
+    horizon = timezone.now() - settle
+
+    columns = [field.attname for field in model._meta.concrete_fields]
+    rows = model._default_manager.filter(updated_at__lt=horizon)
+    if row_moment is not None:
+        rows = rows.filter(Q(updated_at__gte=row_moment), Q(updated_at__gt=row_moment) | Q(pk__gt=row_pk))
+    rows = list(rows.order_by('updated_at', 'pk').values(*columns)[:limit + 1])
+
+    tombstones = Tombstone.objects.filter(kind=kind, deleted_at__lt=horizon)
+    if delete_moment is not None:
+        tombstones = tombstones.filter(
+            Q(deleted_at__gte=delete_moment),
+            Q(deleted_at__gt=delete_moment) | Q(tombstone_id__gt=delete_id),
+        )
+    tombstones = list(tombstones.order_by('deleted_at', 'tombstone_id')[:limit + 1])
+
+    # Merge the two ordered pages into one timeline, then cut it at `limit`
+    pk_name = model._meta.pk.attname
+    timeline = sorted(
+        [(row['updated_at'], 0, position) for position, row in enumerate(rows)]
+        + [(tombstone.deleted_at, 1, position) for position, tombstone in enumerate(tombstones)],
+    )
+    more = len(timeline) > limit
+    events = []
+    for moment, is_delete, position in timeline[:limit]:
+        if is_delete:
+            tombstone = tombstones[position]
+            events.append({'op': 'delete', 'pk': model._meta.pk.to_python(tombstone.object_pk), 'at': moment})
+            delete_moment, delete_id = moment, tombstone.pk
+        else:
+            row = rows[position]
+            events.append({'op': 'upsert', 'pk': row[pk_name], 'at': moment, 'row': row})
+            row_moment, row_pk = moment, row[pk_name]
+    return events, encode_cursor((row_moment, row_pk), (delete_moment, delete_id)), more
+
+
+# ============================================================================
+# TOMBSTONES
+# ============================================================================
+def record_delete(instance):
+    """Tombstone for a deleted row of a feed model (post_delete)"""
+    kind = KIND_BY_MODEL.get(type(instance))
+    if kind is not None:
+        Tombstone.objects.create(kind=kind, object_pk=str(instance.pk))
+
+
+def prune_tombstones(before):
+    """
+    Drop tombstones older than `before`; consumers further behind than that
+    must resync from a full export. Plain SQL, so the rows aren't loaded
+    (and signalled) one by one. Returns the number removed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM %s WHERE deleted_at < %%s' % connection.ops.quote_name(Tombstone._meta.db_table),
+            [Tombstone._meta.get_field('deleted_at').get_db_prep_value(before, connection)],
+        )
+        return cursor.rowcount
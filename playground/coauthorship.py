@@ -0,0 +1,159 @@
+# coauthorship.py
+# Offline analytics of the co-authorship network (ResearchWork.researchers)
+#
+# `manage.py analyze_coauthorship` reads the work <-> researcher through
+# table once into a sparse works x researchers incidence matrix B. The
+# co-authorship matrix is then one sparse product, A = B.T @ B with the
+# diagonal dropped: A[i, j] is how many works i and j wrote together.
+# From A, with vectorized sparse operations only:
+#
+#   coauthor_count       distinct co-authors (non-zeros in the row)
+#   collaboration_count  co-authorships summed over works (the row sum)
+#   pagerank             weighted PageRank by power iteration, scaled so
+#                        the average researcher scores 1.0
+#   network_component    connected component, named by its smallest
+#                        researcher pk (stable from one run to the next)
+#   network_size         researchers in that component
+#
+# The results are written back to the Researcher row - only the rows that
+# changed, with plain UPDATEs - so listings read plain columns, and
+# researcher_pagerank_idx serves the "most influential first" ordering.
+# They are as fresh as the last run; schedule it after bulk imports or
+# nightly.
+
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+from django.db import connection, transaction
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from .counters import REBUILD_BATCH_SIZE
+from .models import Researcher, ResearchWork
+
+DAMPING = 0.85
+# Stop once an iteration moves the ranks less than this in total (L1)
+TOLERANCE = 1e-10
+MAX_ITERATIONS = 200
+
+# Stored values are rounded, so re-runs on an unchanged graph write nothing
+PAGERANK_DIGITS = 6
+
+COLUMNS = ['coauthor_count', 'collaboration_count', 'pagerank', 'network_component', 'network_size']
+
+
+@dataclass
+class NetworkAnalysis:
+    pks: np.ndarray  # researcher pks, the order of every array below
+    coauthor_count: np.ndarray
+    collaboration_count: np.ndarray
+    pagerank: np.ndarray
+    network_component: np.ndarray
+    network_size: np.ndarray
+    edges: int  # co-author pairs, each counted once
+    components: int
+    iterations: int
+
+
+def load_matrix():
+    """
+    (researcher pks, co-authorship matrix) in two queries, one transaction;
+    researchers without works are isolated nodes
+    """
+    with transaction.atomic():
+        pks = np.fromiter(
+            Researcher.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=10000), np.int64,
+        )
+        rows = ResearchWork.researchers.through.objects.order_by().values_list('researchwork_id', 'researcher_id')
+        links = np.fromiter(
+            itertools.chain.from_iterable(rows.iterator(chunk_size=10000)), np.int64,
+        ).reshape(-1, 2)
+    columns = np.searchsorted(pks, links[:, 1])
+    # Drop links to researchers the first read didn't see, rather than
+    # crediting them to a neighbour (or running off the end)
+    known = pks[np.minimum(columns, len(pks) - 1)] == links[:, 1] if len(pks) else np.zeros(len(links), bool)
+    links, columns = links[known], columns[known]
+    works, work_rows = np.unique(links[:, 0], return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(links), np.float64), (work_rows, columns)),
+        shape=(len(works), len(pks)),
+    )
+    matrix = (incidence.T @ incidence).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return pks, matrix
+
+
+def pagerank(matrix, damping=DAMPING, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    (ranks summing to 1, iterations) for a symmetric weighted adjacency
+    matrix. Isolated researchers spread their rank evenly, like the jump.
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return np.zeros(0), 0
+    strength = np.asarray(matrix.sum(axis=1)).ravel()
+    dangling = strength == 0
+    # Column-stochastic transition matrix: each node hands its rank out
+    # in proportion to the weight of each co-authorship
+    inverse = np.zeros(n)
+    inverse[~dangling] = 1 / strength[~dangling]
+    transition = (matrix @ sparse.diags(inverse)).tocsr()
+
+    ranks = np.full(n, 1 / n)
+    for iteration in range(1, max_iterations + 1):
+        spread = damping * ranks[dangling].sum() / n + (1 - damping) / n
+        updated = damping * (transition @ ranks) + spread
+        if np.abs(updated - ranks).sum() < tolerance:
+            return updated, iteration
+        ranks = updated
+    return ranks, max_iterations
+
+
+def analyze(damping=DAMPING):
+    """Compute every column for every researcher; nothing is stored"""
+    pks, matrix = load_matrix()
+    ranks, iterations = pagerank(matrix, damping)
+    components, labels = connected_components(matrix, directed=False)
+    smallest = np.full(components, np.iinfo(np.int64).max)
+    np.minimum.at(smallest, labels, pks)
+    return NetworkAnalysis(
+        pks=pks,
+        coauthor_count=np.diff(matrix.indptr),
+        collaboration_count=np.asarray(matrix.sum(axis=1)).ravel().astype(np.int64),
+        pagerank=np.round(ranks * len(pks), PAGERANK_DIGITS),
+        network_component=smallest[labels],
+        network_size=np.bincount(labels)[labels],
+        edges=matrix.nnz // 2,
+        components=components,
+        iterations=iterations,
+    )
+
+
+def store(analysis, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Write the results to the researchers whose values changed, a
+    transaction per batch; returns how many. Plain SQL: bulk_update's CASE
+    per column grows with the batch, and updated_at stays untouched like
+    the other derived columns.
+    """
+    table = connection.ops.quote_name(Researcher._meta.db_table)
+    assignments = ', '.join('%s = %%s' % connection.ops.quote_name(column) for column in COLUMNS)
+    sql = 'UPDATE %s SET %s WHERE %s = %%s' % (
+        table, assignments, connection.ops.quote_name(Researcher._meta.pk.column),
+    )
+    written = 0
+    for start in range(0, len(analysis.pks), batch_size):
+        batch = slice(start, start + batch_size)
+        fresh = {
+            pk: values
+            for pk, *values in zip(*(getattr(analysis, name)[batch].tolist() for name in ['pks'] + COLUMNS))
+        }
+        stored = Researcher.objects.filter(pk__in=list(fresh)).values_list('pk', *COLUMNS)
+        changed = [fresh[pk] + [pk] for pk, *values in stored if pk in fresh and values != fresh[pk]]
+        if changed:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, changed)
+        written += len(changed)
+    return written
@@ -0,0 +1,232 @@
+# counters.py
+# Denormalized row counts (counter-cache columns)
+#
+# Each counter column holds how many rows of another table point at the
+# row: a Field's subfields, a Researcher's friends, a Conversation's
+# messages, ... so lists and profiles read a column instead of running a
+# COUNT(*) per row. The signals in signals.py keep them current:
+#
+# - foreign-key counters move by +1/-1 with F() expressions when a row is
+#   created, re-pointed or deleted, so concurrent writers never lose an
+#   update;
+# - many-to-many counters are recounted for just the rows an add, remove
+#   or clear touched, inside the relation manager's own transaction
+#   (remove() reports ids whether or not they were linked, so its pk_set
+#   can't be trusted as a -n). The one exception is the far side of a
+#   symmetrical add, see count_m2m_changed().
+#
+# Writes that skip signals (bulk_create, queryset.update, raw SQL) are
+# repaired by `manage.py rebuild_counters`, which can also just --verify.
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork,
+    FundingInstitution, QueryPost, FundingProposal, Conversation, Message,
+)
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def related_count(model, fk):
+    """
+    Correlated COUNT(*) of `model` rows whose `fk` points at the outer row.
+    Annotating one of these per column keeps the whole changelist page in a
+    single query, without the row fan-out of joining several relations.
+    """
+    counts = (
+        model.objects
+        .filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(count=Count('*'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class CounterColumn:
+    """`model.column` = number of `counted` rows whose `fk` is the row's pk"""
+
+    def __init__(self, model, column, counted, fk, symmetrical=False):
+        self.model = model
+        self.column = column
+        self.counted = counted
+        self.fk = fk
+        self.symmetrical = symmetrical
+
+    def __str__(self):
+        return '%s.%s' % (self.model.__name__, self.column)
+
+    @property
+    def fk_attname(self):
+        return self.counted._meta.get_field(self.fk).attname
+
+    def actual(self):
+        return related_count(self.counted, self.fk)
+
+    def bump(self, pk, delta):
+        """Atomic column += delta for one row"""
+        if pk is not None:
+            self.bump_many([pk], delta)
+
+    def bump_many(self, pks, delta):
+        if pks:
+            self.model._default_manager.filter(pk__in=pks).update(**{self.column: F(self.column) + delta})
+
+    def recount(self, pks):
+        """Set the column from a fresh COUNT(*) for the given rows, in one UPDATE"""
+        if pks:
+            self.model._default_manager.filter(pk__in=pks).update(**{self.column: self.actual()})
+
+    def drifted(self, pks):
+        """[(pk, stored, actual), ...] for the given rows whose column is wrong"""
+        rows = (
+            self.model._default_manager.filter(pk__in=pks).order_by()
+            .annotate(_actual=self.actual())
+            .values_list('pk', self.column, '_actual')
+        )
+        return [(pk, stored, actual) for pk, stored, actual in rows if stored != actual]
+
+
+COUNTERS = [
+    CounterColumn(Field, 'subfield_count', Subfield, 'field'),
+    CounterColumn(Subfield, 'problem_count', Problem, 'subfield'),
+    CounterColumn(Researcher, 'friend_count', Researcher.friends.through, 'from_researcher', symmetrical=True),
+    CounterColumn(Researcher, 'expert_field_count', Researcher.expert_fields.through, 'researcher'),
+    CounterColumn(Researcher, 'work_count', ResearchWork.researchers.through, 'researcher'),
+    CounterColumn(FundingInstitution, 'proposal_count', FundingProposal, 'funding_institution'),
+    CounterColumn(QueryPost, 'feedback_count', QueryPost.feedback_from.through, 'querypost'),
+    CounterColumn(Conversation, 'participant_count', Conversation.participants.through, 'conversation'),
+    CounterColumn(Conversation, 'message_count', Message, 'conversation'),
+]
+COUNTERS_BY_NAME = {str(counter): counter for counter in COUNTERS}
+
+
+def counters_for(counted):
+    return [counter for counter in COUNTERS if counter.counted is counted]
+
+
+# ============================================================================
+# FOREIGN-KEY COUNTERS (post_save / post_delete of the counted row)
+# ============================================================================
+def remember_parents(instance):
+    """Before an update: which parents the row pointed at, to move it if re-pointed"""
+    counters = counters_for(type(instance))
+    if counters and not instance._state.adding:
+        instance._counter_parents = (
+            type(instance)._default_manager.filter(pk=instance.pk)
+            .values(*(counter.fk_attname for counter in counters)).first()
+        )
+
+
+def count_saved(instance, created):
+    previous = instance.__dict__.pop('_counter_parents', None)
+    for counter in counters_for(type(instance)):
+        parent = getattr(instance, counter.fk_attname)
+        if created:
+            counter.bump(parent, 1)
+        elif previous is not None and previous[counter.fk_attname] != parent:
+            counter.bump(previous[counter.fk_attname], -1)
+            counter.bump(parent, 1)
+
+
+def count_deleted(instance):
+    for counter in counters_for(type(instance)):
+        counter.bump(getattr(instance, counter.fk_attname), -1)
+
+
+# ============================================================================
+# MANY-TO-MANY COUNTERS (m2m_changed of the through table)
+# ============================================================================
+def through_columns(through, reverse):
+    """(instance side, other side) foreign keys of an auto-created through table"""
+    source, target = [field for field in through._meta.concrete_fields if field.many_to_one]
+    return (target, source) if reverse else (source, target)
+
+
+def count_m2m_changed(through, instance, action, reverse, model, pk_set):
+    counters = counters_for(through)
+    if not counters:
+        return
+    if action == 'pre_clear':
+        # Who is linked now, so their side can be recounted after the clear
+        own, other = through_columns(through, reverse)
+        instance._counter_cleared = set(
+            through._default_manager.filter(**{own.attname: instance.pk})
+            .values_list(other.attname, flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_counter_cleared', set())
+    for counter in counters:
+        own = {instance.pk} if isinstance(instance, counter.model) else set()
+        others = set(pk_set or ()) - own if model is counter.model else set()
+        if action == 'post_add' and counter.symmetrical:
+            # Django inserts the mirror rows (friend -> instance) right after
+            # this signal and sends none for them, so a recount would miss them
+            counter.recount(own)
+            counter.bump_many(others, 1)
+        else:
+            counter.recount(own | others)
+
+
+def remember_linked(instance):
+    """
+    Before a delete: the rows on the far side of counted many-to-many links.
+    The delete cascades to the through rows without m2m_changed, so their
+    counters are recounted once it's done.
+    """
+    linked = {}
+    for counter in COUNTERS:
+        if not counter.counted._meta.auto_created:
+            continue
+        for field in counter.counted._meta.concrete_fields:
+            if field.many_to_one and field.name != counter.fk and field.related_model is type(instance):
+                linked.setdefault(counter, set()).update(
+                    counter.counted._default_manager.filter(**{field.attname: instance.pk})
+                    .values_list(counter.fk_attname, flat=True)
+                )
+    instance._counter_linked = linked
+
+
+def count_unlinked(instance):
+    for counter, pks in instance.__dict__.pop('_counter_linked', {}).items():
+        counter.recount(pks)
+
+
+# ============================================================================
+# REBUILD / VERIFY
+# ============================================================================
+def pk_batches(model, batch_size=REBUILD_BATCH_SIZE):
+    """Every pk of `model` in ascending batches, seeking on pk (no OFFSET)"""
+    last = None
+    while True:
+        queryset = model._default_manager.order_by('pk').values_list('pk', flat=True)
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        pks = list(queryset[:batch_size])
+        if not pks:
+            return
+        yield pks
+        last = pks[-1]
+
+
+def rebuild(counter, batch_size=REBUILD_BATCH_SIZE, fix=True):
+    """
+    Compare stored and actual counts batch by batch; with fix, rewrite the
+    rows that drifted (one transaction per batch). Returns (rows, drifted).
+    """
+    rows = drifted = 0
+    for pks in pk_batches(counter.model, batch_size):
+        with transaction.atomic():
+            wrong = counter.drifted(pks)
+            if fix:
+                counter.recount([pk for pk, stored, actual in wrong])
+        rows += len(pks)
+        drifted += len(wrong)
+    return rows, drifted
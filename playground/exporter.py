@@ -0,0 +1,134 @@
+# exporter.py
+# Streaming CSV / JSONL exports of the research graph
+#
+# Rows are read in primary-key pages ("pk > last ORDER BY pk LIMIT n"),
+# not with one big cursor: MySQL drivers buffer a whole result set on the
+# client, while a keyset page costs the same at row 50M as at row 1. Each
+# page is encoded and handed on before the next is read, so memory stays
+# at one page whatever the table size - through the export view
+# (StreamingHttpResponse) and the `manage.py export_data` command alike.
+#
+# Incremental exports take `since`: only rows whose updated_at is at or
+# after it. The many-to-many link tables have no such column and export
+# whole. (For deletes as well, follow the change feed in changes.py.)
+
+import csv
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import (
+    Researcher, ResearchWork, Problem, QueryPost, Conversation, Message, Collaboration,
+)
+
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = ('csv', 'jsonl')
+
+
+class Export:
+    """One exportable table: every concrete column, in primary-key order"""
+
+    def __init__(self, model, changed_field=None):
+        self.model = model
+        self.changed_field = changed_field
+        self.columns = [field.attname for field in model._meta.concrete_fields]
+        self.pk_index = self.columns.index(model._meta.pk.attname)
+
+    def pages(self, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+        """Lists of row tuples, `chunk_size` at a time, seeking on pk"""
+        rows = self.model._default_manager.order_by('pk')
+        if since is not None:
+            rows = rows.filter(**{'%s__gte' % self.changed_field: since})
+        rows = rows.values_list(*self.columns)
+        last = None
+        while True:
+            page = list((rows if last is None else rows.filter(pk__gt=last))[:chunk_size])
+            if not page:
+                return
+            yield page
+            last = page[-1][self.pk_index]
+
+
+EXPORTS = {
+    'researcher': Export(Researcher, 'updated_at'),
+    'research_work': Export(ResearchWork, 'updated_at'),
+    'problem': Export(Problem, 'updated_at'),
+    'collaboration': Export(Collaboration, 'updated_at'),
+    'message': Export(Message, 'updated_at'),
+    # Many-to-many link tables (ids on both sides)
+    'expert_fields': Export(Researcher.expert_fields.through),
+    'friends': Export(Researcher.friends.through),
+    'work_researchers': Export(ResearchWork.researchers.through),
+    'feedback_from': Export(QueryPost.feedback_from.through),
+    'conversation_participants': Export(Conversation.participants.through),
+}
+
+
+# ============================================================================
+# ENCODING
+# ============================================================================
+def encode_csv(export, pages):
+    """Header line, then one string per page"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export.columns)
+    for page in pages:
+        writer.writerows(page)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode_jsonl(export, pages):
+    """One JSON object per row, one string per page"""
+    for page in pages:
+        yield ''.join(
+            json.dumps(dict(zip(export.columns, row)), cls=DjangoJSONEncoder) + '\n'
+            for row in page
+        )
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of strings into a stream of gzip bytes"""
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(kind, format='csv', since=None, compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Iterator over the encoded export of one table: str chunks, or gzip
+    bytes with `compress`. Raises KeyError / ValueError for an unknown kind
+    or format, or a `since` the table can't filter on.
+    """
+    export = EXPORTS[kind]
+    if format not in FORMATS:
+        raise ValueError('format must be one of %s' % ', '.join(FORMATS))
+    if since is not None and export.changed_field is None:
+        raise ValueError('%s has no change timestamp; export it whole' % kind)
+    encode = encode_csv if format == 'csv' else encode_jsonl
+    chunks = encode(export, export.pages(since, chunk_size))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+async def iterate_in_thread(iterator):
+    """
+    Serve a sync iterator to an async response one chunk at a time.
+    Handed a plain generator, Django's ASGI handler reads it to the end
+    before sending anything.
+    """
+    done = object()
+    step = sync_to_async(next)
+    while True:
+        chunk = await step(iterator, done)
+        if chunk is done:
+            return
+        yield chunk
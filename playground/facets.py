@@ -0,0 +1,126 @@
+# facets.py
+# In-process facet counts for the admin list_filter sidebars
+#
+# Django's default sidebar filters run SELECT DISTINCT over the whole table
+# (or list every parent row for a foreign key) on each changelist load.
+# Here each (model, column) facet is counted once with a single GROUP BY,
+# kept in memory, and adjusted by +1/-1 from the model signals in
+# signals.py as rows are saved or deleted. Writes that skip signals
+# (bulk_create, queryset.update) are picked up by the periodic rebuild.
+
+import threading
+import time
+from collections import Counter
+
+from django.db.models import Count
+
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork, FundingInstitution,
+    FundingProposal, Mentor, CoWorker, Collaboration,
+)
+
+# Rebuild a facet from the database after this many seconds, so counts from
+# signal-less writes or other processes can't drift forever
+FACET_TTL = 300
+
+# The sidebar lists this many values, most common first
+FACET_CHOICES = 30
+
+# Models with a CachedFacetListFilter in admin.py. signals.py only connects
+# the counting receivers for these, so add a model when it gains one.
+FACETS = (
+    Field, Subfield, Problem, Researcher, ResearchWork, FundingInstitution,
+    FundingProposal, Mentor, CoWorker, Collaboration,
+)
+
+
+class FacetCounts:
+    """Per-(model, column) value -> row count, built lazily"""
+
+    def __init__(self):
+        self._counts = {}  # (model, attname) -> Counter
+        self._labels = {}  # (model, attname) -> {value: str(related row)}
+        self._built_at = {}  # (model, attname) -> time.monotonic()
+        self._lock = threading.Lock()
+
+    def build(self, model, attname):
+        """
+        One query per facet. A plain column is a GROUP BY over the table; a
+        foreign key is counted from the referenced side, so the same query
+        yields the rows whose str() labels the sidebar choices.
+        """
+        field = next(f for f in model._meta.concrete_fields if f.attname == attname)
+        labels = {}
+        if field.is_relation:
+            related = (
+                field.related_model._default_manager.order_by()
+                .annotate(facet_count=Count(field.related_query_name()))
+                .filter(facet_count__gt=0)
+            )
+            counts = Counter()
+            for obj in related:
+                counts[obj.pk] = obj.facet_count
+                labels[obj.pk] = str(obj)
+        else:
+            counts = Counter(dict(
+                model._default_manager.order_by()
+                .values_list(attname)
+                .annotate(count=Count('*'))
+                .values_list(attname, 'count')
+            ))
+        with self._lock:
+            self._counts[(model, attname)] = counts
+            self._labels[(model, attname)] = labels
+            self._built_at[(model, attname)] = time.monotonic()
+        return counts
+
+    def counts(self, model, attname):
+        """Counter of value -> rows; only the first call (or a stale one) queries"""
+        key = (model, attname)
+        with self._lock:
+            counts = self._counts.get(key)
+            built_at = self._built_at.get(key, 0)
+        if counts is None or time.monotonic() - built_at > FACET_TTL:
+            counts = self.build(model, attname)
+        return counts
+
+    def top(self, model, attname, limit=FACET_CHOICES):
+        """[(value, count), ...] most common first, ties by value"""
+        counts = self.counts(model, attname)
+        with self._lock:
+            items = list(counts.items())
+        items.sort(key=lambda item: (-item[1], str(item[0])))
+        return items[:limit]
+
+    def labels(self, model, attname):
+        """{value: label} for a foreign-key facet (empty for plain columns)"""
+        with self._lock:
+            return dict(self._labels.get((model, attname), {}))
+
+    def add_labels(self, model, attname, labels):
+        with self._lock:
+            self._labels.setdefault((model, attname), {}).update(labels)
+
+    def tracked(self, model):
+        """Columns of `model` that have been counted, so signals can skip the rest"""
+        with self._lock:
+            return [attname for tracked_model, attname in self._counts if tracked_model is model]
+
+    def adjust(self, model, attname, value, delta):
+        with self._lock:
+            counts = self._counts.get((model, attname))
+            if counts is None:
+                return
+            counts[value] += delta
+            if counts[value] <= 0:
+                del counts[value]
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self._labels.clear()
+            self._built_at.clear()
+
+
+# Shared by the admin filters and the model signals
+facet_counts = FacetCounts()
@@ -0,0 +1,354 @@
+# friend_graph.py
+# In-process friendship graph: k-hop circles, mutual friends, shortest paths
+#
+# Researcher.friends is a symmetrical self-relation, and walking it with the
+# ORM costs a query per hop. Here the whole through table is loaded once
+# into CSR arrays (compressed sparse rows): researchers get dense indexes
+# 0..n-1 in pk order, indices[indptr[i]:indptr[i + 1]] are the sorted
+# friends of researcher i. A breadth-first step over a whole frontier is
+# then a handful of NumPy gathers, and a query never touches the database.
+#
+# The arrays are immutable between rebuilds. Friendships made or broken
+# since are kept in a small overlay (added / removed edges per node) that
+# the traversals merge in; once it grows past COMPACT_AFTER edges the
+# arrays are rebuilt from memory. The m2m_changed and post_delete signals
+# in signals.py feed the overlay once their transaction commits. Writes
+# other processes make, or that skip signals (bulk imports, raw SQL), are
+# picked up by the full rebuild every GRAPH_TTL seconds.
+
+import itertools
+import threading
+import time
+from functools import partial
+
+import numpy as np
+from django.db import transaction
+
+from .models import Researcher
+
+# Seconds before the next query reloads the graph from the database
+GRAPH_TTL = 600
+
+# Overlay edges (counting both directions) before the arrays are rebuilt
+COMPACT_AFTER = 10000
+
+SUGGESTION_LIMIT = 10
+
+# Longest chain of friends a path search will look for
+MAX_SEPARATION = 6
+
+
+class FriendGraph:
+    """CSR adjacency of Researcher.friends plus an overlay of recent changes"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self._built_at = 0
+        self._load(np.empty(0, np.int64), np.empty(0, np.int64))
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+    def _load(self, sources, targets):
+        """Replace the arrays with the (pk, pk) edges given, in both directions"""
+        pks = np.unique(np.concatenate([sources, targets]))
+        n = len(pks)
+        src = np.searchsorted(pks, np.concatenate([sources, targets]))
+        dst = np.searchsorted(pks, np.concatenate([targets, sources]))
+        # One key per directed edge, sorted: by source, then target
+        keys = np.unique(src * max(n, 1) + dst)
+        src, dst = keys // max(n, 1), keys % max(n, 1)
+        indptr = np.zeros(n + 1, np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        with self._lock:
+            self._pks = pks
+            self._indptr = indptr
+            self._indices = dst.astype(np.int64)
+            self._base_size = n
+            # Researchers first seen in the overlay get indexes from n on
+            self._extra_pks = []
+            self._extra_index = {}
+            self._added = {}  # index -> {index}, edges not in the arrays
+            self._removed = {}  # index -> {index}, array edges that are gone
+            self._overlay_edges = 0
+            self._overlay_nodes = None
+
+    def build(self):
+        """(Re)load every friendship in one query"""
+        rows = (
+            Researcher.friends.through.objects.order_by()
+            .values_list('from_researcher_id', 'to_researcher_id')
+        )
+        flat = np.fromiter(itertools.chain.from_iterable(rows.iterator(chunk_size=10000)), np.int64)
+        edges = flat.reshape(-1, 2)
+        self._load(edges[:, 0], edges[:, 1])
+        with self._lock:
+            self.ready = True
+            self._built_at = time.monotonic()
+
+    def ensure_ready(self):
+        if not self.ready or time.monotonic() - self._built_at > GRAPH_TTL:
+            self.build()
+
+    def _compact(self):
+        """Fold the overlay into new arrays, without going to the database"""
+        n = self._node_count()
+        sources = np.repeat(np.arange(self._base_size), np.diff(self._indptr))
+        targets = self._indices
+        if self._removed:
+            gone = np.fromiter(
+                (x * n + y for x, ys in self._removed.items() for y in ys), np.int64,
+            )
+            keep = ~np.isin(sources * n + targets, gone)
+            sources, targets = sources[keep], targets[keep]
+        added = [(x, y) for x, ys in self._added.items() for y in ys]
+        if added:
+            added = np.array(added, np.int64)
+            sources = np.concatenate([sources, added[:, 0]])
+            targets = np.concatenate([targets, added[:, 1]])
+        node_pks = self._node_pks()
+        self._load(node_pks[sources], node_pks[targets])
+
+    # ------------------------------------------------------------------
+    # Indexes
+    # ------------------------------------------------------------------
+    def _node_count(self):
+        return self._base_size + len(self._extra_pks)
+
+    def _node_pks(self):
+        """Researcher pk of every dense index"""
+        if not self._extra_pks:
+            return self._pks
+        return np.concatenate([self._pks, np.array(self._extra_pks, np.int64)])
+
+    def _index(self, pk, create=False):
+        """Dense index of a researcher, None if they have never had a friend"""
+        i = int(np.searchsorted(self._pks, pk))
+        if i < self._base_size and self._pks[i] == pk:
+            return i
+        index = self._extra_index.get(pk)
+        if index is None and create:
+            index = self._node_count()
+            self._extra_pks.append(pk)
+            self._extra_index[pk] = index
+        return index
+
+    # ------------------------------------------------------------------
+    # Traversal
+    # ------------------------------------------------------------------
+    def _expand(self, frontier):
+        """
+        Every edge out of the `frontier` indexes as (sources, targets)
+        arrays: one gather over the CSR rows, plus the overlay of the few
+        frontier nodes that have one.
+        """
+        base = frontier[frontier < self._base_size]
+        starts = self._indptr[base]
+        counts = self._indptr[base + 1] - starts
+        sources = np.repeat(base, counts)
+        # Positions start..end-1 of each row, laid end to end
+        row_starts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        targets = self._indices[np.arange(len(sources)) + row_starts]
+
+        if self._added or self._removed:
+            if self._overlay_nodes is None:
+                self._overlay_nodes = np.fromiter(set(self._added) | set(self._removed), np.int64)
+            extra_sources, extra_targets = [], []
+            for node in frontier[np.isin(frontier, self._overlay_nodes)].tolist():
+                removed = self._removed.get(node)
+                if removed:
+                    gone = (sources == node) & np.isin(targets, list(removed))
+                    sources, targets = sources[~gone], targets[~gone]
+                for friend in self._added.get(node, ()):
+                    extra_sources.append(node)
+                    extra_targets.append(friend)
+            if extra_sources:
+                sources = np.concatenate([sources, np.array(extra_sources, np.int64)])
+                targets = np.concatenate([targets, np.array(extra_targets, np.int64)])
+        return sources, targets
+
+    def _friend_indexes(self, index):
+        return np.unique(self._expand(np.array([index], np.int64))[1])
+
+    def _step(self, frontier, distance, parent, hop):
+        """Label the unvisited neighbours of `frontier` with `hop`; the new frontier"""
+        sources, targets = self._expand(frontier)
+        fresh = distance[targets] < 0
+        targets, first = np.unique(targets[fresh], return_index=True)
+        distance[targets] = hop
+        parent[targets] = sources[fresh][first]
+        return targets
+
+    # ------------------------------------------------------------------
+    # Queries (researcher pks in, researcher pks out)
+    # ------------------------------------------------------------------
+    def friends(self, pk):
+        """Sorted pks of a researcher's friends"""
+        self.ensure_ready()
+        with self._lock:
+            index = self._index(pk)
+            if index is None:
+                return []
+            return self._node_pks()[self._friend_indexes(index)].tolist()
+
+    def within(self, pk, hops=2):
+        """{pk: distance} of everyone 1..`hops` friendships away"""
+        self.ensure_ready()
+        with self._lock:
+            start = self._index(pk)
+            if start is None:
+                return {}
+            n = self._node_count()
+            distance = np.full(n, -1, np.int64)
+            parent = np.full(n, -1, np.int64)
+            distance[start] = 0
+            frontier = np.array([start], np.int64)
+            for hop in range(1, hops + 1):
+                frontier = self._step(frontier, distance, parent, hop)
+                if not len(frontier):
+                    break
+            reached = np.flatnonzero(distance > 0)
+            return dict(zip(self._node_pks()[reached].tolist(), distance[reached].tolist()))
+
+    def mutual_friends(self, pk, other_pk):
+        """Sorted pks of the friends two researchers share"""
+        self.ensure_ready()
+        with self._lock:
+            a, b = self._index(pk), self._index(other_pk)
+            if a is None or b is None:
+                return []
+            shared = np.intersect1d(self._friend_indexes(a), self._friend_indexes(b), assume_unique=True)
+            return self._node_pks()[shared].tolist()
+
+    def suggestions(self, pk, limit=SUGGESTION_LIMIT):
+        """
+        People you may know: [(pk, mutual friends), ...] among friends of
+        friends who aren't friends yet, most mutual friends first
+        """
+        self.ensure_ready()
+        with self._lock:
+            index = self._index(pk)
+            if index is None:
+                return []
+            friends = self._friend_indexes(index)
+            sources, candidates = self._expand(friends)
+            candidates, mutual = np.unique(candidates, return_counts=True)
+            keep = (candidates != index) & ~np.isin(candidates, friends, assume_unique=True)
+            candidates, mutual = candidates[keep], mutual[keep]
+            pks = self._node_pks()[candidates]
+            order = np.lexsort((pks, -mutual))[:limit]
+            return list(zip(pks[order].tolist(), mutual[order].tolist()))
+
+    def shortest_path(self, pk, other_pk, max_hops=MAX_SEPARATION):
+        """
+        [pk, ..., other_pk] along friendships, or None if they're further
+        apart than `max_hops`. Searches from both ends, always growing the
+        smaller frontier, so a 6-hop search only explores ~3 hops each way.
+        """
+        self.ensure_ready()
+        with self._lock:
+            if pk == other_pk:
+                return [pk]
+            a, b = self._index(pk), self._index(other_pk)
+            if a is None or b is None:
+                return None
+            n = self._node_count()
+            sides = []
+            for start in (a, b):
+                distance = np.full(n, -1, np.int64)
+                parent = np.full(n, -1, np.int64)
+                distance[start] = 0
+                sides.append([distance, parent, np.array([start], np.int64), 0])
+
+            while sides[0][3] + sides[1][3] < max_hops:
+                grow = 0 if len(sides[0][2]) <= len(sides[1][2]) else 1
+                side, other = sides[grow], sides[1 - grow]
+                side[3] += 1
+                side[2] = self._step(side[2], side[0], side[1], side[3])
+                if not len(side[2]):
+                    return None
+                met = side[2][other[0][side[2]] >= 0]
+                if len(met):
+                    # Everyone met on this level is side[3] from this end;
+                    # the one closest to the other end is on a shortest path
+                    middle = int(met[np.argmin(other[0][met])])
+                    halves = [self._walk(sides[0][1], middle), self._walk(sides[1][1], middle)]
+                    path = halves[0][::-1] + halves[1][1:]
+                    return self._node_pks()[path].tolist()
+            return None
+
+    def separation(self, pk, other_pk, max_hops=MAX_SEPARATION):
+        """Degrees of separation (1 = friends), None beyond `max_hops`"""
+        path = self.shortest_path(pk, other_pk, max_hops)
+        return None if path is None else len(path) - 1
+
+    @staticmethod
+    def _walk(parent, index):
+        """[index, parent, grandparent, ..., start]"""
+        path = [index]
+        while parent[path[-1]] >= 0:
+            path.append(int(parent[path[-1]]))
+        return path
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+    def _set_edge(self, x, y, present):
+        in_arrays = False
+        if x < self._base_size:
+            row = self._indices[self._indptr[x]:self._indptr[x + 1]]
+            i = np.searchsorted(row, y)
+            in_arrays = bool(i < len(row) and row[i] == y)
+        # An edge is in the overlay only while it differs from the arrays
+        stale, fresh = (self._removed, self._added) if present else (self._added, self._removed)
+        if y in stale.get(x, ()):
+            stale[x].discard(y)
+            if not stale[x]:
+                del stale[x]
+            self._overlay_edges -= 1
+        if in_arrays != present and y not in fresh.get(x, ()):
+            fresh.setdefault(x, set()).add(y)
+            self._overlay_edges += 1
+        self._overlay_nodes = None
+
+    def _update(self, pk, friend_pks, present):
+        if not self.ready:
+            return  # the full build will see it
+        with self._lock:
+            x = self._index(pk, create=present)
+            for friend_pk in friend_pks:
+                y = self._index(friend_pk, create=present)
+                if x is None or y is None or x == y:
+                    continue
+                self._set_edge(x, y, present)
+                self._set_edge(y, x, present)
+            if self._overlay_edges > COMPACT_AFTER:
+                self._compact()
+
+    def link(self, pk, friend_pks):
+        self._update(pk, friend_pks, True)
+
+    def unlink(self, pk, friend_pks):
+        self._update(pk, friend_pks, False)
+
+    def m2m_changed(self, instance, action, pk_set):
+        """Researcher.friends m2m_changed: apply the change once it commits"""
+        if action == 'pre_clear':
+            instance._friend_graph_cleared = self.friends(instance.pk) if self.ready else []
+        elif action == 'post_add':
+            transaction.on_commit(partial(self.link, instance.pk, set(pk_set)))
+        elif action == 'post_remove':
+            transaction.on_commit(partial(self.unlink, instance.pk, set(pk_set)))
+        elif action == 'post_clear':
+            cleared = instance.__dict__.pop('_friend_graph_cleared', [])
+            transaction.on_commit(partial(self.unlink, instance.pk, cleared))
+
+    def researcher_deleted(self, pk):
+        """The delete cascades to the through rows without m2m_changed"""
+        if self.ready:
+            transaction.on_commit(lambda: self.unlink(pk, self.friends(pk)))
+
+
+# Shared by the views and the model signals; built on first use
+friend_graph = FriendGraph()
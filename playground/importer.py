@@ -0,0 +1,389 @@
+# importer.py
+# Bulk loading of the taxonomy, researchers, works and their links
+#
+# `manage.py import_data <kind> <file>` streams a CSV or JSONL file through
+# here in chunks. Each chunk is validated row by row (types and choices by
+# Model.clean_fields, foreign keys by one lookup per chunk), then written
+# with bulk_create - an upsert on the natural key for entities, an insert
+# that ignores existing pairs for many-to-many links - in one transaction
+# together with the file's ImportCheckpoint. A failed run resumes right
+# after the last committed chunk; rejected rows are reported and skipped,
+# including rows the database itself refuses (e.g. a second work solving
+# the same problem).
+#
+# bulk_create sends no signals, so each chunk also does what the signals
+# would have: recount the counter caches of the rows it touched, reindex
+# name trigrams and invalidate the field search cache. Per-process indexes
+# (search suggestions, admin facets) catch up on restart / their TTL.
+#
+# Natural keys: Field, Subfield and Problem by name (their primary key),
+# Researcher by email, ResearchWork by work_id when given (rows without
+# one are always inserted). Conflicts are only ever resolved on that key:
+# where the backend can't name a conflict target (MySQL's ON DUPLICATE KEY
+# matches any unique key), existing keys are updated and new ones inserted
+# separately. Load parents first: field, subfield, problem, researcher,
+# research_work, then the link kinds.
+
+import csv
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from . import counters, trigram
+from .cache import field_search_cache
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork, ImportCheckpoint,
+)
+
+IMPORT_BATCH_SIZE = 2000
+
+
+class RowError(Exception):
+    """A row that can't be imported; reported and skipped"""
+
+
+def read_rows(path, format=None):
+    """
+    (row number, record) for every record of a CSV (with a header row) or
+    JSONL file, streamed. A JSONL line that isn't an object comes back as
+    a RowError in place of the record.
+    """
+    if format is None:
+        format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    with open(path, newline='', encoding='utf-8') as handle:
+        if format == 'csv':
+            yield from enumerate(csv.DictReader(handle), 1)
+            return
+        number = 0
+        for line in handle:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = RowError('invalid JSON: %s' % e)
+            if not isinstance(record, (dict, RowError)):
+                record = RowError('expected a JSON object')
+            yield number, record
+
+
+def validation_message(error):
+    return '; '.join('%s: %s' % (name, ' '.join(messages)) for name, messages in error.message_dict.items())
+
+
+# ============================================================================
+# ENTITIES
+# ============================================================================
+class EntityLoader:
+    """Upserts rows of one model on its natural key"""
+
+    def __init__(self, model, key, foreign_keys=()):
+        self.model = model
+        self.key = key
+        self.foreign_keys = [model._meta.get_field(name) for name in foreign_keys]
+        # Editable columns only: counters, timestamps and generated columns
+        # are never read from the file
+        self.columns = [field for field in model._meta.concrete_fields if field.editable]
+        self.update_fields = [
+            field.name for field in self.columns
+            if not field.primary_key and field.name != key
+        ] + ['updated_at']
+
+    def build(self, row):
+        """Unsaved instance from a row; empty or missing columns take the model default"""
+        values = {}
+        for field in self.columns:
+            value = row.get(field.name)
+            if value is not None and value != '':
+                values[field.attname] = value
+        instance = self.model(**values)
+        try:
+            instance.clean_fields(exclude=[field.name for field in self.foreign_keys])
+        except ValidationError as e:
+            raise RowError(validation_message(e))
+        for field in self.foreign_keys:
+            if getattr(instance, field.attname) is None and not field.null:
+                raise RowError('%s: This field cannot be blank.' % field.name)
+        return instance
+
+    def load(self, rows):
+        """Write one chunk of (number, row); returns (imported, [(number, error), ...])"""
+        errors = []
+        built = []
+        for number, row in rows:
+            try:
+                built.append((number, self.build(row)))
+            except RowError as e:
+                errors.append((number, str(e)))
+
+        # Every parent row the chunk refers to, in one query per foreign key
+        for field in self.foreign_keys:
+            wanted = {getattr(instance, field.attname) for number, instance in built} - {None}
+            known = set(
+                field.related_model._default_manager
+                .filter(pk__in=wanted).values_list('pk', flat=True)
+            )
+            valid = []
+            for number, instance in built:
+                value = getattr(instance, field.attname)
+                if value is None or value in known:
+                    valid.append((number, instance))
+                else:
+                    errors.append((number, '%s: no %s %r' % (field.name, field.related_model._meta.verbose_name, value)))
+            built = valid
+
+        # The same key twice in a chunk: the later row wins
+        keyed = {}
+        fresh = []
+        for number, instance in built:
+            key = getattr(instance, self.key)
+            if key is None:
+                fresh.append((number, instance))
+            else:
+                keyed[key] = (number, instance)
+
+        # Which keys already exist (key -> pk), and the parents they point at
+        # before the upsert, so counter caches are fixed on both sides
+        parents = {counter: set() for counter in counters.counters_for(self.model)}
+        existing = {}
+        if keyed:
+            for previous in (
+                self.model._default_manager.filter(**{'%s__in' % self.key: list(keyed)})
+                .values(self.key, 'pk', *(counter.fk_attname for counter in parents))
+            ):
+                existing[previous[self.key]] = previous['pk']
+                for counter, pks in parents.items():
+                    pks.add(previous[counter.fk_attname])
+        for counter, pks in parents.items():
+            pks.update(getattr(instance, counter.fk_attname) for number, instance in built)
+
+        rejected = self.write(list(keyed.values()), existing, self.upsert)
+        rejected += self.write(fresh, existing, self.insert)
+        errors.extend(rejected)
+
+        for counter, pks in parents.items():
+            counter.recount(pks - {None})
+        rejected_numbers = {number for number, error in rejected}
+        self.reindex([key for key, (number, instance) in keyed.items() if number not in rejected_numbers], existing)
+        if self.model in (Field, Subfield):
+            transaction.on_commit(field_search_cache.invalidate)
+        return len(built) - len(rejected), errors
+
+    def write(self, rows, existing, method):
+        """
+        method(instances, existing) for [(number, instance), ...] in one
+        statement; if the database refuses it, row by row so only the
+        offending rows are skipped. Returns [(number, error), ...].
+        """
+        if not rows:
+            return []
+        try:
+            with transaction.atomic():
+                method([instance for number, instance in rows], existing)
+            return []
+        except IntegrityError:
+            pass
+        errors = []
+        for number, instance in rows:
+            try:
+                with transaction.atomic():
+                    method([instance], existing)
+            except IntegrityError as e:
+                errors.append((number, str(e)))
+        return errors
+
+    def upsert(self, instances, existing):
+        """Insert or update `instances` on the natural key"""
+        manager = self.model._default_manager
+        if connection.features.supports_update_conflicts_with_target:
+            manager.bulk_create(
+                instances, update_conflicts=True, unique_fields=[self.key], update_fields=self.update_fields,
+            )
+            return
+        # No conflict target: update the keys looked up in load(), insert the rest
+        now = timezone.now()
+        updates = []
+        inserts = []
+        for instance in instances:
+            pk = existing.get(getattr(instance, self.key))
+            if pk is None:
+                inserts.append(instance)
+            else:
+                instance.pk = pk
+                instance.updated_at = now  # bulk_update skips auto_now
+                updates.append(instance)
+        if updates:
+            manager.bulk_update(updates, self.update_fields)
+        if inserts:
+            manager.bulk_create(inserts)
+
+    def insert(self, instances, existing):
+        """Plain inserts, for rows without a natural key"""
+        self.model._default_manager.bulk_create(instances)
+
+    def reindex(self, keys, existing):
+        """Name trigrams of the upserted rows, as trigram.index_instance() would"""
+        kind = trigram.KIND_BY_MODEL.get(self.model)
+        if kind is None or not keys:
+            return
+        model, attr = trigram.SOURCES[kind]
+        rows = model._default_manager.filter(**{'%s__in' % self.key: keys}).values_list('pk', self.key, attr)
+        # Only rows that existed before can have trigrams to replace
+        trigram.bulk_index(kind, {pk: name for pk, key, name in rows if key in existing}, replace=True)
+        trigram.bulk_index(kind, {pk: name for pk, key, name in rows if key not in existing}, replace=False)
+
+
+# ============================================================================
+# MANY-TO-MANY LINKS
+# ============================================================================
+class LinkLoader:
+    """
+    Inserts rows of an auto-created through table, ignoring pairs that are
+    already linked. `ends` are (column, model, natural key, through attname).
+    """
+
+    def __init__(self, through, ends, symmetrical=False):
+        self.through = through
+        self.ends = ends
+        self.symmetrical = symmetrical
+
+    def load(self, rows):
+        errors = []
+        parsed = []
+        for number, row in rows:
+            try:
+                values = []
+                for column, model, key, attname in self.ends:
+                    value = row.get(column)
+                    if value is None or value == '':
+                        raise RowError('%s: This field cannot be blank.' % column)
+                    try:
+                        values.append(model._meta.get_field(key).to_python(value))
+                    except ValidationError as e:
+                        raise RowError('%s: %s' % (column, ' '.join(e.messages)))
+                parsed.append((number, values))
+            except RowError as e:
+                errors.append((number, str(e)))
+
+        # Natural key -> pk, one query per end
+        resolved = []
+        for position, (column, model, key, attname) in enumerate(self.ends):
+            wanted = {values[position] for number, values in parsed}
+            resolved.append(dict(
+                model._default_manager.filter(**{'%s__in' % key: wanted}).values_list(key, 'pk')
+            ))
+
+        links = set()
+        imported = 0
+        for number, values in parsed:
+            pks = []
+            for position, (column, model, key, attname) in enumerate(self.ends):
+                pk = resolved[position].get(values[position])
+                if pk is None:
+                    errors.append((number, '%s: no %s %r' % (column, model._meta.verbose_name, values[position])))
+                    break
+                pks.append(pk)
+            else:
+                imported += 1
+                links.add(tuple(pks))
+                if self.symmetrical:
+                    links.add(tuple(reversed(pks)))
+
+        attnames = [attname for column, model, key, attname in self.ends]
+        self.through._default_manager.bulk_create(
+            [self.through(**dict(zip(attnames, pks))) for pks in links],
+            ignore_conflicts=True,
+        )
+        for counter in counters.counters_for(self.through):
+            position = attnames.index(counter.fk_attname)
+            counter.recount({pks[position] for pks in links})
+        return imported, errors
+
+
+LOADERS = {
+    'field': EntityLoader(Field, 'name'),
+    'subfield': EntityLoader(Subfield, 'name', ['field']),
+    'problem': EntityLoader(Problem, 'name', ['subfield']),
+    'researcher': EntityLoader(Researcher, 'email'),
+    'research_work': EntityLoader(ResearchWork, 'work_id', ['subfield', 'solves_problem']),
+    # Researcher expertise: researcher (email), field (name)
+    'expert_fields': LinkLoader(Researcher.expert_fields.through, [
+        ('researcher', Researcher, 'email', 'researcher_id'),
+        ('field', Field, 'name', 'field_id'),
+    ]),
+    # Friendships, stored both ways: researcher (email), friend (email)
+    'friends': LinkLoader(Researcher.friends.through, [
+        ('researcher', Researcher, 'email', 'from_researcher_id'),
+        ('friend', Researcher, 'email', 'to_researcher_id'),
+    ], symmetrical=True),
+    # Authors of a work: work (work_id), researcher (email)
+    'work_researchers': LinkLoader(ResearchWork.researchers.through, [
+        ('work', ResearchWork, 'work_id', 'researchwork_id'),
+        ('researcher', Researcher, 'email', 'researcher_id'),
+    ]),
+}
+
+
+# ============================================================================
+# FILES AND CHECKPOINTS
+# ============================================================================
+class ImportRun:
+    """Running totals of one import_file() call"""
+
+    def __init__(self, resumed_from):
+        self.resumed_from = resumed_from
+        self.rows = 0
+        self.imported = 0
+        self.errors = []  # [(row number, message), ...]
+        self.started = time.perf_counter()
+
+    @property
+    def rate(self):
+        """Rows per second so far"""
+        return self.rows / max(time.perf_counter() - self.started, 1e-9)
+
+
+def import_file(kind, path, format=None, batch_size=IMPORT_BATCH_SIZE, restart=False, on_chunk=None):
+    """
+    Import one file of `kind` rows, resuming after the rows an earlier run
+    committed unless `restart`. on_chunk(run, errors) is called after each
+    chunk commits; raising from it stops the import at that point.
+    """
+    loader = LOADERS[kind]
+    source = '%s:%s' % (kind, os.path.abspath(path))
+    checkpoint, created = ImportCheckpoint.objects.get_or_create(source=source)
+    if restart:
+        checkpoint.rows_done = 0
+        checkpoint.save(update_fields=['rows_done', 'updated_at'])
+    run = ImportRun(resumed_from=checkpoint.rows_done)
+
+    def commit(chunk, last):
+        errors = [(number, str(row)) for number, row in chunk if isinstance(row, RowError)]
+        rows = [(number, row) for number, row in chunk if not isinstance(row, RowError)]
+        with transaction.atomic():
+            imported, rejected = loader.load(rows)
+            ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(rows_done=last)
+        errors.extend(rejected)
+        errors.sort()
+        run.rows += len(chunk)
+        run.imported += imported
+        run.errors.extend(errors)
+        if on_chunk is not None:
+            on_chunk(run, errors)
+
+    chunk = []
+    for number, row in read_rows(path, format):
+        if number <= run.resumed_from:
+            continue
+        chunk.append((number, row))
+        if len(chunk) >= batch_size:
+            commit(chunk, number)
+            chunk = []
+    if chunk:
+        commit(chunk, chunk[-1][0])
+    return run
@@ -0,0 +1,56 @@
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from playground.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Run latency benchmarks against a throwaway test database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help="Benchmarks to run (default: all). Available: %s" % ', '.join(sorted(BENCHMARKS)),
+        )
+        parser.add_argument(
+            '--scale', type=int, default=10000,
+            help="Rows to seed per benchmark (default: 10000)",
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or sorted(BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError("Unknown benchmark(s): %s" % ', '.join(sorted(unknown)))
+
+        # Same isolation as the test runner: a fresh, migrated test database
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for i, name in enumerate(names):
+                if i:
+                    self.reset()
+                self.run_benchmark(name, options['scale'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def reset(self):
+        """
+        Empty every table and cache between benchmarks: each one seeds its
+        own deterministic (and unique) names, and some need their writes
+        committed, so a rolled-back transaction per benchmark won't do
+        """
+        call_command('flush', interactive=False, verbosity=0)
+        for cache in caches.all():
+            cache.clear()
+
+    def run_benchmark(self, name, scale):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{name} (scale={scale})"))
+        for label, timings in BENCHMARKS[name](scale):
+            if isinstance(timings, dict):
+                columns = '  '.join(f"{key}={value:9.3f}" for key, value in timings.items())
+                self.stdout.write(f"  {label:<45} {columns}")
+            else:
+                self.stdout.write(f"  {label:<45} {timings}")
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from playground import exporter
+
+
+class Command(BaseCommand):
+    help = "Stream one table out as CSV or JSONL (optionally gzipped, optionally only rows changed since a time)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(exporter.EXPORTS))
+        parser.add_argument('--format', choices=exporter.FORMATS, default='csv')
+        parser.add_argument('--since', help="ISO datetime: only rows changed at or after it")
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', '-o', default='-', help="File to write (default: stdout)")
+        parser.add_argument('--chunk-size', type=int, default=exporter.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        since = options['since']
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                raise CommandError("--since must be an ISO datetime")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        try:
+            chunks = exporter.export_stream(
+                options['kind'], options['format'], since or None, options['gzip'], options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output'] == '-' and options['gzip']:
+            # Bytes: bypass the text wrapper
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        elif options['output'] == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+        elif options['gzip']:
+            with open(options['output'], 'wb') as handle:
+                handle.writelines(chunks)
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as handle:
+                handle.writelines(chunks)
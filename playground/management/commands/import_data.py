@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from playground import importer
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load fields, subfields, problems, researchers, research works or their "
+        "links from a CSV (with header) or JSONL file. Re-running a file resumes after "
+        "the last committed chunk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(importer.LOADERS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension")
+        parser.add_argument('--batch-size', type=int, default=importer.IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--restart', action='store_true',
+            help="Ignore the checkpoint of an earlier run and start from the first row",
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=1000,
+            help="Stop once this many rows were rejected (the run can be resumed)",
+        )
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        if not os.path.isfile(path):
+            raise CommandError("No such file: %s" % path)
+
+        last_report = time.perf_counter()
+
+        def on_chunk(run, errors):
+            nonlocal last_report
+            for number, message in errors:
+                self.stderr.write(f"row {number}: {message}")
+            if len(run.errors) > options['max_errors']:
+                raise CommandError(
+                    f"Stopped after {len(run.errors)} rejected rows; "
+                    f"fix them and run again to resume after row {run.resumed_from + run.rows}"
+                )
+            if time.perf_counter() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.perf_counter()
+                self.stdout.write(self.summary(kind, run))
+
+        run = importer.import_file(
+            kind, path,
+            format=options['format'],
+            batch_size=options['batch_size'],
+            restart=options['restart'],
+            on_chunk=on_chunk,
+        )
+        if run.resumed_from:
+            self.stdout.write(f"{kind}: resumed after row {run.resumed_from}")
+        self.stdout.write(self.summary(kind, run))
+
+    def summary(self, kind, run):
+        return (
+            f"{kind}: {run.rows} rows read, {run.imported} imported, "
+            f"{len(run.errors)} rejected ({run.rate:.0f} rows/s)"
+        )
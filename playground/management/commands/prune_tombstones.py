@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from playground import changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete change-feed tombstones older than --days. Consumers that last synced "
+        "before then must start over from a full export."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError("--days must not be negative")
+        removed = changes.prune_tombstones(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(f"Removed {removed} tombstones")
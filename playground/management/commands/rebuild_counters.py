@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from playground import counters
+
+
+class Command(BaseCommand):
+    help = "Verify and repair the counter-cache columns (after bulk loads that skip signals)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'names', nargs='*',
+            help="Counters to check: %s (default: all)" % ', '.join(counters.COUNTERS_BY_NAME),
+        )
+        parser.add_argument('--batch-size', type=int, default=counters.REBUILD_BATCH_SIZE)
+        parser.add_argument(
+            '--verify', action='store_true',
+            help="Only report drifted rows; exit with an error if there are any",
+        )
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(counters.COUNTERS_BY_NAME)
+        unknown = set(names) - set(counters.COUNTERS_BY_NAME)
+        if unknown:
+            raise CommandError("Unknown counter(s): %s" % ', '.join(sorted(unknown)))
+
+        total_drifted = 0
+        for name in names:
+            rows, drifted = counters.rebuild(
+                counters.COUNTERS_BY_NAME[name],
+                batch_size=options['batch_size'],
+                fix=not options['verify'],
+            )
+            total_drifted += drifted
+            action = 'drifted' if options['verify'] else 'fixed'
+            self.stdout.write(f"{name}: {rows} rows checked, {drifted} {action}")
+
+        if options['verify'] and total_drifted:
+            raise CommandError(f"{total_drifted} counter value(s) out of date; run without --verify to fix")
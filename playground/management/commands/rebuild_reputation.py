@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from playground import counters, reputation
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every researcher's review aggregates, total_star and peer_rating "
+        "from the mentor and co-worker reviews (after bulk loads that skip signals)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=counters.REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = reputation.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f"Rerated {rows} researchers in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from playground import trigram
+
+
+class Command(BaseCommand):
+    help = "Rebuild the fuzzy-match name trigram index (after bulk loads that skip signals)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*',
+            help="Kinds to rebuild: %s (default: all)" % ', '.join(sorted(trigram.SOURCES)),
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        kinds = options['kinds'] or sorted(trigram.SOURCES)
+        unknown = set(kinds) - set(trigram.SOURCES)
+        if unknown:
+            raise CommandError("Unknown kind(s): %s" % ', '.join(sorted(unknown)))
+
+        for kind in kinds:
+            trigram.rebuild(kind, batch_size=options['batch_size'])
+            count = trigram.NameTrigram.objects.filter(kind=kind).count()
+            self.stdout.write(f"{kind}: {count} trigrams indexed")
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from playground import recommend
+
+
+class Command(BaseCommand):
+    help = (
+        "Score every research work open for collaboration against all researchers "
+        "and store the recommendations in the shared 'recommend' cache (run after "
+        "bulk loads, or to warm it for the web workers)"
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        results = recommend.recommend_all()
+        seconds = time.perf_counter() - start
+        researchers = len(recommend.collaborator_index.pks)
+        self.stdout.write(
+            f"Scored {len(results)} open works against {researchers} researchers in {seconds:.2f}s"
+        )
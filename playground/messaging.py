@@ -0,0 +1,328 @@
+# messaging.py
+# Conversation inbox and message history
+#
+# Each Conversation carries a pointer to its newest Message and that
+# message's time (last_activity_at), moved forward by the Message signals
+# in signals.py. Listing a researcher's conversations newest first is then
+# one query: the participants join, ordered on the indexed
+# (last_activity_at, conversation_id) pair, with the last message and its
+# sender joined in - no per-conversation MAX(time_date).
+#
+# A conversation's history is read the same way, in pages seeking on
+# (conversation, time_date, message_id) in either direction.
+#
+# Both are keyset-paginated, so page 100 costs the same as page 1. Seeks
+# are written "t <= T AND (t < T OR id < ID)" rather than "t < T OR (t = T
+# AND id < ID)": the leading range is what lets the database seek the index.
+#
+# Read state lives in one ReadMarker per (researcher, conversation): the
+# newest message read (the read receipt) and how many arrived since. Every
+# new message bumps its recipients' markers and their Researcher.unread_count
+# total, so a badge is a primary-key read and marking a conversation read
+# rewrites one marker row - Message rows carry no read flags to scan.
+
+import base64
+import binascii
+import json
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Conversation, Message, ReadMarker, Researcher
+
+INBOX_PAGE_SIZE = 20
+MAX_INBOX_PAGE_SIZE = 50
+
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 100
+
+
+# ============================================================================
+# LAST-MESSAGE POINTER
+# ============================================================================
+def record_message(message):
+    """Point the conversation at a newly created message, unless it has a newer one"""
+    (
+        Conversation.objects
+        .filter(pk=message.conversation_id)
+        .filter(Q(last_message__isnull=True) | Q(last_activity_at__lte=message.time_date))
+        .update(
+            last_message=message,
+            last_activity_at=message.time_date,
+            # queryset.update() skips auto_now
+            updated_at=timezone.now(),
+        )
+    )
+
+
+def repoint_last_message(conversation_id):
+    """
+    After a message is deleted. If it was the last one, SET_NULL has already
+    cleared the pointer; move it back to the newest remaining message in the
+    same UPDATE (last_activity_at stays put if none is left).
+    """
+    newest = (
+        Message.objects
+        .filter(conversation_id=OuterRef('pk'))
+        .order_by('-time_date', '-message_id')
+    )
+    (
+        Conversation.objects
+        .filter(pk=conversation_id, last_message__isnull=True)
+        .update(
+            last_message=Subquery(newest.values('message_id')[:1]),
+            last_activity_at=Coalesce(Subquery(newest.values('time_date')[:1]), F('last_activity_at')),
+        )
+    )
+
+
+# ============================================================================
+# KEYSET CURSORS
+# ============================================================================
+def encode_cursor(moment, pk):
+    """Opaque cursor for a (timestamp, pk) position"""
+    raw = json.dumps([moment.isoformat(), pk]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(timestamp, pk) from a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        moment, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        moment = parse_datetime(moment)
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        return None
+    if moment is None or not isinstance(pk, int):
+        return None
+    return moment, pk
+
+
+def clamp_size(size, default, maximum):
+    """Parse a requested page size, capped at `maximum`"""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+# ============================================================================
+# ACCESS
+# ============================================================================
+# Researchers have no login of their own: a signed-in user speaks for the
+# researcher with the same email. Staff may act for anyone.
+def acting_researcher(user):
+    """pk of the researcher a signed-in user is, or None"""
+    if not user.is_authenticated or not user.is_active or not user.email:
+        return None
+    return Researcher.objects.filter(email__iexact=user.email).values_list('pk', flat=True).first()
+
+
+def may_act_as(user, researcher_id):
+    """Whether `user` may read (and mark read) `researcher_id`'s messages"""
+    if user.is_active and user.is_staff:
+        return True
+    return researcher_id is not None and acting_researcher(user) == researcher_id
+
+
+def may_read_conversation(user, conversation_id):
+    """Whether `user` is staff or acts for one of the conversation's participants"""
+    if user.is_active and user.is_staff:
+        return True
+    researcher_id = acting_researcher(user)
+    return researcher_id is not None and (
+        Conversation.participants.through.objects
+        .filter(conversation_id=conversation_id, researcher_id=researcher_id)
+        .exists()
+    )
+
+
+# ============================================================================
+# INBOX
+# ============================================================================
+def inbox(researcher_id, cursor=None, size=INBOX_PAGE_SIZE):
+    """
+    One page of a researcher's conversations, most recently active first,
+    each with last_message (and its sender) loaded and the researcher's
+    `unread` count. Returns
+    (conversations, next_cursor); next_cursor is None on the last page.
+    """
+    unread = ReadMarker.objects.filter(conversation=OuterRef('pk'), researcher_id=researcher_id)
+    conversations = (
+        Conversation.objects
+        .filter(participants=researcher_id)
+        .select_related('last_message__sender')
+        .annotate(unread=Coalesce(Subquery(unread.values('unread_count')[:1]), Value(0)))
+        .order_by('-last_activity_at', '-conversation_id')
+    )
+    after = decode_cursor(cursor)
+    if after is not None:
+        activity, pk = after
+        conversations = conversations.filter(
+            Q(last_activity_at__lte=activity),
+            Q(last_activity_at__lt=activity) | Q(conversation_id__lt=pk),
+        )
+
+    # One extra row tells us whether there is a next page
+    page = list(conversations[:size + 1])
+    next_cursor = None
+    if len(page) > size:
+        next_cursor = encode_cursor(page[size - 1].last_activity_at, page[size - 1].pk)
+    return page[:size], next_cursor
+
+
+# ============================================================================
+# MESSAGE HISTORY
+# ============================================================================
+def message_history(conversation_id, before=None, after=None, size=HISTORY_PAGE_SIZE):
+    """
+    One page of a conversation's messages, oldest first, with senders loaded.
+
+    No cursor: the newest page. before=<older>: the page just before that
+    position; after=<newer>: the page just after it. Returns
+    (messages, older, newer): cursors for the neighbouring pages, None
+    when there is nothing more that way.
+    """
+    messages = Message.objects.filter(conversation_id=conversation_id).select_related('sender')
+    newer_than = decode_cursor(after)
+
+    if newer_than is not None:
+        moment, pk = newer_than
+        page = list(
+            messages
+            .filter(Q(time_date__gte=moment), Q(time_date__gt=moment) | Q(message_id__gt=pk))
+            .order_by('time_date', 'message_id')[:size + 1]
+        )
+        more = len(page) > size
+        page = page[:size]
+        # Came from an older page, so there is something before this one
+        has_older, has_newer = True, more
+    else:
+        older_than = decode_cursor(before)
+        if older_than is not None:
+            moment, pk = older_than
+            messages = messages.filter(Q(time_date__lte=moment), Q(time_date__lt=moment) | Q(message_id__lt=pk))
+        # Walk the index backwards from the newest end, then flip the page
+        page = list(messages.order_by('-time_date', '-message_id')[:size + 1])
+        more = len(page) > size
+        page = page[:size][::-1]
+        has_older, has_newer = more, older_than is not None
+
+    older = encode_cursor(page[0].time_date, page[0].pk) if page and has_older else None
+    newer = encode_cursor(page[-1].time_date, page[-1].pk) if page and has_newer else None
+    return page, older, newer
+
+
+# ============================================================================
+# READ MARKERS / UNREAD COUNTERS
+# ============================================================================
+def message_recipients(message):
+    """Who a message is unread for: the conversation's participants but the sender"""
+    recipients = set(
+        Conversation.participants.through.objects
+        .filter(conversation_id=message.conversation_id)
+        .values_list('researcher_id', flat=True)
+    )
+    recipients.discard(message.sender_id)
+    return recipients
+
+
+def bump_unread(conversation_id, researcher_ids, delta):
+    """Move the markers and the researchers' totals together"""
+    if researcher_ids:
+        (
+            ReadMarker.objects
+            .filter(conversation_id=conversation_id, researcher_id__in=researcher_ids)
+            .update(unread_count=F('unread_count') + delta)
+        )
+        Researcher.objects.filter(pk__in=researcher_ids).update(unread_count=F('unread_count') + delta)
+
+
+def count_unread(message):
+    """A new message is unread for each of its recipients"""
+    recipients = message_recipients(message)
+    # Markers are created on first use (a new participant), counting from
+    # this message on
+    ReadMarker.objects.bulk_create(
+        [
+            ReadMarker(researcher_id=pk, conversation_id=message.conversation_id, counting_since=message.time_date)
+            for pk in recipients
+        ],
+        ignore_conflicts=True,
+    )
+    bump_unread(message.conversation_id, recipients, 1)
+
+
+def uncount_unread(message):
+    """
+    A deleted message stops counting for whoever had not read it yet among
+    its recipients: the markers that were counting when it was sent
+    """
+    unread_by = list(
+        ReadMarker.objects
+        .filter(
+            conversation_id=message.conversation_id, unread_count__gt=0,
+            counting_since__lte=message.time_date,
+        )
+        .filter(Q(last_read_at__isnull=True) | Q(last_read_at__lt=message.time_date))
+        .exclude(researcher_id=message.sender_id)
+        .values_list('researcher_id', flat=True)
+    )
+    bump_unread(message.conversation_id, unread_by, -1)
+
+
+def release_unread(conversation_id):
+    """
+    Before a conversation is deleted: take its unread messages off the
+    researchers' totals and zero its markers, so the cascade that follows
+    (messages, then markers) has nothing left to subtract.
+    """
+    markers = ReadMarker.objects.filter(conversation_id=conversation_id, unread_count__gt=0)
+    unread = markers.filter(researcher=OuterRef('pk')).values('unread_count')[:1]
+    (
+        Researcher.objects
+        .filter(pk__in=markers.values('researcher_id'))
+        .update(unread_count=F('unread_count') - Subquery(unread))
+    )
+    markers.update(unread_count=0)
+
+
+def mark_read(researcher_id, conversation_id):
+    """
+    Mark a conversation read up to its last message. One UPDATE of the
+    marker row (and one of the researcher's total); returns how many
+    messages were unread.
+    """
+    with transaction.atomic():
+        marker = (
+            ReadMarker.objects.select_for_update()
+            .filter(researcher_id=researcher_id, conversation_id=conversation_id)
+            .values_list('pk', 'unread_count')
+            .first()
+        )
+        if marker is None:
+            return 0
+        pk, unread = marker
+        conversation = Conversation.objects.filter(pk=OuterRef('conversation_id')).order_by()
+        ReadMarker.objects.filter(pk=pk).update(
+            unread_count=0,
+            last_read_message=Subquery(conversation.values('last_message')[:1]),
+            last_read_at=Subquery(conversation.values('last_activity_at')[:1]),
+        )
+        if unread:
+            Researcher.objects.filter(pk=researcher_id).update(unread_count=F('unread_count') - unread)
+    return unread
+
+
+def read_receipts(conversation_id):
+    """{researcher_id: id of the newest message they have read, or None}"""
+    return dict(
+        ReadMarker.objects
+        .filter(conversation_id=conversation_id)
+        .values_list('researcher_id', 'last_read_message_id')
+    )
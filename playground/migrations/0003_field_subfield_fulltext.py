@@ -0,0 +1,132 @@
+# Full-text indexes for playground.search
+#
+# MySQL: native FULLTEXT indexes, maintained by InnoDB itself.
+# SQLite: an FTS5 table (search_fts) plus a key table (search_document)
+#         mapping each Field/Subfield row to its FTS rowid, kept in sync by
+#         triggers so saves, deletes and queryset updates are all covered.
+
+from django.db import migrations
+
+
+MYSQL_FORWARD = [
+    "ALTER TABLE field ADD FULLTEXT INDEX field_fulltext (name, domain, area)",
+    "ALTER TABLE subfield ADD FULLTEXT INDEX subfield_fulltext (name, domain, field_type)",
+]
+
+MYSQL_BACKWARD = [
+    "ALTER TABLE subfield DROP INDEX subfield_fulltext",
+    "ALTER TABLE field DROP INDEX field_fulltext",
+]
+
+
+def sqlite_triggers(table, kind, field_name, name, domain, detail):
+    """
+    INSERT/UPDATE/DELETE triggers mirroring one table into search_fts. The
+    UPDATE trigger only fires when the key or an indexed column changes, so
+    counter bumps, updated_at touches and saves of other fields don't
+    re-index the row.
+    """
+    insert = (
+        "INSERT INTO search_document (kind, pk, field_name) "
+        "VALUES ('{kind}', new.name, new.{field_name}); "
+        "INSERT INTO search_fts (rowid, name, domain, detail) "
+        "VALUES (last_insert_rowid(), new.{name}, new.{domain}, new.{detail});"
+    )
+    delete = (
+        "DELETE FROM search_fts WHERE rowid = "
+        "(SELECT doc_id FROM search_document WHERE kind = '{kind}' AND pk = old.name); "
+        "DELETE FROM search_document WHERE kind = '{kind}' AND pk = old.name;"
+    )
+    values = dict(kind=kind, field_name=field_name, name=name, domain=domain, detail=detail)
+    # The pk is `name` for both tables
+    columns = list(dict.fromkeys(['name', field_name, name, domain, detail]))
+    values['columns'] = ', '.join(columns)
+    values['changed'] = ' OR '.join('old.%s IS NOT new.%s' % (column, column) for column in columns)
+    return [
+        ("CREATE TRIGGER {table}_search_ai AFTER INSERT ON {table} BEGIN "
+         + insert + " END").format(table=table, **values),
+        ("CREATE TRIGGER {table}_search_ad AFTER DELETE ON {table} BEGIN "
+         + delete + " END").format(table=table, **values),
+        ("CREATE TRIGGER {table}_search_au AFTER UPDATE OF {columns} ON {table} WHEN {changed} BEGIN "
+         + delete + " " + insert + " END").format(table=table, **values),
+    ]
+
+
+SQLITE_FORWARD = [
+    "CREATE TABLE search_document ("
+    " doc_id INTEGER PRIMARY KEY,"
+    " kind VARCHAR(10) NOT NULL,"
+    " pk VARCHAR(200) NOT NULL,"
+    " field_name VARCHAR(200) NOT NULL,"
+    " UNIQUE (kind, pk))",
+    "CREATE VIRTUAL TABLE search_fts USING fts5(name, domain, detail, tokenize = 'unicode61')",
+    *sqlite_triggers('field', 'field', 'name', 'name', 'domain', 'area'),
+    *sqlite_triggers('subfield', 'subfield', 'field_id', 'name', 'domain', 'field_type'),
+    # Backfill rows that existed before this migration
+    "INSERT INTO search_document (kind, pk, field_name) SELECT 'field', name, name FROM field",
+    "INSERT INTO search_document (kind, pk, field_name) SELECT 'subfield', name, field_id FROM subfield",
+    "INSERT INTO search_fts (rowid, name, domain, detail) "
+    "SELECT d.doc_id, f.name, f.domain, f.area FROM field f "
+    "JOIN search_document d ON d.kind = 'field' AND d.pk = f.name",
+    "INSERT INTO search_fts (rowid, name, domain, detail) "
+    "SELECT d.doc_id, s.name, s.domain, s.field_type FROM subfield s "
+    "JOIN search_document d ON d.kind = 'subfield' AND d.pk = s.name",
+]
+
+SQLITE_BACKWARD = [
+    *("DROP TRIGGER IF EXISTS %s_search_%s" % (table, suffix)
+      for table in ('field', 'subfield') for suffix in ('ai', 'ad', 'au')),
+    "DROP TABLE IF EXISTS search_fts",
+    "DROP TABLE IF EXISTS search_document",
+]
+
+STATEMENTS = {
+    'mysql': (MYSQL_FORWARD, MYSQL_BACKWARD),
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def run_statements(schema_editor, direction):
+    forward_backward = STATEMENTS.get(schema_editor.connection.vendor)
+    if forward_backward is None:
+        # Other databases use the icontains fallback in playground.search
+        return
+    for statement in forward_backward[direction]:
+        schema_editor.execute(statement, params=None)
+
+
+def recreate_sqlite_triggers(schema_editor, *tables):
+    """
+    SQLite drops a table's triggers when Django rebuilds the table to alter
+    it; later migrations that rebuild field or subfield call this afterwards
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    triggers = {
+        'field': sqlite_triggers('field', 'field', 'name', 'name', 'domain', 'area'),
+        'subfield': sqlite_triggers('subfield', 'subfield', 'field_id', 'name', 'domain', 'field_type'),
+    }
+    for table in tables:
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute("DROP TRIGGER IF EXISTS %s_search_%s" % (table, suffix), params=None)
+        for statement in triggers[table]:
+            schema_editor.execute(statement, params=None)
+
+
+def create_search_indexes(apps, schema_editor):
+    run_statements(schema_editor, 0)
+
+
+def drop_search_indexes(apps, schema_editor):
+    run_statements(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0002_fundinginstitution_problem_researcher_friends_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
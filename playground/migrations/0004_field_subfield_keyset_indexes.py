@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-17 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0003_field_subfield_fulltext'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='field',
+            index=models.Index(fields=['domain', 'name'], name='field_domain_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subfield',
+            index=models.Index(fields=['field', 'name'], name='subfield_field_name_idx'),
+        ),
+    ]
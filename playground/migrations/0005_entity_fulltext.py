@@ -0,0 +1,153 @@
+# Extend the full-text index from migration 0003 to every searchable entity
+#
+# MySQL: one FULLTEXT index per table, over the same columns the admin's
+#        search_fields scan.
+# SQLite: the rows join the shared search_fts / search_document index.
+#         search_fts columns are generic: name = title, domain = short
+#         secondary text, detail = long text. field_name is '' for rows
+#         outside the taxonomy.
+
+from django.db import migrations
+
+
+# (table, kind, pk column, name, domain, detail) - '' means no column
+ENTITIES = [
+    ('problem', 'problem', 'name', 'name', '', 'description'),
+    ('research_work', 'research_work', 'work_id', 'title', 'author_name', ''),
+    ('researcher', 'researcher', 'researcher_id', 'name', 'institution', 'interest'),
+    ('project_colab', 'project_colab', 'post_id', 'title', '', 'content'),
+    ('query_post', 'query_post', 'post_id', 'title', '', 'content'),
+    ('funding_proposal', 'funding_proposal', 'post_id', 'title', '', 'content'),
+]
+
+
+def mysql_columns(entity):
+    return ', '.join(name for name in entity[3:] if name)
+
+
+MYSQL_FORWARD = [
+    "ALTER TABLE %s ADD FULLTEXT INDEX %s_fulltext (%s)" % (entity[0], entity[0], mysql_columns(entity))
+    for entity in ENTITIES
+]
+
+MYSQL_BACKWARD = [
+    "ALTER TABLE %s DROP INDEX %s_fulltext" % (entity[0], entity[0])
+    for entity in ENTITIES
+]
+
+
+def column(row, name):
+    return "%s.%s" % (row, name) if name else "''"
+
+
+def key(row, pk):
+    # search_document.pk is text; cast so the (kind, pk) index is usable
+    return "CAST(%s.%s AS TEXT)" % (row, pk)
+
+
+def sqlite_statements(table, kind, pk, name, domain, detail):
+    """
+    Triggers mirroring one table into search_fts, plus its backfill. The
+    UPDATE trigger only fires when the key or an indexed column changes, so
+    counter and rating updates don't re-index the row.
+    """
+    def insert(row):
+        return (
+            "INSERT INTO search_document (kind, pk, field_name) "
+            "VALUES ('{kind}', {pk}, ''); "
+            "INSERT INTO search_fts (rowid, name, domain, detail) "
+            "VALUES (last_insert_rowid(), {name}, {domain}, {detail});"
+        ).format(
+            kind=kind, pk=key(row, pk), name=column(row, name),
+            domain=column(row, domain), detail=column(row, detail),
+        )
+
+    delete = (
+        "DELETE FROM search_fts WHERE rowid = "
+        "(SELECT doc_id FROM search_document WHERE kind = '{kind}' AND pk = {pk}); "
+        "DELETE FROM search_document WHERE kind = '{kind}' AND pk = {pk};"
+    ).format(kind=kind, pk=key('old', pk))
+
+    columns = [pk] + [name for name in (name, domain, detail) if name]
+    changed = ' OR '.join('old.%s IS NOT new.%s' % (column, column) for column in columns)
+
+    return [
+        "CREATE TRIGGER %s_search_ai AFTER INSERT ON %s BEGIN %s END" % (table, table, insert('new')),
+        "CREATE TRIGGER %s_search_ad AFTER DELETE ON %s BEGIN %s END" % (table, table, delete),
+        "CREATE TRIGGER %s_search_au AFTER UPDATE OF %s ON %s WHEN %s BEGIN %s %s END" % (
+            table, ', '.join(columns), table, changed, delete, insert('new'),
+        ),
+        "INSERT INTO search_document (kind, pk, field_name) "
+        "SELECT '%s', %s, '' FROM %s t" % (kind, key('t', pk), table),
+        "INSERT INTO search_fts (rowid, name, domain, detail) "
+        "SELECT d.doc_id, {name}, {domain}, {detail} FROM {table} t "
+        "JOIN search_document d ON d.kind = '{kind}' AND d.pk = {pk}".format(
+            table=table, kind=kind, pk=key('t', pk), name=column('t', name),
+            domain=column('t', domain), detail=column('t', detail),
+        ),
+    ]
+
+
+SQLITE_FORWARD = [
+    statement
+    for entity in ENTITIES
+    for statement in sqlite_statements(*entity)
+]
+
+SQLITE_BACKWARD = [
+    *("DROP TRIGGER IF EXISTS %s_search_%s" % (entity[0], suffix)
+      for entity in ENTITIES for suffix in ('ai', 'ad', 'au')),
+    *("DELETE FROM search_fts WHERE rowid IN "
+      "(SELECT doc_id FROM search_document WHERE kind = '%s')" % entity[1]
+      for entity in ENTITIES),
+    *("DELETE FROM search_document WHERE kind = '%s'" % entity[1] for entity in ENTITIES),
+]
+
+STATEMENTS = {
+    'mysql': (MYSQL_FORWARD, MYSQL_BACKWARD),
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def run_statements(schema_editor, direction):
+    forward_backward = STATEMENTS.get(schema_editor.connection.vendor)
+    if forward_backward is None:
+        return
+    for statement in forward_backward[direction]:
+        schema_editor.execute(statement, params=None)
+
+
+def recreate_sqlite_triggers(schema_editor, *tables):
+    """
+    SQLite drops a table's triggers when Django rebuilds the table to alter
+    it (its ALTER TABLE emulation). Later migrations that rebuild one of
+    these tables call this afterwards; the indexed rows themselves survive.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for entity in ENTITIES:
+        if entity[0] not in tables:
+            continue
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute("DROP TRIGGER IF EXISTS %s_search_%s" % (entity[0], suffix), params=None)
+        for statement in sqlite_statements(*entity)[:3]:
+            schema_editor.execute(statement, params=None)
+
+
+def create_search_indexes(apps, schema_editor):
+    run_statements(schema_editor, 0)
+
+
+def drop_search_indexes(apps, schema_editor):
+    run_statements(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0004_field_subfield_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
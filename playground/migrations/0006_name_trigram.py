@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+def backfill_trigrams(apps, schema_editor):
+    from playground.trigram import trigrams
+
+    NameTrigram = apps.get_model('playground', 'NameTrigram')
+    for kind, model_name in (('field', 'Field'), ('researcher', 'Researcher')):
+        model = apps.get_model('playground', model_name)
+        rows = []
+        for pk, name in model.objects.values_list('pk', 'name').iterator():
+            grams = trigrams(name)
+            rows.extend(
+                NameTrigram(kind=kind, object_pk=str(pk), trigram=gram, name_trigrams=len(grams))
+                for gram in grams
+            )
+        NameTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0005_entity_fulltext'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NameTrigram',
+            fields=[
+                ('trigram_id', models.AutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('object_pk', models.CharField(max_length=200)),
+                ('trigram', models.CharField(max_length=3)),
+                ('name_trigrams', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'db_table': 'name_trigram',
+                'indexes': [models.Index(fields=['kind', 'trigram'], name='name_trigram_lookup_idx')],
+                'unique_together': {('kind', 'object_pk', 'trigram')},
+            },
+        ),
+        migrations.RunPython(backfill_trigrams, migrations.RunPython.noop),
+    ]
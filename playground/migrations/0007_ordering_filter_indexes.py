@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-17 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0006_name_trigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-updated_at'], name='conversation_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundinginstitution',
+            index=models.Index(fields=['country', 'name'], name='funding_inst_country_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundingproposal',
+            index=models.Index(fields=['proposal_status'], name='funding_proposal_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['time_date'], name='message_time_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['severity_color', 'name'], name='problem_severity_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='querypost',
+            index=models.Index(fields=['is_answered'], name='query_post_answered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researcher',
+            index=models.Index(fields=['-total_star', 'name'], name='researcher_star_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researcher',
+            index=models.Index(fields=['country', '-total_star', 'name'], name='researcher_country_star_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researchwork',
+            index=models.Index(fields=['-citation', 'title'], name='research_work_citation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researchwork',
+            index=models.Index(fields=['status', '-citation', 'title'], name='research_work_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researchwork',
+            index=models.Index(fields=['vacancy_status', '-citation', 'title'], name='research_work_vacancy_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 02:55
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding the generated column rebuilds the problem table on SQLite, which
+# drops its full-text triggers from 0005
+entity_fulltext = import_module('playground.migrations.0005_entity_fulltext')
+
+
+def recreate_search_triggers(apps, schema_editor):
+    entity_fulltext.recreate_sqlite_triggers(schema_editor, 'problem')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0007_ordering_filter_indexes'),
+    ]
+
+    operations = [
+        # Runs last when unapplying, after RemoveField rebuilt the table again
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AlterModelOptions(
+            name='problem',
+            options={'ordering': ['-severity_rank', 'name']},
+        ),
+        migrations.RemoveIndex(
+            model_name='problem',
+            name='problem_severity_name_idx',
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='severity_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(severity_color='green', then=1), models.When(severity_color='yellow', then=2), models.When(severity_color='orange', then=3), models.When(severity_color='red', then=4), default=0), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['-severity_rank', 'name'], name='problem_severity_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['subfield', '-severity_rank', 'name'], name='problem_subfield_rank_idx'),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 6.0 on 2026-10-17 03:20
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# Adding NOT NULL columns rebuilds these tables on SQLite, which drops the
+# full-text triggers from 0003 / 0005
+field_subfield_fulltext = import_module('playground.migrations.0003_field_subfield_fulltext')
+entity_fulltext = import_module('playground.migrations.0005_entity_fulltext')
+
+# (model, counter column, counted model, m2m field on it or None, fk to model)
+COUNTERS = [
+    ('Field', 'subfield_count', 'Subfield', None, 'field'),
+    ('Subfield', 'problem_count', 'Problem', None, 'subfield'),
+    ('Researcher', 'friend_count', 'Researcher', 'friends', 'from_researcher'),
+    ('Researcher', 'expert_field_count', 'Researcher', 'expert_fields', 'researcher'),
+    ('Researcher', 'work_count', 'ResearchWork', 'researchers', 'researcher'),
+    ('FundingInstitution', 'proposal_count', 'FundingProposal', None, 'funding_institution'),
+    ('QueryPost', 'feedback_count', 'QueryPost', 'feedback_from', 'querypost'),
+    ('Conversation', 'participant_count', 'Conversation', 'participants', 'conversation'),
+    ('Conversation', 'message_count', 'Message', None, 'conversation'),
+]
+
+
+def backfill_counters(apps, schema_editor):
+    """One UPDATE per counter, from a correlated COUNT(*)"""
+    for model_name, column, counted_name, m2m, fk in COUNTERS:
+        model = apps.get_model('playground', model_name)
+        counted = apps.get_model('playground', counted_name)
+        if m2m:
+            counted = getattr(counted, m2m).through
+        counts = (
+            counted.objects.filter(**{fk: OuterRef('pk')})
+            .order_by().values(fk).annotate(count=Count('*')).values('count')
+        )
+        model.objects.update(**{column: Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))})
+
+
+def recreate_search_triggers(apps, schema_editor):
+    field_subfield_fulltext.recreate_sqlite_triggers(schema_editor, 'field', 'subfield')
+    entity_fulltext.recreate_sqlite_triggers(schema_editor, 'researcher', 'query_post')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0008_problem_severity_rank'),
+    ]
+
+    operations = [
+        # Runs last when unapplying, after RemoveField rebuilt the tables again
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name='conversation',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='field',
+            name='subfield_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='fundinginstitution',
+            name='proposal_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='querypost',
+            name='feedback_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='expert_field_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='friend_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='work_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='subfield',
+            name='problem_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 03:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_message(apps, schema_editor):
+    """Newest message of every conversation; no messages -> its creation time"""
+    Conversation = apps.get_model('playground', 'Conversation')
+    Message = apps.get_model('playground', 'Message')
+    newest = (
+        Message.objects
+        .filter(conversation_id=OuterRef('pk'))
+        .order_by('-time_date', '-message_id')
+    )
+    Conversation.objects.update(
+        last_message=Subquery(newest.values('message_id')[:1]),
+        last_activity_at=Coalesce(Subquery(newest.values('time_date')[:1]), F('created_at')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0009_counter_caches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='playground.message'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_activity_at', '-conversation_id'], name='conversation_activity_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
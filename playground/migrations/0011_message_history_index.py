@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0010_conversation_last_message'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'time_date', 'message_id'], name='message_history_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-17 04:30
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Adding a NOT NULL column rebuilds researcher on SQLite, which drops its
+# full-text triggers from 0005
+entity_fulltext = import_module('playground.migrations.0005_entity_fulltext')
+
+
+def recreate_search_triggers(apps, schema_editor):
+    entity_fulltext.recreate_sqlite_triggers(schema_editor, 'researcher')
+
+
+def backfill_read_markers(apps, schema_editor):
+    """A marker per participant, with the existing history counted as read"""
+    Conversation = apps.get_model('playground', 'Conversation')
+    ReadMarker = apps.get_model('playground', 'ReadMarker')
+    rows = (
+        Conversation.participants.through.objects
+        .values_list('researcher_id', 'conversation_id', 'conversation__last_message_id', 'conversation__last_activity_at')
+        .order_by('pk')
+        .iterator(chunk_size=1000)
+    )
+    batch = []
+    for researcher_id, conversation_id, last_message_id, last_activity_at in rows:
+        batch.append(ReadMarker(
+            researcher_id=researcher_id, conversation_id=conversation_id,
+            last_read_message_id=last_message_id, last_read_at=last_activity_at,
+        ))
+        if len(batch) == 1000:
+            ReadMarker.objects.bulk_create(batch)
+            batch = []
+    ReadMarker.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0011_message_history_index'),
+    ]
+
+    operations = [
+        # Runs last when unapplying, after RemoveField rebuilt the table again
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name='researcher',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ReadMarker',
+            fields=[
+                ('read_marker_id', models.AutoField(primary_key=True, serialize=False)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='playground.conversation')),
+                ('last_read_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='playground.message')),
+                ('researcher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='playground.researcher')),
+            ],
+            options={
+                'db_table': 'read_marker',
+                'unique_together': {('researcher', 'conversation')},
+            },
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_read_markers, migrations.RunPython.noop),
+    ]
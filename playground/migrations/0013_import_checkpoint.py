@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-17 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0012_read_markers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('checkpoint_id', models.AutoField(primary_key=True, serialize=False)),
+                ('source', models.CharField(max_length=500, unique=True)),
+                ('rows_done', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'import_checkpoint',
+            },
+        ),
+    ]
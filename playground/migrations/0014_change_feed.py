@@ -0,0 +1,117 @@
+# Generated by Django 6.0 on 2026-10-17 06:05
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Best known last change for rows that predate the column"""
+    apps.get_model('playground', 'Message').objects.update(updated_at=F('time_date'))
+    apps.get_model('playground', 'Mentor').objects.update(updated_at=F('created_at'))
+    apps.get_model('playground', 'CoWorker').objects.update(updated_at=F('created_at'))
+    # Collaboration has no timestamp of its own: it keeps the migration time
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0013_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collaboration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='coworker',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='mentor',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('tombstone_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=50)),
+                ('object_pk', models.CharField(max_length=200)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'tombstone',
+                'indexes': [models.Index(fields=['kind', 'deleted_at', 'tombstone_id'], name='tombstone_feed_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='field',
+            index=models.Index(fields=['updated_at', 'name'], name='field_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subfield',
+            index=models.Index(fields=['updated_at', 'name'], name='subfield_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='problem',
+            index=models.Index(fields=['updated_at', 'name'], name='problem_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researcher',
+            index=models.Index(fields=['updated_at', 'researcher_id'], name='researcher_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='researchwork',
+            index=models.Index(fields=['updated_at', 'work_id'], name='research_work_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundinginstitution',
+            index=models.Index(fields=['updated_at', 'institution_id'], name='funding_inst_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectcolab',
+            index=models.Index(fields=['updated_at', 'post_id'], name='project_colab_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='querypost',
+            index=models.Index(fields=['updated_at', 'post_id'], name='query_post_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fundingproposal',
+            index=models.Index(fields=['updated_at', 'post_id'], name='funding_proposal_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['updated_at', 'conversation_id'], name='conversation_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['updated_at', 'message_id'], name='message_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mentor',
+            index=models.Index(fields=['updated_at', 'comment_id'], name='mentor_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coworker',
+            index=models.Index(fields=['updated_at', 'comment_id'], name='coworker_changes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collaboration',
+            index=models.Index(fields=['updated_at', 'collaboration_id'], name='collaboration_changes_idx'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 6.0 on 2026-10-17 07:20
+
+from decimal import Decimal
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+
+# Adding NOT NULL columns rebuilds researcher on SQLite, which drops its
+# full-text triggers from 0005
+entity_fulltext = import_module('playground.migrations.0005_entity_fulltext')
+
+
+def recreate_search_triggers(apps, schema_editor):
+    entity_fulltext.recreate_sqlite_triggers(schema_editor, 'researcher')
+
+
+def rate_from_reviews(apps, schema_editor):
+    """The aggregates and ratings of reputation.py, from the existing reviews"""
+    Researcher = apps.get_model('playground', 'Researcher')
+    sources = [
+        (apps.get_model('playground', 'Mentor'), 'mentor_review',
+         6 * F('rating') + F('punctual_score') + F('consistency') + F('hard_working')),
+        (apps.get_model('playground', 'CoWorker'), 'peer_review', 6 * F('rating') + 3 * F('hard_working')),
+    ]
+    aggregates = {}
+    for model, prefix, points in sources:
+        reviews = model.objects.filter(researcher=OuterRef('pk')).order_by().values('researcher')
+        aggregates[prefix + '_count'] = Coalesce(Subquery(reviews.annotate(n=Count('*')).values('n')), Value(0))
+        aggregates[prefix + '_points'] = Coalesce(Subquery(reviews.annotate(p=Sum(points)).values('p')), Value(0))
+    rating = models.DecimalField(max_digits=5, decimal_places=2)
+    ratings = {
+        # 12 points a star; 3 phantom reviews of 3 stars
+        'total_star': Case(
+            When(Q(mentor_review_count=0, peer_review_count=0), then=Value(Decimal('0'))),
+            default=Round(
+                (Value(108.0) + F('mentor_review_points') + F('peer_review_points'))
+                / (Value(12.0) * (F('mentor_review_count') + F('peer_review_count') + 3)),
+                2,
+            ),
+            output_field=rating,
+        ),
+        'peer_rating': Case(
+            When(peer_review_count=0, then=Value(Decimal('0'))),
+            default=Round(F('peer_review_points') / (Value(12.0) * F('peer_review_count')), 2),
+            output_field=rating,
+        ),
+    }
+    Researcher.objects.update(**aggregates)
+    Researcher.objects.update(**ratings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0014_change_feed'),
+    ]
+
+    operations = [
+        # Runs last when unapplying, after RemoveField rebuilt the table again
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name='researcher',
+            name='mentor_review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='mentor_review_points',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='peer_review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='peer_review_points',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='researcher',
+            name='peer_rating',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=5),
+        ),
+        migrations.AlterField(
+            model_name='researcher',
+            name='total_star',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=5),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+        migrations.RunPython(rate_from_reviews, migrations.RunPython.noop),
+    ]
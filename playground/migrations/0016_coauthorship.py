@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-17 09:05
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# Adding NOT NULL columns rebuilds researcher on SQLite, which drops its
+# full-text triggers from 0005
+entity_fulltext = import_module('playground.migrations.0005_entity_fulltext')
+
+
+def recreate_search_triggers(apps, schema_editor):
+    entity_fulltext.recreate_sqlite_triggers(schema_editor, 'researcher')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0015_reputation'),
+    ]
+
+    operations = [
+        # Runs last when unapplying, after RemoveField rebuilt the table again
+        migrations.RunPython(migrations.RunPython.noop, recreate_search_triggers),
+        migrations.AddField(
+            model_name='researcher',
+            name='coauthor_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='collaboration_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='network_component',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='network_size',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='researcher',
+            name='pagerank',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='researcher',
+            index=models.Index(fields=['-pagerank', 'name'], name='researcher_pagerank_idx'),
+        ),
+    ]
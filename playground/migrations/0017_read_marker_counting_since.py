@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-17 11:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_counting_since(apps, schema_editor):
+    """
+    The first message from someone else in the conversation; markers with
+    none yet (backfilled by 0012 for every participant) count from now on
+    """
+    Message = apps.get_model('playground', 'Message')
+    ReadMarker = apps.get_model('playground', 'ReadMarker')
+    first = (
+        Message.objects
+        .filter(conversation_id=OuterRef('conversation_id'))
+        .exclude(sender_id=OuterRef('researcher_id'))
+        .order_by('time_date')
+        .values('time_date')[:1]
+    )
+    ReadMarker.objects.update(
+        counting_since=Coalesce(Subquery(first), Value(timezone.now()), output_field=models.DateTimeField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0016_coauthorship'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readmarker',
+            name='counting_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_counting_since, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-17 12:10
+
+from importlib import import_module
+
+from django.db import migrations
+
+# Recreate the field / subfield full-text triggers from 0003, whose UPDATE
+# trigger now fires only when an indexed column changes (SQLite; a no-op
+# elsewhere)
+field_subfield_fulltext = import_module('playground.migrations.0003_field_subfield_fulltext')
+
+
+def recreate_search_triggers(apps, schema_editor):
+    field_subfield_fulltext.recreate_sqlite_triggers(schema_editor, 'field', 'subfield')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0017_read_marker_counting_since'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
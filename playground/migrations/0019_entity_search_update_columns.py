@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-17 12:40
+
+from importlib import import_module
+
+from django.db import migrations
+
+# Recreate the entity full-text triggers from 0005, whose UPDATE trigger
+# now fires only when an indexed column changes (SQLite; a no-op elsewhere)
+entity_fulltext = import_module('playground.migrations.0005_entity_fulltext')
+
+
+def recreate_search_triggers(apps, schema_editor):
+    entity_fulltext.recreate_sqlite_triggers(
+        schema_editor, *(entity[0] for entity in entity_fulltext.ENTITIES),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playground', '0018_field_subfield_search_update_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,22 @@
 
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+
+class DisplayQuerySet(models.QuerySet):
+    """QuerySet for models whose __str__ follows foreign keys"""
+    
+    def for_display(self):
+        """Join every relation listed in the model's str_related up front"""
+        return self.select_related(*self.model.str_related)
+
+
+class ProblemQuerySet(models.QuerySet):
+
+    def most_critical(self, limit=10):
+        """Highest severity first - an index range scan on severity_rank"""
+        return self.order_by('-severity_rank', 'name')[:limit]
 
 # ============================================================================
 # ENTITY 1: FIELD
@@ -13,12 +29,20 @@ class Field(models.Model):
     domain = models.CharField(max_length=200)
     area = models.CharField(max_length=200)
     field_type = models.CharField(max_length=100)
+    # Counter cache - see counters.py
+    subfield_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'field'
         ordering = ['domain', 'name']
+        indexes = [
+            # Keyset pagination of search results seeks on (domain, name)
+            models.Index(fields=['domain', 'name'], name='field_domain_name_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'name'], name='field_changes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.domain})"
@@ -32,6 +56,8 @@ class Subfield(models.Model):
     name = models.CharField(max_length=200, primary_key=True)
     field_type = models.CharField(max_length=100)
     domain = models.CharField(max_length=200)
+    # Counter cache - see counters.py
+    problem_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -45,9 +71,16 @@ class Subfield(models.Model):
     class Meta:
         db_table = 'subfield'
         ordering = ['field', 'name']
+        indexes = [
+            # Per-field subfield previews and "load more" pages
+            models.Index(fields=['field', 'name'], name='subfield_field_name_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'name'], name='subfield_changes_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.name} (under {self.field.name})"
+        # field_id IS the field's name (Field's primary key) - no extra query
+        return f"{self.name} (under {self.field_id})"
 
 
 # ============================================================================
@@ -72,6 +105,19 @@ class Problem(models.Model):
         ],
         default='yellow'
     )
+    # severity_color as a number (green 1 ... red 4), computed and stored
+    # by the database itself so it can't drift, even under bulk writes
+    severity_rank = models.GeneratedField(
+        expression=models.Case(
+            models.When(severity_color='green', then=1),
+            models.When(severity_color='yellow', then=2),
+            models.When(severity_color='orange', then=3),
+            models.When(severity_color='red', then=4),
+            default=0,
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -82,9 +128,18 @@ class Problem(models.Model):
         related_name='problems'
     )
     
+    objects = ProblemQuerySet.as_manager()
+    
     class Meta:
         db_table = 'problem'
-        ordering = ['severity_color', 'name']
+        ordering = ['-severity_rank', 'name']
+        indexes = [
+            # Most critical first, overall and within one subfield
+            models.Index(fields=['-severity_rank', 'name'], name='problem_severity_rank_idx'),
+            models.Index(fields=['subfield', '-severity_rank', 'name'], name='problem_subfield_rank_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'name'], name='problem_changes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} [{self.severity_color.upper()}]"
@@ -100,13 +155,31 @@ class Researcher(models.Model):
     email = models.EmailField(unique=True)
     country = models.CharField(max_length=100)
     institution = models.CharField(max_length=300)
-    total_star = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
-    peer_rating = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    # Derived from Mentor / CoWorker reviews - see reputation.py
+    total_star = models.DecimalField(max_digits=5, decimal_places=2, default=0.00, editable=False)
+    peer_rating = models.DecimalField(max_digits=5, decimal_places=2, default=0.00, editable=False)
     interest = models.TextField()
     cv = models.FileField(upload_to='cvs/', blank=True, null=True)
     research_work = models.TextField(blank=True)
     project = models.TextField(blank=True)
     github = models.URLField(blank=True, max_length=500)
+    # Counter caches - see counters.py
+    friend_count = models.PositiveIntegerField(default=0, editable=False)
+    expert_field_count = models.PositiveIntegerField(default=0, editable=False)
+    work_count = models.PositiveIntegerField(default=0, editable=False)
+    # Unread messages over all conversations (sum of ReadMarker.unread_count)
+    unread_count = models.PositiveIntegerField(default=0, editable=False)
+    # Review aggregates behind the ratings - see reputation.py
+    mentor_review_count = models.PositiveIntegerField(default=0, editable=False)
+    mentor_review_points = models.PositiveBigIntegerField(default=0, editable=False)
+    peer_review_count = models.PositiveIntegerField(default=0, editable=False)
+    peer_review_points = models.PositiveBigIntegerField(default=0, editable=False)
+    # Co-authorship network, as of the last analyze_coauthorship run - see coauthorship.py
+    coauthor_count = models.PositiveIntegerField(default=0, editable=False)
+    collaboration_count = models.PositiveIntegerField(default=0, editable=False)
+    pagerank = models.FloatField(default=0, editable=False)
+    network_component = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    network_size = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -128,6 +201,15 @@ class Researcher(models.Model):
     class Meta:
         db_table = 'researcher'
         ordering = ['-total_star', 'name']
+        indexes = [
+            # Default ordering, alone and under the admin's country filter
+            models.Index(fields=['-total_star', 'name'], name='researcher_star_name_idx'),
+            models.Index(fields=['country', '-total_star', 'name'], name='researcher_country_star_idx'),
+            # Most influential co-authors first
+            models.Index(fields=['-pagerank', 'name'], name='researcher_pagerank_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'researcher_id'], name='researcher_changes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.institution})"
@@ -184,6 +266,14 @@ class ResearchWork(models.Model):
     class Meta:
         db_table = 'research_work'
         ordering = ['-citation', 'title']
+        indexes = [
+            # Default ordering, alone and under the admin's status filters
+            models.Index(fields=['-citation', 'title'], name='research_work_citation_idx'),
+            models.Index(fields=['status', '-citation', 'title'], name='research_work_status_idx'),
+            models.Index(fields=['vacancy_status', '-citation', 'title'], name='research_work_vacancy_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'work_id'], name='research_work_changes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} (Citations: {self.citation})"
@@ -199,12 +289,19 @@ class FundingInstitution(models.Model):
     country = models.CharField(max_length=100)
     amount = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     budget = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    # Counter cache - see counters.py
+    proposal_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'funding_institution'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['country', 'name'], name='funding_inst_country_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'institution_id'], name='funding_inst_changes_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.country})"
@@ -247,6 +344,10 @@ class ProjectColab(Posts):
         db_table = 'project_colab'
         verbose_name = 'Project Collaboration'
         verbose_name_plural = 'Project Collaborations'
+        indexes = [
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'post_id'], name='project_colab_changes_idx'),
+        ]
     
     def __str__(self):
         return f"Project: {self.project_name}"
@@ -267,6 +368,8 @@ class QueryPost(Posts):
         default='general'
     )
     is_answered = models.BooleanField(default=False)
+    # Counter cache - see counters.py
+    feedback_count = models.PositiveIntegerField(default=0, editable=False)
     
     # RELATIONSHIP: QueryPost (M) → POSTED BY → Researcher (1)
     # Each subclass needs its own unique related_name
@@ -287,6 +390,12 @@ class QueryPost(Posts):
         db_table = 'query_post'
         verbose_name = 'Query Post'
         verbose_name_plural = 'Query Posts'
+        indexes = [
+            # The admin lists newest first by pk, which the index carries
+            models.Index(fields=['is_answered'], name='query_post_answered_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'post_id'], name='query_post_changes_idx'),
+        ]
     
     def __str__(self):
         return f"Query: {self.title}"
@@ -337,6 +446,11 @@ class FundingProposal(Posts):
         db_table = 'funding_proposal'
         verbose_name = 'Funding Proposal'
         verbose_name_plural = 'Funding Proposals'
+        indexes = [
+            models.Index(fields=['proposal_status'], name='funding_proposal_status_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'post_id'], name='funding_proposal_changes_idx'),
+        ]
     
     def __str__(self):
         return f"Proposal: {self.title} (${self.requested_amount})"
@@ -349,6 +463,20 @@ class Conversation(models.Model):
     """Conversation thread"""
     conversation_id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=200, blank=True)
+    # Counter caches - see counters.py
+    participant_count = models.PositiveIntegerField(default=0, editable=False)
+    message_count = models.PositiveIntegerField(default=0, editable=False)
+    # Newest message and its time, set as messages arrive - see messaging.py.
+    # A conversation with no messages yet is "active" from its creation.
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+'
+    )
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -362,6 +490,13 @@ class Conversation(models.Model):
     class Meta:
         db_table = 'conversation'
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['-updated_at'], name='conversation_updated_idx'),
+            # Inbox order, see messaging.inbox()
+            models.Index(fields=['-last_activity_at', '-conversation_id'], name='conversation_activity_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'conversation_id'], name='conversation_changes_idx'),
+        ]
     
     def __str__(self):
         return f"Conversation #{self.conversation_id}"
@@ -375,6 +510,7 @@ class Message(models.Model):
     message_id = models.AutoField(primary_key=True)
     body = models.TextField()
     time_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     # RELATIONSHIP: Message (M) → SENT BY → Researcher (1)
     sender = models.ForeignKey(
@@ -397,9 +533,20 @@ class Message(models.Model):
         related_name='messages'
     )
     
+    # Relations __str__ reads - see DisplayQuerySet.for_display()
+    str_related = ('sender',)
+    objects = DisplayQuerySet.as_manager()
+    
     class Meta:
         db_table = 'message'
         ordering = ['time_date']
+        indexes = [
+            models.Index(fields=['time_date'], name='message_time_date_idx'),
+            # Keyset pages of one conversation, see messaging.message_history()
+            models.Index(fields=['conversation', 'time_date', 'message_id'], name='message_history_idx'),
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'message_id'], name='message_changes_idx'),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.name} at {self.time_date}"
@@ -417,6 +564,7 @@ class Comment(models.Model):
         default=3
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         abstract = True  # Superclass
@@ -454,10 +602,17 @@ class Mentor(Comment):
         related_name='mentor_comments'
     )
     
+    str_related = ('researcher',)
+    objects = DisplayQuerySet.as_manager()
+    
     class Meta:
         db_table = 'mentor'
         verbose_name = 'Mentor Comment'
         verbose_name_plural = 'Mentor Comments'
+        indexes = [
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'comment_id'], name='mentor_changes_idx'),
+        ]
     
     def __str__(self):
         return f"Mentor Comment by {self.researcher.name}"
@@ -487,10 +642,17 @@ class CoWorker(Comment):
         related_name='coworker_comments'
     )
     
+    str_related = ('researcher',)
+    objects = DisplayQuerySet.as_manager()
+    
     class Meta:
         db_table = 'coworker'
         verbose_name = 'Co-Worker Comment'
         verbose_name_plural = 'Co-Worker Comments'
+        indexes = [
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'comment_id'], name='coworker_changes_idx'),
+        ]
     
     def __str__(self):
         return f"Co-Worker Comment by {self.researcher.name}"
@@ -508,10 +670,117 @@ class Collaboration(models.Model):
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
     contribution_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    str_related = ('researcher', 'funding_institution', 'research_work')
+    objects = DisplayQuerySet.as_manager()
     
     class Meta:
         db_table = 'collaboration'
         unique_together = ['researcher', 'funding_institution', 'research_work']
+        indexes = [
+            # Change feed order, see changes.py
+            models.Index(fields=['updated_at', 'collaboration_id'], name='collaboration_changes_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.researcher.name} ↔ {self.funding_institution.name} ↔ {self.research_work.title}"
+
+# ============================================================================
+# SEARCH SUPPORT: NAME TRIGRAM INDEX (see playground/trigram.py)
+# ============================================================================
+class NameTrigram(models.Model):
+    """One character trigram of a Field/Researcher name, for fuzzy matching"""
+    trigram_id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=20)
+    object_pk = models.CharField(max_length=200)
+    trigram = models.CharField(max_length=3)
+    # Number of distinct trigrams in the whole name (for the similarity score)
+    name_trigrams = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        db_table = 'name_trigram'
+        unique_together = ['kind', 'object_pk', 'trigram']
+        indexes = [
+            models.Index(fields=['kind', 'trigram'], name='name_trigram_lookup_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind}:{self.object_pk} '{self.trigram}'"
+
+
+# ============================================================================
+# MESSAGING SUPPORT: READ MARKERS (see playground/messaging.py)
+# ============================================================================
+class ReadMarker(models.Model):
+    """How far a researcher has read a conversation, and how much is left"""
+    read_marker_id = models.AutoField(primary_key=True)
+    researcher = models.ForeignKey(
+        Researcher,
+        on_delete=models.CASCADE,
+        related_name='read_markers'
+    )
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='read_markers'
+    )
+    # Newest message seen (the read receipt) and its time; messages after
+    # last_read_at are unread
+    last_read_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    # Time of the first message counted here: the researcher was a
+    # participant from then on, and older messages were never theirs
+    counting_since = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'read_marker'
+        unique_together = ['researcher', 'conversation']
+    
+    def __str__(self):
+        return f"Researcher #{self.researcher_id} in conversation #{self.conversation_id}"
+
+
+# ============================================================================
+# IMPORT SUPPORT: CHECKPOINTS (see playground/importer.py)
+# ============================================================================
+class ImportCheckpoint(models.Model):
+    """Rows of one input file already committed by `manage.py import_data`"""
+    checkpoint_id = models.AutoField(primary_key=True)
+    # "<kind>:<absolute path>"
+    source = models.CharField(max_length=500, unique=True)
+    rows_done = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'import_checkpoint'
+    
+    def __str__(self):
+        return f"{self.source} ({self.rows_done} rows)"
+
+
+# ============================================================================
+# CHANGE FEED SUPPORT: TOMBSTONES (see playground/changes.py)
+# ============================================================================
+class Tombstone(models.Model):
+    """A deleted row, kept so change-feed consumers can delete it too"""
+    tombstone_id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=50)
+    object_pk = models.CharField(max_length=200)
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'tombstone'
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at', 'tombstone_id'], name='tombstone_feed_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.researcher.name} ↔ {self.funding_institution.name} ↔ {self.research_work.title}"
\ No newline at end of file
+        return f"{self.kind}:{self.object_pk} deleted {self.deleted_at}"
@@ -0,0 +1,259 @@
+# realtime.py
+# Live message delivery: pub/sub plus a Server-Sent Events stream
+#
+# When a Message is committed, signals.py publishes it on the channel of
+# every participant ("researcher:<id>"). Each open /stream/ connection is
+# one subscription: an asyncio.Queue read by an async generator, so under
+# ASGI an idle client costs a suspended coroutine, not a thread.
+#
+# storefront/asgi.py routes /stream/ to stream_application() below rather
+# than through Django: Django's ASGI handler runs the (sync) middleware on a
+# thread of its own per request and keeps it until the response ends, so
+# thousands of open streams would mean thousands of parked threads. With
+# no middleware, stream_application reads the session cookie itself: only
+# the researcher's own user (same email) or staff may subscribe. The
+# message_stream view serves the same stream when Django's ASGI handler is
+# mounted without that wrapper; the stream needs ASGI either way.
+#
+# The broker is chosen by settings.REALTIME_BROKER (a dotted path). The
+# default InProcessBroker only reaches clients of the same worker process;
+# a shared broker for several workers implements the same three methods
+# (subscribe / unsubscribe / publish).
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import QueryDict, parse_cookie
+from django.utils.module_loading import import_string
+
+from .messaging import may_act_as
+from .models import Conversation
+
+# Seconds between keep-alive comments on an idle stream, so proxies keep
+# the connection open and dead clients are noticed
+HEARTBEAT_SECONDS = 15
+
+# Messages buffered per connection before it is told to resync instead
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # don't let nginx buffer the stream
+}
+
+
+class Subscription:
+    """One listener: a bounded queue owned by the event loop that created it"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+        # Set when the queue overflowed and messages were dropped
+        self.missed = False
+
+    def deliver(self, message):
+        """Runs on the subscription's loop"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.missed = True
+
+
+class InProcessBroker:
+    """Fan-out to subscribers in this process; publish() is safe from any thread"""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)  # channel -> {Subscription}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Call from the event loop that will read the subscription"""
+        subscription = Subscription(channel)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            # Publishers are usually sync views/signals on another thread
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Its event loop is gone (worker shutting down)
+                self.unsubscribe(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(settings, 'REALTIME_BROKER', 'playground.realtime.InProcessBroker')
+            _broker = import_string(path)()
+        return _broker
+
+
+def researcher_channel(researcher_id):
+    return 'researcher:%s' % researcher_id
+
+
+# ============================================================================
+# PUBLISHING
+# ============================================================================
+def message_payload(message):
+    return {
+        'id': message.pk,
+        'conversation': message.conversation_id,
+        'sender_id': message.sender_id,
+        'receiver_id': message.receiver_id,
+        'body': message.body,
+        'time_date': message.time_date,
+    }
+
+
+def publish_message(message):
+    """
+    Push a new message to every participant, sender and receiver included,
+    once the transaction that created it commits (one participants query)
+    """
+    participants = Conversation.participants.through.objects.filter(
+        conversation_id=message.conversation_id,
+    )
+    recipients = set(participants.values_list('researcher_id', flat=True))
+    recipients |= {message.sender_id, message.receiver_id}
+    payload = message_payload(message)
+
+    def publish():
+        broker = get_broker()
+        for researcher_id in recipients:
+            broker.publish(researcher_channel(researcher_id), payload)
+
+    transaction.on_commit(publish)
+
+
+# ============================================================================
+# SERVER-SENT EVENTS
+# ============================================================================
+def sse_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append('id: %s' % event_id)
+    lines.append('event: %s' % event)
+    lines.append('data: %s' % json.dumps(data, cls=DjangoJSONEncoder))
+    return '\n'.join(lines) + '\n\n'
+
+
+async def message_events(researcher_id, heartbeat=HEARTBEAT_SECONDS):
+    """
+    SSE stream of messages for one researcher, until the client goes away
+    (the ASGI handler cancels the generator on disconnect).
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(researcher_channel(researcher_id))
+    try:
+        # Sent as soon as the subscription exists, so clients (and tests)
+        # know nothing published from here on can be missed
+        yield ': connected\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield sse_event('message', message, event_id=message['id'])
+            if subscription.missed:
+                # Dropped messages while this client was slow: have it
+                # re-read the conversation history instead
+                subscription.missed = False
+                yield sse_event('resync', {})
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def scope_user(scope):
+    """The signed-in user of a bare ASGI request, from its session cookie"""
+    cookie = '; '.join(
+        value.decode('latin-1') for name, value in scope.get('headers', ()) if name.lower() == b'cookie'
+    )
+    session_key = parse_cookie(cookie).get(settings.SESSION_COOKIE_NAME)
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    # aget_user() only needs request.session
+    return await aget_user(SimpleNamespace(session=session))
+
+
+async def send_json(send, status, data):
+    await send({
+        'type': 'http.response.start', 'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(data).encode('utf-8')})
+
+
+async def stream_application(scope, receive, send):
+    """
+    Bare ASGI app for GET /stream/?researcher=<id>, mounted in front of
+    Django by storefront/asgi.py. Relays message_events() until the client
+    disconnects; no middleware, no thread. 403 unless the session belongs
+    to the researcher's own user or to staff.
+    """
+    query = QueryDict(scope.get('query_string', b'').decode('latin-1'))
+    try:
+        researcher_id = int(query.get('researcher', ''))
+    except ValueError:
+        await send_json(send, 400, {'error': 'researcher must be an id'})
+        return
+    if not await sync_to_async(may_act_as)(await scope_user(scope), researcher_id):
+        await send_json(send, 403, {'error': 'not allowed'})
+        return
+
+    await send({
+        'type': 'http.response.start', 'status': 200,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in SSE_HEADERS.items()],
+    })
+    events = message_events(researcher_id)
+
+    async def relay():
+        async for chunk in events:
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(relay()), asyncio.ensure_future(disconnected())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Unsubscribes, if the relay never got to start the generator
+        await events.aclose()
@@ -0,0 +1,278 @@
+# recommend.py
+# Collaborator recommendations for research works open to collaboration
+#
+# Each researcher is scored against a work (vacancy_status=True) on three
+# signals, each scaled to 0..1:
+#
+#   field  1 if the work's field (subfield.field) is one of the
+#          researcher's expert_fields
+#   text   cosine similarity of TF-IDF vectors: the researcher's interest
+#          against the work's title (IDF taken over all interests)
+#   star   total_star relative to the best-rated researcher
+#
+# score = FIELD_WEIGHT * field + TEXT_WEIGHT * text + STAR_WEIGHT * star.
+# Researchers already on the work, and those matching on neither field
+# nor text, are left out: stars alone don't make a collaborator.
+#
+# The researcher side is precomputed once per process as sparse matrices
+# (interest TF-IDF rows, expertise one-hot rows) plus a star vector, so a
+# batch of works is scored with a few sparse products and a top-k
+# partition per row - `manage.py recommend_collaborators` scores every
+# open work that way and fills the cache.
+#
+# Results are cached per work (collaborator_cache, in the 'recommend'
+# cache of settings.CACHES - a database cache, so the batch command's
+# results and the generations are shared by every process). A change to a work or its members drops that
+# work's entry; a change on the researcher side (profile, expert fields,
+# the taxonomy) starts a new generation, which rebuilds the matrices - at
+# most every MIN_REBUILD_SECONDS - and with them every work's entry.
+
+import math
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from scipy import sparse
+
+from .cache import VersionedResultCache
+from .models import Researcher, ResearchWork
+from .search import tokenize
+
+FIELD_WEIGHT = 0.5
+TEXT_WEIGHT = 0.35
+STAR_WEIGHT = 0.15
+
+RECOMMEND_LIMIT = 10
+# Cached per work; smaller limits are a slice of it
+MAX_RECOMMEND_LIMIT = 50
+
+# Works scored together: each block is a dense works x researchers array
+SCORE_BLOCK_SIZE = 32
+
+# Researcher-side changes rebuild the matrices no more often than this
+MIN_REBUILD_SECONDS = 60
+# ...and they are rebuilt this often regardless (writes that skip signals)
+INDEX_TTL = 3600
+
+
+def term_counts(text):
+    """Sublinear term frequencies of one document"""
+    counts = Counter(token for token in tokenize(text) if len(token) > 1)
+    return {term: 1 + math.log(count) for term, count in counts.items()}
+
+
+def term_matrix(documents, vocabulary, grow=False):
+    """
+    CSR documents x terms of sublinear term frequencies. With `grow`, new
+    terms are added to `vocabulary` (term -> column); otherwise dropped.
+    """
+    indptr, indices, data = [0], [], []
+    for document in documents:
+        for term, weight in term_counts(document).items():
+            column = vocabulary.get(term)
+            if column is None:
+                if not grow:
+                    continue
+                column = vocabulary[term] = len(vocabulary)
+            indices.append(column)
+            data.append(weight)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.array(data, np.float32), np.array(indices, np.int64), np.array(indptr, np.int64)),
+        shape=(len(documents), len(vocabulary)),
+    )
+
+
+def normalize_rows(matrix):
+    """Scale each row of a CSR matrix to unit length (empty rows stay empty)"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+class CollaboratorIndex:
+    """The researcher-side matrices, rebuilt when the researcher side changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.generation = None
+        self._built_at = 0
+
+    def build(self, generation):
+        """
+        Two queries in one transaction: every researcher, and every
+        expert-field link
+        """
+        with transaction.atomic():
+            researchers = list(
+                Researcher.objects.order_by('pk').values_list('pk', 'interest', 'total_star').iterator()
+            )
+            links = list(Researcher.expert_fields.through.objects.values_list('researcher_id', 'field_id').iterator())
+        pks = np.array([row[0] for row in researchers], np.int64)
+        vocabulary = {}
+        interests = term_matrix([row[1] for row in researchers], vocabulary, grow=True)
+        # Smoothed IDF, as if one extra document held every term once
+        document_frequency = np.bincount(interests.indices, minlength=len(vocabulary))
+        idf = (np.log((1 + len(pks)) / (1 + document_frequency)) + 1).astype(np.float32)
+        interests = normalize_rows(interests.multiply(idf[np.newaxis, :]).tocsr())
+
+        stars = np.array([float(row[2]) for row in researchers], np.float32)
+        best = stars.max() if len(stars) else 0
+        stars = stars / best if best > 0 else np.zeros_like(stars)
+
+        # By dict, not searchsorted: a link to an unknown researcher is skipped
+        # rather than landing on a neighbour's row
+        positions = {pk: i for i, pk in enumerate(pks.tolist())}
+        field_columns = {}
+        rows, columns = [], []
+        for researcher_id, field_id in links:
+            row = positions.get(researcher_id)
+            if row is None:
+                continue
+            rows.append(row)
+            columns.append(field_columns.setdefault(field_id, len(field_columns)))
+        rows = np.array(rows, np.int64)
+        # Expertise as fields x researchers, so a work's field is one row
+        expertise = sparse.csr_matrix(
+            (np.ones(len(rows), np.float32), (np.array(columns, np.int64), rows)),
+            shape=(len(field_columns), len(pks)),
+        )
+
+        with self._lock:
+            self.pks = pks
+            self.vocabulary = vocabulary
+            self.idf = idf
+            # Transposed once here rather than per batch
+            self.interests_t = interests.T.tocsr()
+            self.stars = stars
+            self.field_columns = field_columns
+            self.expertise = expertise
+            self.generation = generation
+            self._built_at = time.monotonic()
+            self.ready = True
+
+    def ensure_ready(self, generation):
+        age = time.monotonic() - self._built_at
+        if not self.ready or age > INDEX_TTL or (generation != self.generation and age > MIN_REBUILD_SECONDS):
+            self.build(generation)
+
+    def score(self, works, limit=MAX_RECOMMEND_LIMIT):
+        """
+        {work pk: [recommendation, ...]} for [(pk, title, field, {member pks})],
+        best first, scored SCORE_BLOCK_SIZE works at a time
+        """
+        with self._lock:
+            results = {}
+            for start in range(0, len(works), SCORE_BLOCK_SIZE):
+                results.update(self._score_block(works[start:start + SCORE_BLOCK_SIZE], limit))
+            return results
+
+    def _score_block(self, works, limit):
+        titles = term_matrix([title for pk, title, field, members in works], self.vocabulary)
+        titles = normalize_rows(titles.multiply(self.idf[np.newaxis, :]).tocsr())
+        text = titles.dot(self.interests_t).toarray()
+
+        field = np.zeros_like(text)
+        columns = [self.field_columns.get(field_id) for pk, title, field_id, members in works]
+        known = [row for row, column in enumerate(columns) if column is not None]
+        if known:
+            field[known] = self.expertise[[columns[row] for row in known]].toarray()
+
+        score = FIELD_WEIGHT * field + TEXT_WEIGHT * text + STAR_WEIGHT * self.stars[np.newaxis, :]
+        score[(field == 0) & (text == 0)] = -np.inf
+        for row, (pk, title, field_id, members) in enumerate(works):
+            members = np.array(sorted(members), np.int64)
+            positions = np.searchsorted(self.pks, members)
+            found = positions < len(self.pks)
+            positions, members = positions[found], members[found]
+            score[row, positions[self.pks[positions] == members]] = -np.inf
+
+        keep = min(limit, score.shape[1])
+        if keep == 0:
+            return {pk: [] for pk, title, field_id, members in works}
+        results = {}
+        # Top `keep` per row without sorting the whole row, then order them
+        top = np.argpartition(-score, keep - 1, axis=1)[:, :keep]
+        for row, (pk, title, field_id, members) in enumerate(works):
+            candidates = top[row][np.isfinite(score[row, top[row]])]
+            candidates = candidates[np.lexsort((self.pks[candidates], -score[row, candidates]))]
+            results[pk] = [
+                {
+                    'researcher': int(self.pks[i]),
+                    'score': round(float(score[row, i]), 4),
+                    'field': float(field[row, i]),
+                    'text': round(float(text[row, i]), 4),
+                    'star': round(float(self.stars[i]), 4),
+                }
+                for i in candidates
+            ]
+        return results
+
+
+class CollaboratorCache(VersionedResultCache):
+    """Results per work: the global generation tracks the researcher side, one per work the rest"""
+
+    def work_generation_key(self, work_pk):
+        return '%s:work:%s:generation' % (self.namespace, work_pk)
+
+    def work_key(self, work_pk, generation):
+        return '%s:%s:%s:%s' % (self.namespace, generation, self.counter(self.work_generation_key(work_pk)), work_pk)
+
+    def get(self, key):
+        results = self.cache.get(key)
+        self._count(hit=results is not None)
+        return results
+
+    def set(self, key, results):
+        self.cache.set(key, results)
+
+    def forget(self, work_pk):
+        """Drop one work's entry (its title, field, members or vacancy changed)"""
+        self.bump(self.work_generation_key(work_pk))
+
+
+collaborator_index = CollaboratorIndex()
+collaborator_cache = CollaboratorCache('collaborators', alias='recommend')
+
+
+def open_works(pks=None):
+    """[(pk, title, field, {member pks})] of works open for collaboration; two queries"""
+    works = ResearchWork.objects.filter(vacancy_status=True)
+    if pks is not None:
+        works = works.filter(pk__in=pks)
+    rows = list(works.order_by('pk').values_list('pk', 'title', 'subfield__field_id'))
+    members = {}
+    links = ResearchWork.researchers.through.objects.filter(researchwork__in=[row[0] for row in rows])
+    for work_pk, researcher_pk in links.values_list('researchwork_id', 'researcher_id'):
+        members.setdefault(work_pk, set()).add(researcher_pk)
+    return [(pk, title, field, members.get(pk, set())) for pk, title, field in rows]
+
+
+def recommend_collaborators(work_pk, limit=RECOMMEND_LIMIT):
+    """Best researchers for one open work (cached); [] if it isn't open"""
+    collaborator_index.ensure_ready(collaborator_cache.generation())
+    # Keyed before scoring: if the work changes meanwhile, these results
+    # land under its old generation and are never read
+    key = collaborator_cache.work_key(work_pk, collaborator_index.generation)
+    results = collaborator_cache.get(key)
+    if results is None:
+        results = collaborator_index.score(open_works([work_pk])).get(work_pk, [])
+        collaborator_cache.set(key, results)
+    return results[:limit]
+
+
+def recommend_all():
+    """Score every open work in batches and cache each; {work pk: results}"""
+    collaborator_index.ensure_ready(collaborator_cache.generation())
+    # Keyed before the works are read, as in recommend_collaborators()
+    keys = {
+        pk: collaborator_cache.work_key(pk, collaborator_index.generation)
+        for pk in ResearchWork.objects.filter(vacancy_status=True).values_list('pk', flat=True)
+    }
+    results = collaborator_index.score([work for work in open_works() if work[0] in keys])
+    for work_pk, recommendations in results.items():
+        collaborator_cache.set(keys[work_pk], recommendations)
+    return results
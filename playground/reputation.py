@@ -0,0 +1,166 @@
+# reputation.py
+# Researcher.total_star and peer_rating, derived from the reviews
+#
+# Every Mentor and CoWorker review of a researcher is worth 0..60 points
+# (12 points = 1 star), half from its 1-5 `rating` and half from its 1-10
+# scores:
+#
+#   mentor     6 * rating + punctual_score + consistency + hard_working
+#   co-worker  6 * rating + 3 * hard_working
+#
+# Each researcher row keeps the count and point total of both kinds
+# (mentor_review_* / peer_review_*), and the ratings follow from them:
+#
+#   total_star   mean stars over all reviews, pulled towards PRIOR_STARS
+#                as if PRIOR_WEIGHT more reviews had given exactly that,
+#                so one glowing review doesn't top the ranking; 0 = unrated
+#   peer_rating  plain mean stars over the co-worker reviews
+#
+# Adding, editing or deleting a review moves its researcher's aggregates
+# by the difference with F() expressions and recomputes that one row's
+# ratings (signals.py) - two UPDATEs, whatever the number of researchers.
+# `manage.py rebuild_reputation` recomputes everyone from the review
+# tables with correlated aggregate subqueries, a batch of researchers per
+# UPDATE, for bulk loads and anything else that skipped the signals.
+#
+# QuerySet.update() skips auto_now, so both set updated_at themselves -
+# the rebuild only on rows whose values changed - to keep the change feed
+# and `since=` exports current.
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Round
+
+from .counters import REBUILD_BATCH_SIZE, pk_batches
+from .models import Researcher, Mentor, CoWorker
+
+POINTS_PER_STAR = 12
+PRIOR_STARS = 3
+PRIOR_WEIGHT = 3
+
+
+def mentor_points(review):
+    return 6 * review.rating + review.punctual_score + review.consistency + review.hard_working
+
+
+def coworker_points(review):
+    return 6 * review.rating + 3 * review.hard_working
+
+
+# review model -> (count column, points column, points in Python, points in SQL)
+AGGREGATES = {
+    Mentor: (
+        'mentor_review_count', 'mentor_review_points', mentor_points,
+        6 * F('rating') + F('punctual_score') + F('consistency') + F('hard_working'),
+    ),
+    CoWorker: (
+        'peer_review_count', 'peer_review_points', coworker_points,
+        6 * F('rating') + 3 * F('hard_working'),
+    ),
+}
+
+
+def ratings():
+    """total_star / peer_rating from the aggregate columns, as UPDATE expressions"""
+    reviews = F('mentor_review_count') + F('peer_review_count')
+    points = F('mentor_review_points') + F('peer_review_points')
+    rating_field = DecimalField(max_digits=5, decimal_places=2)
+    # Float literals so no database divides integers
+    return {
+        'total_star': Case(
+            When(Q(mentor_review_count=0, peer_review_count=0), then=Value(Decimal('0'))),
+            default=Round(
+                (Value(float(PRIOR_WEIGHT * PRIOR_STARS * POINTS_PER_STAR)) + points)
+                / (Value(float(POINTS_PER_STAR)) * (reviews + PRIOR_WEIGHT)),
+                2,
+            ),
+            output_field=rating_field,
+        ),
+        'peer_rating': Case(
+            When(peer_review_count=0, then=Value(Decimal('0'))),
+            default=Round(F('peer_review_points') / (Value(float(POINTS_PER_STAR)) * F('peer_review_count')), 2),
+            output_field=rating_field,
+        ),
+    }
+
+
+# ============================================================================
+# INCREMENTAL (pre_save / post_save / post_delete of a review)
+# ============================================================================
+def move(review_model, researcher_id, count, points):
+    """Shift one researcher's aggregates by (count, points), then rerate them"""
+    if researcher_id is None or (count == 0 and points == 0):
+        return
+    count_column, points_column = AGGREGATES[review_model][:2]
+    researcher = Researcher.objects.filter(pk=researcher_id)
+    # Two statements: MySQL would let the ratings see the new aggregates
+    # within one UPDATE, other databases the old ones
+    researcher.update(**{
+        count_column: F(count_column) + count,
+        points_column: F(points_column) + points,
+    })
+    researcher.update(**ratings(), updated_at=timezone.now())
+
+
+def remember_review(instance):
+    """Before an update: the researcher and points the stored review has now"""
+    if not instance._state.adding:
+        points_sql = AGGREGATES[type(instance)][3]
+        instance._reputation_previous = (
+            type(instance)._default_manager.filter(pk=instance.pk)
+            .annotate(_points=points_sql).values_list('researcher_id', '_points').first()
+        )
+
+
+def count_review(instance, created):
+    points = AGGREGATES[type(instance)][2](instance)
+    previous = instance.__dict__.pop('_reputation_previous', None)
+    if created:
+        move(type(instance), instance.researcher_id, 1, points)
+    elif previous is not None:
+        previous_researcher, previous_points = previous
+        if previous_researcher == instance.researcher_id:
+            move(type(instance), instance.researcher_id, 0, points - previous_points)
+        else:
+            move(type(instance), previous_researcher, -1, -previous_points)
+            move(type(instance), instance.researcher_id, 1, points)
+
+
+def uncount_review(instance):
+    move(type(instance), instance.researcher_id, -1, -AGGREGATES[type(instance)][2](instance))
+
+
+# ============================================================================
+# BATCH
+# ============================================================================
+def actual(review_model):
+    """Correlated (count, points) subqueries over `review_model` for the outer researcher"""
+    count_column, points_column, python_points, points_sql = AGGREGATES[review_model]
+    reviews = review_model._default_manager.filter(researcher=OuterRef('pk')).order_by().values('researcher')
+    return {
+        count_column: Coalesce(Subquery(reviews.annotate(n=Count('*')).values('n')), Value(0)),
+        points_column: Coalesce(Subquery(reviews.annotate(p=Sum(points_sql)).values('p')), Value(0)),
+    }
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute every researcher from the reviews, a transaction per batch; returns rows"""
+    aggregates = {}
+    for review_model in AGGREGATES:
+        aggregates.update(actual(review_model))
+    columns = [*aggregates, 'total_star', 'peer_rating']
+    rows = 0
+    for pks in pk_batches(Researcher, batch_size):
+        with transaction.atomic():
+            researchers = Researcher.objects.filter(pk__in=pks)
+            before = set(researchers.values_list('pk', *columns))
+            researchers.update(**aggregates)
+            researchers.update(**ratings())
+            changed = [row[0] for row in researchers.values_list('pk', *columns) if row not in before]
+            if changed:
+                Researcher.objects.filter(pk__in=changed).update(updated_at=timezone.now())
+        rows += len(pks)
+    return rows
@@ -0,0 +1,353 @@
+# search.py
+# Full-text search over the research taxonomy (Field + Subfield) and, via
+# search_entities(), over every other searchable model
+#
+# Production (MySQL) uses the FULLTEXT indexes created in migrations 0003
+# and 0005. Local and test runs (SQLite) use the shared FTS5 table kept in
+# sync by triggers from the same migrations. Any other backend falls back
+# to icontains.
+
+import base64
+import binascii
+import json
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork,
+    ProjectColab, QueryPost, FundingProposal,
+)
+
+# Words are matched as prefixes, so "data" also finds "Database"
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Result pages are keyset-paginated in Field's default ordering (domain, name)
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+
+# Unified search returns at most this many hits per entity type
+ENTITY_HITS_PER_TYPE = 5
+MAX_ENTITY_HITS_PER_TYPE = 50
+
+TAXONOMY_KINDS = ('field', 'subfield')
+
+
+class EntityType:
+    """One searchable model: its index kind, label and full-text columns"""
+
+    def __init__(self, kind, model, label, columns):
+        self.kind = kind
+        self.model = model
+        self.label = label
+        self.columns = columns
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def pk_column(self):
+        return self.model._meta.pk.column
+
+
+# Columns match migrations 0003/0005 (and the admin's search_fields)
+ENTITY_TYPES = [
+    EntityType('field', Field, 'name', ('name', 'domain', 'area')),
+    EntityType('subfield', Subfield, 'name', ('name', 'domain', 'field_type')),
+    EntityType('problem', Problem, 'name', ('name', 'description')),
+    EntityType('research_work', ResearchWork, 'title', ('title', 'author_name')),
+    EntityType('researcher', Researcher, 'name', ('name', 'institution', 'interest')),
+    EntityType('project_colab', ProjectColab, 'title', ('title', 'content')),
+    EntityType('query_post', QueryPost, 'title', ('title', 'content')),
+    EntityType('funding_proposal', FundingProposal, 'title', ('title', 'content')),
+]
+ENTITY_TYPES_BY_KIND = {entity.kind: entity for entity in ENTITY_TYPES}
+
+
+def tokenize(query):
+    """Split a raw search string into lowercase word tokens"""
+    return [token.lower() for token in TOKEN_RE.findall(query or '')]
+
+
+# ============================================================================
+# BACKEND: SQLITE FTS5
+# ============================================================================
+class SQLiteFTSBackend:
+    """FTS5 virtual table search, ranked by FTS5 `rank` (bm25, lower is better)"""
+    vendor = 'sqlite'
+
+    def build_match(self, tokens):
+        # Every token must match (implicit AND), each as a quoted prefix
+        return ' '.join('"%s"*' % token for token in tokens)
+
+    def match_filter(self, tokens):
+        return Q(name__in=RawSQL(
+            "SELECT d.field_name FROM search_fts "
+            "JOIN search_document d ON d.doc_id = search_fts.rowid "
+            "WHERE search_fts MATCH %s AND d.kind IN ('field', 'subfield')",
+            [self.build_match(tokens)],
+        ))
+
+    def entity_hits(self, tokens, entities, per_type):
+        """
+        Best `per_type` hits of each entity type plus per-type totals, from
+        ONE pass over the index: [(kind, pk, score, total), ...]
+        """
+        kinds = [entity.kind for entity in entities]
+        sql = """
+            SELECT kind, pk, score, total FROM (
+                SELECT d.kind AS kind, d.pk AS pk, hits.score AS score,
+                       ROW_NUMBER() OVER (PARTITION BY d.kind ORDER BY hits.score, d.pk) AS position,
+                       COUNT(*) OVER (PARTITION BY d.kind) AS total
+                FROM (
+                    SELECT rowid AS doc_id, rank AS score
+                    FROM search_fts
+                    WHERE search_fts MATCH %%s
+                ) hits
+                JOIN search_document d ON d.doc_id = hits.doc_id
+                WHERE d.kind IN (%s)
+            ) ranked
+            WHERE position <= %%s
+            ORDER BY score
+        """ % ', '.join(['%s'] * len(kinds))
+        params = [self.build_match(tokens), *kinds, per_type]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # bm25: lower is better, so flip the sign to make higher better
+            return [(kind, pk, -score, total) for kind, pk, score, total in cursor.fetchall()]
+
+
+# ============================================================================
+# BACKEND: MYSQL FULLTEXT
+# ============================================================================
+class MySQLFullTextBackend:
+    """InnoDB FULLTEXT search in boolean mode, ranked by MATCH relevance"""
+    vendor = 'mysql'
+
+    # innodb_ft_min_token_size default; shorter words are never indexed
+    min_token_size = 3
+
+    def build_match(self, tokens):
+        return ' '.join('+%s*' % token for token in tokens)
+
+    def indexable(self, tokens):
+        # e.g. "AI" is shorter than the minimum token size and never indexed
+        return all(len(token) >= self.min_token_size for token in tokens)
+
+    def match_filter(self, tokens):
+        if not self.indexable(tokens):
+            return LikeBackend().match_filter(tokens)
+
+        match = self.build_match(tokens)
+        return Q(name__in=RawSQL(
+            "SELECT name FROM field "
+            "WHERE MATCH(name, domain, area) AGAINST (%s IN BOOLEAN MODE) "
+            "UNION "
+            "SELECT field_id FROM subfield "
+            "WHERE MATCH(name, domain, field_type) AGAINST (%s IN BOOLEAN MODE)",
+            [match, match],
+        ))
+
+    def entity_hits(self, tokens, entities, per_type):
+        """
+        Best `per_type` hits of each table (one LIMITed FULLTEXT lookup per
+        table) in one query, then the per-table totals in a second one.
+        """
+        if not self.indexable(tokens):
+            return LikeBackend().entity_hits(tokens, entities, per_type)
+
+        match = self.build_match(tokens)
+        hit_selects = []
+        count_selects = []
+        hit_params = []
+        count_params = []
+        for entity in entities:
+            against = 'MATCH(%s) AGAINST (%%s IN BOOLEAN MODE)' % ', '.join(entity.columns)
+            hit_selects.append(
+                "(SELECT '%s' AS kind, %s AS pk, %s AS score FROM %s WHERE %s "
+                "ORDER BY score DESC LIMIT %%s)"
+                % (entity.kind, entity.pk_column, against, entity.table, against)
+            )
+            hit_params += [match, match, per_type]
+            count_selects.append(
+                "SELECT '%s', COUNT(*) FROM %s WHERE %s" % (entity.kind, entity.table, against)
+            )
+            count_params.append(match)
+
+        with connection.cursor() as cursor:
+            cursor.execute(' UNION ALL '.join(count_selects), count_params)
+            totals = dict(cursor.fetchall())
+            cursor.execute(' UNION ALL '.join(hit_selects) + ' ORDER BY score DESC', hit_params)
+            return [(kind, pk, score, totals[kind]) for kind, pk, score in cursor.fetchall()]
+
+
+# ============================================================================
+# BACKEND: FALLBACK (no full-text support)
+# ============================================================================
+class LikeBackend:
+    """Plain icontains scan, used when no full-text index is available"""
+    vendor = None
+
+    def filters(self, tokens):
+        field_filter = Q()
+        subfield_filter = Q()
+        for token in tokens:
+            field_filter &= (
+                Q(name__icontains=token) |
+                Q(domain__icontains=token) |
+                Q(area__icontains=token)
+            )
+            subfield_filter &= (
+                Q(name__icontains=token) |
+                Q(domain__icontains=token) |
+                Q(field_type__icontains=token)
+            )
+        return field_filter, subfield_filter
+
+    def match_filter(self, tokens):
+        field_filter, subfield_filter = self.filters(tokens)
+        return field_filter | Q(name__in=Subfield.objects.filter(subfield_filter).values('field_id'))
+
+    def entity_hits(self, tokens, entities, per_type):
+        """icontains scan per entity type; no relevance, so every hit scores 0"""
+        hits = []
+        for entity in entities:
+            condition = Q()
+            for token in tokens:
+                token_condition = Q()
+                for column in entity.columns:
+                    token_condition |= Q(**{'%s__icontains' % column: token})
+                condition &= token_condition
+            matches = entity.model.objects.filter(condition)
+            total = matches.count()
+            if total:
+                for pk in matches.values_list('pk', flat=True)[:per_type]:
+                    hits.append((entity.kind, pk, 0.0, total))
+        return hits
+
+
+BACKENDS = {
+    backend.vendor: backend
+    for backend in (SQLiteFTSBackend, MySQLFullTextBackend)
+}
+
+
+def get_backend():
+    """Pick the search backend that matches the active database"""
+    return BACKENDS.get(connection.vendor, LikeBackend)()
+
+
+# ============================================================================
+# KEYSET PAGINATION
+# ============================================================================
+def encode_cursor(field):
+    """Opaque cursor pointing just past `field` in (domain, name) order"""
+    raw = json.dumps([field.domain, field.name]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(domain, name) from a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        domain, name = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        return None
+    if not isinstance(domain, str) or not isinstance(name, str):
+        return None
+    return domain, name
+
+
+def clamp_page_size(size):
+    """Parse a requested page size, capped at MAX_SEARCH_PAGE_SIZE"""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        return SEARCH_PAGE_SIZE
+    return max(1, min(size, MAX_SEARCH_PAGE_SIZE))
+
+
+def search_fields_page(query, cursor=None, size=SEARCH_PAGE_SIZE):
+    """
+    One page of Fields matching `query`, in (domain, name) order.
+    Returns (fields, next_cursor); next_cursor is None on the last page.
+
+    Seeks past the cursor instead of using OFFSET, so every page costs the
+    same no matter how deep into the results it is.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return [], None
+
+    fields = Field.objects.filter(get_backend().match_filter(tokens))
+    after = decode_cursor(cursor)
+    if after is not None:
+        domain, name = after
+        fields = fields.filter(Q(domain__gt=domain) | Q(domain=domain, name__gt=name))
+
+    # One extra row tells us whether another page exists
+    fields = list(fields.order_by('domain', 'name')[:size + 1])
+    if len(fields) > size:
+        fields = fields[:size]
+        return fields, encode_cursor(fields[-1])
+    return fields, None
+
+
+# ============================================================================
+# UNIFIED MULTI-ENTITY SEARCH
+# ============================================================================
+def search_entities(query, kinds=None, per_type=ENTITY_HITS_PER_TYPE):
+    """
+    Search every entity type (or only `kinds`) through the shared index.
+
+    Returns {'hits': [...], 'facets': {kind: total}}. Hits are dicts with
+    kind, pk, label, score and object, merged across types best first;
+    each type contributes at most `per_type` of them, so the work per type
+    stays bounded however many rows match.
+    """
+    tokens = tokenize(query)
+    entities = [
+        entity for entity in ENTITY_TYPES
+        if kinds is None or entity.kind in kinds
+    ]
+    if not tokens or not entities:
+        return {'hits': [], 'facets': {}}
+
+    rows = get_backend().entity_hits(tokens, entities, per_type)
+
+    facets = {}
+    pks_by_kind = {}
+    for kind, pk, score, total in rows:
+        facets[kind] = total
+        pks_by_kind.setdefault(kind, []).append(ENTITY_TYPES_BY_KIND[kind].model._meta.pk.to_python(pk))
+
+    # One in_bulk query per entity type that actually has hits; no ordering,
+    # so Subfield's default ordering doesn't join back to field
+    objects = {
+        kind: ENTITY_TYPES_BY_KIND[kind].model.objects.order_by().in_bulk(pks)
+        for kind, pks in pks_by_kind.items()
+    }
+
+    hits = []
+    for kind, pk, score, total in rows:
+        entity = ENTITY_TYPES_BY_KIND[kind]
+        obj = objects[kind].get(entity.model._meta.pk.to_python(pk))
+        if obj is None:
+            continue  # deleted between the index read and the fetch
+        hits.append({
+            'kind': kind,
+            'pk': obj.pk,
+            'label': getattr(obj, entity.label),
+            'score': score,
+            'object': obj,
+        })
+    hits.sort(key=lambda hit: hit['score'], reverse=True)
+
+    return {
+        'hits': hits,
+        'facets': {entity.kind: facets[entity.kind] for entity in entities if entity.kind in facets},
+    }
@@ -0,0 +1,274 @@
+# signals.py
+# Model signal receivers - connected in PlaygroundConfig.ready()
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import changes, counters, messaging, realtime, reputation
+from .cache import field_search_cache
+from .facets import FACETS, facet_counts
+from .friend_graph import friend_graph
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork,
+    QueryPost, FundingProposal, Conversation, Message, Mentor, CoWorker,
+)
+from .recommend import collaborator_cache
+from .suggest import suggestion_index
+from . import trigram
+
+
+# ============================================================================
+# FIELD SEARCH CACHE INVALIDATION
+# ============================================================================
+@receiver(post_save, sender=Field)
+@receiver(post_delete, sender=Field)
+@receiver(post_save, sender=Subfield)
+@receiver(post_delete, sender=Subfield)
+def invalidate_field_search_cache(sender, **kwargs):
+    field_search_cache.invalidate()
+
+
+# ============================================================================
+# AUTOCOMPLETE PREFIX INDEX
+# ============================================================================
+@receiver(post_save, sender=Field)
+@receiver(post_save, sender=Subfield)
+@receiver(post_save, sender=Problem)
+@receiver(post_save, sender=ResearchWork)
+def index_suggestion(sender, instance, **kwargs):
+    suggestion_index.update(instance)
+
+
+@receiver(post_delete, sender=Field)
+@receiver(post_delete, sender=Subfield)
+@receiver(post_delete, sender=Problem)
+@receiver(post_delete, sender=ResearchWork)
+def unindex_suggestion(sender, instance, **kwargs):
+    suggestion_index.remove(instance)
+
+
+# ============================================================================
+# FUZZY NAME TRIGRAM INDEX
+# ============================================================================
+@receiver(post_save, sender=Field)
+@receiver(post_save, sender=Researcher)
+def index_name_trigrams(sender, instance, **kwargs):
+    trigram.index_instance(instance)
+
+
+@receiver(post_delete, sender=Field)
+@receiver(post_delete, sender=Researcher)
+def unindex_name_trigrams(sender, instance, **kwargs):
+    trigram.unindex_instance(instance)
+
+
+# ============================================================================
+# ADMIN FACET COUNTS
+# ============================================================================
+# Connected per model in FACETS below; facet_counts.tracked() then skips
+# the columns no sidebar has counted yet
+def remember_facet_values(sender, instance, **kwargs):
+    attnames = facet_counts.tracked(sender)
+    if attnames and not instance._state.adding:
+        instance._facet_previous = (
+            sender._default_manager.filter(pk=instance.pk).values(*attnames).first()
+        )
+
+
+def count_facet_values(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop('_facet_previous', None)
+    if not created and previous is None:
+        return
+    for attname in facet_counts.tracked(sender):
+        value = getattr(instance, attname)
+        if previous is not None:
+            if previous.get(attname) == value:
+                continue
+            facet_counts.adjust(sender, attname, previous.get(attname), -1)
+        facet_counts.adjust(sender, attname, value, 1)
+
+
+def uncount_facet_values(sender, instance, **kwargs):
+    for attname in facet_counts.tracked(sender):
+        facet_counts.adjust(sender, attname, getattr(instance, attname), -1)
+
+
+# A sender-less receiver would run on every save and disable fast deletes
+# (Collector.can_fast_delete) for every model
+for model in FACETS:
+    pre_save.connect(remember_facet_values, sender=model)
+    post_save.connect(count_facet_values, sender=model)
+    post_delete.connect(uncount_facet_values, sender=model)
+
+
+# ============================================================================
+# COUNTER CACHES
+# ============================================================================
+@receiver(pre_save, sender=Subfield)
+@receiver(pre_save, sender=Problem)
+@receiver(pre_save, sender=FundingProposal)
+@receiver(pre_save, sender=Message)
+def remember_counter_parents(sender, instance, **kwargs):
+    counters.remember_parents(instance)
+
+
+@receiver(post_save, sender=Subfield)
+@receiver(post_save, sender=Problem)
+@receiver(post_save, sender=FundingProposal)
+@receiver(post_save, sender=Message)
+def count_saved_row(sender, instance, created, **kwargs):
+    counters.count_saved(instance, created)
+
+
+@receiver(post_delete, sender=Subfield)
+@receiver(post_delete, sender=Problem)
+@receiver(post_delete, sender=FundingProposal)
+@receiver(post_delete, sender=Message)
+def count_deleted_row(sender, instance, **kwargs):
+    counters.count_deleted(instance)
+
+
+@receiver(m2m_changed, sender=Researcher.friends.through)
+@receiver(m2m_changed, sender=Researcher.expert_fields.through)
+@receiver(m2m_changed, sender=ResearchWork.researchers.through)
+@receiver(m2m_changed, sender=QueryPost.feedback_from.through)
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def count_m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    counters.count_m2m_changed(sender, instance, action, reverse, model, pk_set)
+
+
+@receiver(pre_delete, sender=Researcher)
+@receiver(pre_delete, sender=Field)
+@receiver(pre_delete, sender=ResearchWork)
+def remember_counter_links(sender, instance, **kwargs):
+    counters.remember_linked(instance)
+
+
+@receiver(post_delete, sender=Researcher)
+@receiver(post_delete, sender=Field)
+@receiver(post_delete, sender=ResearchWork)
+def count_unlinked_rows(sender, instance, **kwargs):
+    counters.count_unlinked(instance)
+
+
+# ============================================================================
+# FRIEND GRAPH
+# ============================================================================
+@receiver(m2m_changed, sender=Researcher.friends.through)
+def update_friend_graph(sender, instance, action, pk_set, **kwargs):
+    friend_graph.m2m_changed(instance, action, pk_set)
+
+
+@receiver(post_delete, sender=Researcher)
+def drop_from_friend_graph(sender, instance, **kwargs):
+    friend_graph.researcher_deleted(instance.pk)
+
+
+# ============================================================================
+# COLLABORATOR RECOMMENDATIONS
+# ============================================================================
+@receiver(post_save, sender=ResearchWork)
+@receiver(post_delete, sender=ResearchWork)
+def forget_work_recommendations(sender, instance, **kwargs):
+    collaborator_cache.forget(instance.pk)
+
+
+@receiver(m2m_changed, sender=ResearchWork.researchers.through)
+def forget_member_recommendations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        collaborator_cache.forget(instance.pk)
+    elif pk_set is not None:
+        # A researcher joined / left these works
+        for work_pk in pk_set:
+            collaborator_cache.forget(work_pk)
+    else:
+        # research_works.clear() doesn't say which works they left
+        collaborator_cache.invalidate()
+
+
+@receiver(post_save, sender=Researcher)
+@receiver(post_delete, sender=Researcher)
+@receiver(post_save, sender=Field)
+@receiver(post_delete, sender=Field)
+@receiver(post_save, sender=Subfield)
+@receiver(post_delete, sender=Subfield)
+@receiver(m2m_changed, sender=Researcher.expert_fields.through)
+def invalidate_recommendations(sender, **kwargs):
+    collaborator_cache.invalidate()
+
+
+# ============================================================================
+# REPUTATION
+# ============================================================================
+@receiver(pre_save, sender=Mentor)
+@receiver(pre_save, sender=CoWorker)
+def remember_review(sender, instance, **kwargs):
+    reputation.remember_review(instance)
+
+
+@receiver(post_save, sender=Mentor)
+@receiver(post_save, sender=CoWorker)
+def count_review(sender, instance, created, **kwargs):
+    reputation.count_review(instance, created)
+
+
+@receiver(post_delete, sender=Mentor)
+@receiver(post_delete, sender=CoWorker)
+def uncount_review(sender, instance, **kwargs):
+    reputation.uncount_review(instance)
+
+
+# ============================================================================
+# INBOX LAST-MESSAGE POINTER
+# ============================================================================
+@receiver(post_save, sender=Message)
+def record_last_message(sender, instance, created, **kwargs):
+    if created:
+        messaging.record_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def repoint_last_message(sender, instance, **kwargs):
+    messaging.repoint_last_message(instance.conversation_id)
+
+
+# ============================================================================
+# UNREAD COUNTERS
+# ============================================================================
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    if created:
+        messaging.count_unread(instance)
+
+
+@receiver(post_delete, sender=Message)
+def uncount_unread_message(sender, instance, **kwargs):
+    messaging.uncount_unread(instance)
+
+
+@receiver(pre_delete, sender=Conversation)
+def release_unread_messages(sender, instance, **kwargs):
+    messaging.release_unread(instance.pk)
+
+
+# ============================================================================
+# LIVE DELIVERY
+# ============================================================================
+@receiver(post_save, sender=Message)
+def publish_new_message(sender, instance, created, **kwargs):
+    if created:
+        realtime.publish_message(instance)
+
+
+# ============================================================================
+# CHANGE FEED TOMBSTONES
+# ============================================================================
+def record_tombstone(sender, instance, **kwargs):
+    changes.record_delete(instance)
+
+
+# Per model, like the facet receivers, so other models keep fast deletes
+for model in changes.FEEDS.values():
+    post_delete.connect(record_tombstone, sender=model)
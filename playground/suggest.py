@@ -0,0 +1,164 @@
+# suggest.py
+# In-process prefix index for search-box autocomplete
+#
+# Every Field, Subfield, Problem and ResearchWork title is stored once per
+# word it contains, as (lowercase text from that word on, label, kind, pk)
+# in ONE sorted list. A lookup is a bisect to the first key starting with
+# the prefix plus a short forward scan, so it never touches the database.
+# The index is built once per process (wsgi.py / asgi.py warm it at startup)
+# and kept current by the model signals in signals.py. Signals only reach
+# the process that saved, so each change also bumps a shared generation
+# (suggestion_generation, in the search cache): other processes rebuild
+# when it moves - at most every MIN_REBUILD_SECONDS - and every SUGGEST_TTL
+# regardless, which also covers a per-process cache and bulk writes.
+
+import bisect
+import threading
+import time
+
+from django.db import DatabaseError
+
+from .cache import VersionedResultCache
+from .models import Field, Subfield, Problem, ResearchWork
+from .search import tokenize
+
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+
+# Stop scanning after this many keys even if not enough distinct labels
+# were found, so one very common prefix can't turn into a long walk
+MAX_SCAN = 200
+
+# Changes made by other processes rebuild the index no more often than this
+MIN_REBUILD_SECONDS = 30
+# ...and it is rebuilt this often regardless
+SUGGEST_TTL = 600
+
+
+# (kind, model, title attribute) - pk is always the model's primary key
+SOURCES = (
+    ('field', Field, 'name'),
+    ('subfield', Subfield, 'name'),
+    ('problem', Problem, 'name'),
+    ('research_work', ResearchWork, 'title'),
+)
+KIND_BY_MODEL = {model: (kind, attr) for kind, model, attr in SOURCES}
+
+
+def index_keys(label):
+    """One key per word start: 'Deep Learning' -> ['deep learning', 'learning']"""
+    words = tokenize(label)
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PrefixIndex:
+    """Sorted-array prefix index with incremental add/remove"""
+
+    def __init__(self):
+        self._entries = []  # sorted (key, label, kind, pk)
+        self._keys_by_object = {}  # (kind, pk) -> [entry, ...]
+        self._lock = threading.Lock()
+        self.ready = False
+        self.generation = None
+        self._built_at = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def build(self):
+        """(Re)load every title from the database in one query per model"""
+        # Read before the rows, so a change made meanwhile rebuilds again
+        generation = suggestion_generation.generation()
+        entries = []
+        keys_by_object = {}
+        for kind, model, attr in SOURCES:
+            for pk, label in model.objects.order_by().values_list('pk', attr).iterator():
+                object_entries = [(key, label, kind, pk) for key in index_keys(label)]
+                keys_by_object[(kind, pk)] = object_entries
+                entries.extend(object_entries)
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._keys_by_object = keys_by_object
+            self.generation = generation
+            self._built_at = time.monotonic()
+            self.ready = True
+
+    def warm(self):
+        """Build at startup, tolerating a database that isn't migrated yet"""
+        try:
+            self.build()
+        except DatabaseError:
+            # First request will try again through ensure_ready()
+            pass
+
+    def ensure_ready(self):
+        """Build if never built, stale, or changed by another process"""
+        age = time.monotonic() - self._built_at
+        if (not self.ready or age > SUGGEST_TTL
+                or (suggestion_generation.generation() != self.generation and age > MIN_REBUILD_SECONDS)):
+            self.build()
+
+    def _publish(self):
+        """Start a new shared generation; this process already has the change"""
+        current = self.generation == suggestion_generation.generation()
+        suggestion_generation.invalidate()
+        if current:
+            self.generation = suggestion_generation.generation()
+
+    def _remove_locked(self, kind, pk):
+        for entry in self._keys_by_object.pop((kind, pk), ()):
+            i = bisect.bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def update(self, instance):
+        """Index (or re-index) one saved model instance"""
+        if self.ready:  # otherwise the full build will pick it up
+            kind, attr = KIND_BY_MODEL[type(instance)]
+            label = getattr(instance, attr)
+            with self._lock:
+                self._remove_locked(kind, instance.pk)
+                object_entries = [(key, label, kind, instance.pk) for key in index_keys(label)]
+                for entry in object_entries:
+                    bisect.insort(self._entries, entry)
+                self._keys_by_object[(kind, instance.pk)] = object_entries
+        self._publish()
+
+    def remove(self, instance):
+        """Drop one deleted model instance"""
+        if self.ready:
+            kind, attr = KIND_BY_MODEL[type(instance)]
+            with self._lock:
+                self._remove_locked(kind, instance.pk)
+        self._publish()
+
+    def lookup(self, prefix, limit=SUGGEST_LIMIT):
+        """Up to `limit` distinct {'label', 'kind'} whose words start with `prefix`"""
+        prefix = ' '.join(tokenize(prefix))
+        if not prefix:
+            return []
+
+        # update() edits the list in place, so copy the window out under
+        # the lock: a bisect plus at most MAX_SCAN entries
+        with self._lock:
+            start = bisect.bisect_left(self._entries, (prefix,))
+            window = self._entries[start:start + MAX_SCAN]
+
+        suggestions = []
+        seen = set()
+        for key, label, kind, pk in window:
+            if not key.startswith(prefix):
+                break
+            if (label, kind) in seen:
+                continue
+            seen.add((label, kind))
+            suggestions.append({'label': label, 'kind': kind})
+            if len(suggestions) >= limit:
+                break
+        return suggestions
+
+
+# Shared by the suggest view, the model signals and the startup warm-up
+suggestion_generation = VersionedResultCache('suggest')
+suggestion_index = PrefixIndex()
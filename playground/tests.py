@@ -1,3 +1,2019 @@
+import asyncio
+import csv
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.db.models.deletion import Collector
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import coauthorship, recommend, trigram
+from .admin import CachedFacetListFilter
+from .benchmarks import sort_plan
+from .cache import field_search_cache
+from .changes import changes
+from .counters import COUNTERS
+from .exporter import export_stream, iterate_in_thread
+from .importer import import_file
+from .messaging import inbox, mark_read, message_history, read_receipts
+from .facets import FACETS, facet_counts
+from .friend_graph import FriendGraph, friend_graph
+from .reputation import move
+from .recommend import collaborator_cache, collaborator_index, recommend_all, recommend_collaborators
+from .realtime import get_broker, message_events, stream_application
+from .models import (
+    Field, Subfield, Problem, Researcher, ResearchWork, FundingInstitution,
+    ProjectColab, QueryPost, FundingProposal, Conversation, Message,
+    Mentor, CoWorker, Collaboration, NameTrigram, ReadMarker, Tombstone,
+)
+from .search import MAX_SEARCH_PAGE_SIZE, search_fields_page
+from .suggest import suggestion_generation, suggestion_index
+from .views import SUBFIELD_PREVIEW_SIZE
+
+
+# ============================================================================
+# QUERY BUDGET HARNESS
+# ============================================================================
+class QueryBudgetMixin:
+    """
+    assertQueryBudget fails when the block sends more than `budget` queries,
+    listing every captured statement so the offending lazy load is obvious.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with CaptureQueriesContext(connection) as captured:
+            yield captured
+        if len(captured) > budget:
+            statements = '\n'.join(
+                '%d. %s' % (i, query['sql'])
+                for i, query in enumerate(captured.captured_queries, start=1)
+            )
+            self.fail('%d queries executed, budget is %d:\n%s' % (len(captured), budget, statements))
+
+
+# ============================================================================
+# FULL-TEXT SEARCH
+# ============================================================================
+class FieldSearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ml = Field.objects.create(
+            name='Machine Learning', domain='Computer Science',
+            area='Artificial Intelligence', field_type='Applied',
+        )
+        cls.db = Field.objects.create(
+            name='Database Systems', domain='Computer Science',
+            area='Data Management', field_type='Applied',
+        )
+        cls.physics = Field.objects.create(
+            name='Physics', domain='Natural Science',
+            area='Quantum Mechanics', field_type='Theoretical',
+        )
+        Subfield.objects.create(
+            name='Deep Learning', field=cls.ml,
+            domain='Neural Networks', field_type='Applied',
+        )
+
+    def names(self, query):
+        fields, next_cursor = search_fields_page(query, size=MAX_SEARCH_PAGE_SIZE)
+        return [field.name for field in fields]
+
+    def test_blank_query_returns_nothing(self):
+        self.assertEqual(search_fields_page('   '), ([], None))
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.names('machine learning'), ['Machine Learning'])
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.names('datab'), ['Database Systems'])
+
+    def test_subfield_hit_returns_parent_field(self):
+        self.assertEqual(self.names('neural'), ['Machine Learning'])
+
+    def test_direct_and_subfield_hits_in_field_ordering(self):
+        Field.objects.create(
+            name='Deep Learning Theory', domain='Mathematics',
+            area='Learning Theory', field_type='Theoretical',
+        )
+        self.assertEqual(self.names('deep'), ['Machine Learning', 'Deep Learning Theory'])
+
+    def test_page_size(self):
+        fields, next_cursor = search_fields_page('science', size=1)
+        self.assertEqual(len(fields), 1)
+        self.assertIsNotNone(next_cursor)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.physics.area = 'Astrophysics'
+        self.physics.save()
+        self.assertEqual(self.names('astrophysics'), ['Physics'])
+        self.assertEqual(self.names('quantum'), [])
+
+        Subfield.objects.filter(name='Deep Learning').delete()
+        self.assertEqual(self.names('neural'), [])
+
+        self.physics.delete()
+        self.assertEqual(self.names('physics'), [])
+
+    def test_only_indexed_columns_reindex(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite trigger-maintained index')
+
+        def document():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT doc_id FROM search_document WHERE kind = 'field' AND pk = %s", [self.physics.pk])
+                return cursor.fetchone()[0]
+
+        indexed = document()
+        Field.objects.filter(pk=self.physics.pk).update(subfield_count=5, field_type='Applied')
+        self.physics.save()
+        self.assertEqual(document(), indexed)
+        Field.objects.filter(pk=self.physics.pk).update(area='Optics')
+        self.assertNotEqual(document(), indexed)
+        self.assertEqual(self.names('optics'), ['Physics'])
+
+
+# ============================================================================
+# FIELD SEARCH VIEW
+# ============================================================================
+class FieldSearchViewQueryTests(QueryBudgetMixin, TestCase):
+    # 1 keyset page of fields + 1 windowed subfield preview
+    SEARCH_QUERY_BUDGET = 2
+
+    def setUp(self):
+        field_search_cache.cache.clear()
+
+    def create_fields(self, count, subfields_each):
+        for i in range(count):
+            field = Field.objects.create(
+                name='Robotics %d' % i, domain='Engineering',
+                area='Automation', field_type='Applied',
+            )
+            for j in range(subfields_each):
+                Subfield.objects.create(
+                    name='Robotics %d.%d' % (i, j), field=field,
+                    domain='Control', field_type='Applied',
+                )
+
+    def search(self, query):
+        with self.assertQueryBudget(self.SEARCH_QUERY_BUDGET):
+            response = self.client.get(reverse('field_search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_budget_holds_for_no_results(self):
+        response = self.search('nothing')
+        self.assertEqual(response.context['results'], [])
+
+    def test_budget_holds_for_one_result(self):
+        self.create_fields(1, 3)
+        response = self.search('robotics')
+        field, subfields, total = response.context['results'][0]
+        self.assertEqual(len(subfields), 3)
+
+    def test_budget_does_not_grow_with_result_size(self):
+        self.create_fields(25, 4)
+        response = self.search('robotics')
+        self.assertEqual(len(response.context['results']), 20)
+        self.assertContains(response, 'Robotics 19.3')
+
+    def test_empty_query_runs_no_queries(self):
+        with self.assertQueryBudget(0):
+            self.client.get(reverse('field_search'))
+
+
+# ============================================================================
+# FIELD SEARCH CACHE
+# ============================================================================
+class FieldSearchCacheTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ml = Field.objects.create(
+            name='Machine Learning', domain='Computer Science',
+            area='Artificial Intelligence', field_type='Applied',
+        )
+
+    def setUp(self):
+        field_search_cache.cache.clear()
+        field_search_cache.reset_stats()
+
+    def search(self, query):
+        return self.client.get(reverse('field_search'), {'q': query})
+
+    def test_repeated_query_is_served_from_cache(self):
+        self.search('Machine Learning')
+        with self.assertQueryBudget(0):
+            response = self.search('learning,  MACHINE')
+        self.assertEqual(response.context['fields'], [self.ml])
+        stats = field_search_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_field_save_invalidates(self):
+        self.search('robotics')
+        generation = field_search_cache.generation()
+        Field.objects.create(
+            name='Robotics', domain='Engineering',
+            area='Automation', field_type='Applied',
+        )
+        self.assertEqual(field_search_cache.generation(), generation + 1)
+        self.assertEqual(len(self.search('robotics').context['fields']), 1)
+
+    def test_subfield_delete_invalidates(self):
+        subfield = Subfield.objects.create(
+            name='Deep Learning', field=self.ml,
+            domain='Neural Networks', field_type='Applied',
+        )
+        results = self.search('machine').context['results']
+        self.assertEqual(len(results[0][1]), 1)
+        subfield.delete()
+        results = self.search('machine').context['results']
+        self.assertEqual(results[0][1], [])
+        self.assertEqual(field_search_cache.stats()['hits'], 0)
+
+
+# ============================================================================
+# KEYSET PAGINATION
+# ============================================================================
+class FieldSearchPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(7):
+            field = Field.objects.create(
+                name='Optics %d' % i, domain='Physics %d' % (i % 3),
+                area='Light', field_type='Applied',
+            )
+        for j in range(10):
+            Subfield.objects.create(
+                name='Lens %02d' % j, field=field,
+                domain='Optics', field_type='Applied',
+            )
+
+    def setUp(self):
+        field_search_cache.cache.clear()
+
+    def search(self, **params):
+        return self.client.get(reverse('field_search'), params).context
+
+    def test_cursor_walks_every_match_once_in_field_ordering(self):
+        seen = []
+        context = self.search(q='optics', size=3)
+        while True:
+            seen.extend(field.name for field in context['fields'])
+            if not context['next_cursor']:
+                break
+            context = self.search(q='optics', size=3, after=context['next_cursor'])
+        expected = list(Field.objects.values_list('name', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(self.search(q='optics', size=10000)['size'], MAX_SEARCH_PAGE_SIZE)
+
+    def test_malformed_cursor_starts_from_first_page(self):
+        context = self.search(q='optics', size=3, after='not-a-cursor')
+        self.assertEqual(context['fields'][0].name, 'Optics 0')
+
+    def test_subfields_are_previewed_with_a_total(self):
+        context = self.search(q='optics 6')
+        field, subfields, total = context['results'][0]
+        self.assertEqual(len(subfields), SUBFIELD_PREVIEW_SIZE)
+        self.assertEqual(total, 10)
+
+    def test_load_more_subfields(self):
+        url = reverse('field_subfields')
+        page = self.client.get(url, {'field': 'Optics 6', 'after': 'Lens 05'}).json()
+        self.assertEqual([row['name'] for row in page['subfields']],
+                         ['Lens 06', 'Lens 07', 'Lens 08', 'Lens 09'])
+        self.assertIsNone(page['next'])
+
+
+# ============================================================================
+# AUTOCOMPLETE
+# ============================================================================
+class SearchSuggestTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ml = Field.objects.create(
+            name='Machine Learning', domain='Computer Science',
+            area='Artificial Intelligence', field_type='Applied',
+        )
+        cls.deep = Subfield.objects.create(
+            name='Deep Learning', field=cls.ml,
+            domain='Neural Networks', field_type='Applied',
+        )
+
+    def setUp(self):
+        suggestion_index.build()
+
+    def suggest(self, query, **params):
+        response = self.client.get(reverse('search_suggest'), {'q': query, **params})
+        return [(row['label'], row['kind']) for row in response.json()['suggestions']]
+
+    def test_prefix_matches_any_word(self):
+        self.assertEqual(self.suggest('lea'), [
+            ('Deep Learning', 'subfield'),
+            ('Machine Learning', 'field'),
+        ])
+        self.assertEqual(self.suggest('machine le'), [('Machine Learning', 'field')])
+
+    def test_lookup_never_touches_the_database(self):
+        with self.assertQueryBudget(0):
+            self.suggest('mach')
+
+    def test_limit(self):
+        self.assertEqual(len(self.suggest('learning', limit=1)), 1)
+        self.assertEqual(self.suggest(''), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        work = ResearchWork.objects.create(
+            title='Attention Is All You Need', author_name='Vaswani',
+            publisher='NeurIPS', name='Transformers', subfield=self.deep,
+        )
+        self.assertEqual(self.suggest('attention'), [('Attention Is All You Need', 'research_work')])
+        work.title = 'Reinforcement Learning Survey'
+        work.save()
+        self.assertEqual(self.suggest('attention'), [])
+        self.assertEqual(self.suggest('reinf'), [('Reinforcement Learning Survey', 'research_work')])
+
+        Field.objects.create(
+            name='Machine Vision', domain='Computer Science',
+            area='Perception', field_type='Applied',
+        )
+        self.assertEqual(len(self.suggest('machine')), 2)
+
+        self.ml.delete()  # cascades to the subfield
+        self.assertEqual(self.suggest('learning'), [])
+
+    def test_own_changes_keep_the_generation_current(self):
+        Field.objects.create(
+            name='Machine Vision', domain='Computer Science',
+            area='Perception', field_type='Applied',
+        )
+        self.assertEqual(suggestion_index.generation, suggestion_generation.generation())
+
+    def test_rebuilds_after_a_change_in_another_process(self):
+        # bulk_create sends no signals, like a save in another worker
+        Problem.objects.bulk_create([Problem(name='Machine Ethics', current_proceedings='Open', subfield=self.deep)])
+        self.assertEqual(self.suggest('ethics'), [])
+
+        suggestion_generation.invalidate()
+        with mock.patch('playground.suggest.MIN_REBUILD_SECONDS', 0):
+            self.assertEqual(self.suggest('ethics'), [('Machine Ethics', 'problem')])
+
+    def test_rebuilds_after_the_ttl(self):
+        Problem.objects.bulk_create([Problem(name='Machine Ethics', current_proceedings='Open', subfield=self.deep)])
+        with mock.patch('playground.suggest.SUGGEST_TTL', -1):
+            self.assertEqual(self.suggest('ethics'), [('Machine Ethics', 'problem')])
+
+
+# ============================================================================
+# UNIFIED MULTI-ENTITY SEARCH
+# ============================================================================
+class EntitySearchTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ml = Field.objects.create(
+            name='Machine Learning', domain='Computer Science',
+            area='Artificial Intelligence', field_type='Applied',
+        )
+        cls.deep = Subfield.objects.create(
+            name='Deep Learning', field=cls.ml,
+            domain='Neural Networks', field_type='Applied',
+        )
+        cls.problem = Problem.objects.create(
+            name='Catastrophic Forgetting', current_proceedings='Open',
+            description='Neural networks forget earlier tasks', subfield=cls.deep,
+        )
+        cls.work = ResearchWork.objects.create(
+            title='Elastic Weight Consolidation', author_name='Kirkpatrick',
+            publisher='PNAS', name='EWC', subfield=cls.deep,
+        )
+        cls.researchers = [
+            Researcher.objects.create(
+                name='Researcher %d' % i, email='r%d@example.com' % i,
+                country='Bangladesh', institution='BRAC University',
+                interest='neural networks and continual learning',
+            )
+            for i in range(8)
+        ]
+        QueryPost.objects.create(
+            title='Why do neural networks forget?', content='Looking for pointers',
+            posted_by=cls.researchers[0],
+        )
+
+    def search(self, **params):
+        return self.client.get(reverse('entity_search'), params).json()
+
+    def test_facets_count_every_match_per_type(self):
+        data = self.search(q='neural')
+        self.assertEqual(data['facets'], {
+            'subfield': 1, 'problem': 1, 'researcher': 8, 'query_post': 1,
+        })
+
+    def test_hits_are_bounded_per_type(self):
+        data = self.search(q='neural', limit=3)
+        kinds = [hit['kind'] for hit in data['hits']]
+        self.assertEqual(kinds.count('researcher'), 3)
+        self.assertEqual(len(kinds), 6)
+
+    def test_type_filter(self):
+        data = self.search(q='neural', type='problem')
+        self.assertEqual(data['facets'], {'problem': 1})
+        self.assertEqual(data['hits'][0]['label'], 'Catastrophic Forgetting')
+        self.assertEqual(data['hits'][0]['pk'], 'Catastrophic Forgetting')
+
+    def test_query_count_is_bounded_by_types_not_matches(self):
+        # 1 index pass + 1 in_bulk per type with hits (4 types here)
+        # + 1 fuzzy lookup for fields, which have no exact hit
+        with self.assertQueryBudget(6):
+            self.search(q='neural', limit=50)
+
+    def test_index_follows_updates(self):
+        self.work.title = 'Progressive Networks'
+        self.work.save()
+        data = self.search(q='progressive')
+        self.assertEqual(data['hits'][0]['pk'], self.work.pk)
+        self.assertEqual(self.search(q='elastic')['hits'], [])
+
+    def test_only_indexed_columns_reindex(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite trigger-maintained index')
+        researcher = self.researchers[0]
+
+        def document():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT doc_id FROM search_document WHERE kind = 'researcher' AND pk = %s",
+                    [str(researcher.pk)],
+                )
+                return cursor.fetchone()[0]
+
+        indexed = document()
+        Researcher.objects.filter(pk=researcher.pk).update(work_count=F('work_count') + 1, total_star=4)
+        researcher.save()
+        self.assertEqual(document(), indexed)
+        Researcher.objects.filter(pk=researcher.pk).update(institution='Dhaka University')
+        self.assertNotEqual(document(), indexed)
+        self.assertEqual(self.search(q='dhaka', type='researcher')['facets'], {'researcher': 1})
+
+    def test_field_search_ignores_other_entities(self):
+        # 'forget' only matches a problem and a query post, not the taxonomy
+        self.assertEqual(search_fields_page('forget'), ([], None))
+
+
+# ============================================================================
+# FUZZY TRIGRAM MATCHING
+# ============================================================================
+class FuzzyMatchTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ml = Field.objects.create(
+            name='Machine Learning', domain='Computer Science',
+            area='Artificial Intelligence', field_type='Applied',
+        )
+        cls.db = Field.objects.create(
+            name='Database Systems', domain='Computer Science',
+            area='Data Management', field_type='Applied',
+        )
+        cls.ada = Researcher.objects.create(
+            name='Ada Lovelace', email='ada@example.com', country='UK',
+            institution='Analytical Engines', interest='computation',
+        )
+
+    def setUp(self):
+        field_search_cache.cache.clear()
+
+    def test_trigrams_are_padded_per_word(self):
+        self.assertEqual(trigram.trigrams('AI'), {'  a', ' ai', 'ai '})
+
+    def test_misspelled_field_search_falls_back_to_similar_names(self):
+        response = self.client.get(reverse('field_search'), {'q': 'Machne Learning'})
+        self.assertTrue(response.context['fuzzy'])
+        self.assertEqual(response.context['fields'], [self.ml])
+        self.assertContains(response, 'similar names')
+
+    def test_exact_hits_do_not_fall_back(self):
+        response = self.client.get(reverse('field_search'), {'q': 'Machine'})
+        self.assertFalse(response.context['fuzzy'])
+
+    def test_fuzzy_lookup_is_one_indexed_query(self):
+        with self.assertQueryBudget(1):
+            scored = trigram.similar('field', 'Databse Sytems')
+        self.assertEqual(scored[0][0], 'Database Systems')
+
+    def test_researcher_lookup_falls_back_to_similar_names(self):
+        data = self.client.get(reverse('entity_search'), {'q': 'Lovelase', 'type': 'researcher'}).json()
+        self.assertEqual(data['facets'], {})
+        self.assertEqual([(hit['pk'], hit['fuzzy']) for hit in data['hits']], [(self.ada.pk, True)])
+
+    def test_index_follows_renames_and_deletes(self):
+        self.ada.name = 'Grace Hopper'
+        self.ada.save()
+        self.assertEqual(trigram.similar('researcher', 'Lovelase'), [])
+        self.assertEqual(trigram.similar('researcher', 'Grase Hoper')[0][0], self.ada.pk)
+        self.ada.delete()
+        self.assertFalse(NameTrigram.objects.filter(kind='researcher').exists())
+
+
+# ============================================================================
+# ADMIN CHANGELIST QUERY COUNTS
+# ============================================================================
+def populate_research_graph(rows, start=0):
+    """`rows` of every model, each linked to related rows to count and display"""
+    for i in range(start, start + rows):
+        field = Field.objects.create(
+            name='Field %d' % i, domain='Domain', area='Area', field_type='Applied',
+        )
+        subfield = Subfield.objects.create(
+            name='Subfield %d' % i, field=field, domain='Domain', field_type='Applied',
+        )
+        problem = Problem.objects.create(
+            name='Problem %d' % i, current_proceedings='-', description='-', subfield=subfield,
+        )
+        researcher = Researcher.objects.create(
+            name='Researcher %d' % i, email='r%d@example.com' % i,
+            country='Bangladesh', institution='BRAC University', interest='-',
+        )
+        researcher.expert_fields.add(field)
+        if i:
+            researcher.friends.add(Researcher.objects.get(name='Researcher 0'))
+        work = ResearchWork.objects.create(
+            title='Work %d' % i, author_name='-', publisher='-', name='-',
+            subfield=subfield, solves_problem=problem if i % 2 else None,
+        )
+        work.researchers.add(researcher)
+        institution = FundingInstitution.objects.create(name='Fund %d' % i, country='Bangladesh')
+        FundingProposal.objects.create(
+            title='Proposal %d' % i, content='-', requested_amount=10,
+            posted_by=researcher, funding_institution=institution, research_work=work,
+        )
+        ProjectColab.objects.create(
+            title='Project %d' % i, content='-', project_name='-',
+            required_skills='-', duration='-', posted_by=researcher,
+        )
+        post = QueryPost.objects.create(title='Query %d' % i, content='-', posted_by=researcher)
+        post.feedback_from.add(researcher)
+        conversation = Conversation.objects.create(title='Chat %d' % i)
+        conversation.participants.add(researcher)
+        Message.objects.create(
+            body='hi', sender=researcher, receiver=researcher, conversation=conversation,
+        )
+        Mentor.objects.create(content='-', researcher=researcher, research_work=work)
+        CoWorker.objects.create(content='-', strength='-', researcher=researcher, research_work=work)
+        Collaboration.objects.create(
+            researcher=researcher, funding_institution=institution,
+            research_work=work, start_date=datetime.date(2025, 1, 1),
+        )
+
+
+class AdminChangelistQueryTests(QueryBudgetMixin, TestCase):
+    """
+    Each changelist page must cost the same number of queries whether it
+    lists 1 row or 30: the count columns come from annotations, not from a
+    COUNT(*) per row. Budgets are pinned; a new per-row query breaks them.
+    """
+
+    # session + user + changelist COUNT + full COUNT + page rows (+ filter queries)
+    CHANGELIST_BUDGETS = {
+        Field: 7,
+        Subfield: 7,
+        Researcher: 7,
+        ResearchWork: 6,
+        FundingInstitution: 6,
+        QueryPost: 5,
+        Conversation: 5,
+    }
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin_user)
+
+    def changelist_url(self, model):
+        return reverse('admin:playground_%s_changelist' % model._meta.model_name)
+
+    def assertChangelistBudget(self, model, **params):
+        with self.assertQueryBudget(self.CHANGELIST_BUDGETS[model]):
+            response = self.client.get(self.changelist_url(model), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_budget_with_one_row(self):
+        populate_research_graph(1)
+        for model in self.CHANGELIST_BUDGETS:
+            with self.subTest(model=model.__name__):
+                self.assertChangelistBudget(model)
+
+    def test_budget_with_many_rows(self):
+        populate_research_graph(30)
+        for model in self.CHANGELIST_BUDGETS:
+            with self.subTest(model=model.__name__):
+                self.assertChangelistBudget(model)
+
+    def test_count_columns_are_sortable(self):
+        populate_research_graph(3)
+        response = self.assertChangelistBudget(Researcher, o='-7')  # friend_count, descending
+        researchers = list(response.context['cl'].result_list)
+        self.assertEqual(researchers[0].name, 'Researcher 0')
+        self.assertEqual(researchers[0].friend_count, 2)
+
+    def test_counts_are_correct(self):
+        populate_research_graph(2)
+        conversation = Conversation.objects.first()
+        Message.objects.create(
+            body='again', sender=Researcher.objects.first(),
+            receiver=Researcher.objects.first(), conversation=conversation,
+        )
+        response = self.assertChangelistBudget(Conversation)
+        counts = {
+            row.pk: (row.participant_count, row.message_count)
+            for row in response.context['cl'].result_list
+        }
+        self.assertEqual(counts[conversation.pk], (1, 2))
+
+
+
+# ============================================================================
+# LAZY-LOAD REGRESSION
+# ============================================================================
+class LazyLoadRegressionTests(QueryBudgetMixin, TestCase):
+    """
+    Catches foreign keys followed lazily, one query per row: every admin
+    changelist and change form, and str() over for_display() querysets,
+    must cost the same number of queries with 2 rows or with 10 (2, so the
+    first researcher already has a friend for the relation widgets to show).
+    """
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin_user)
+
+    def admin_pages(self):
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label != 'playground':
+                continue
+            info = (model._meta.app_label, model._meta.model_name)
+            yield '%s changelist' % model.__name__, reverse('admin:%s_%s_changelist' % info)
+            obj = model._default_manager.order_by('pk').first()
+            yield '%s change form' % model.__name__, reverse('admin:%s_%s_change' % info, args=[obj.pk])
+
+    def count_queries(self):
+        counts = {}
+        for name, url in self.admin_pages():
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, name)
+            counts[name] = len(captured)
+        return counts
+
+    def test_admin_query_counts_do_not_grow_with_rows(self):
+        populate_research_graph(2)
+        self.count_queries()  # warm per-process caches (content types, ...)
+        small = self.count_queries()
+        populate_research_graph(8, start=2)
+        self.count_queries()  # label the new facet parents (see facets.py)
+        large = self.count_queries()
+        grown = {name: (small[name], large[name]) for name in small if large[name] != small[name]}
+        self.assertEqual(grown, {}, 'pages whose query count grew with rows (2 rows, 10 rows)')
+
+    def test_str_over_for_display_is_one_query(self):
+        populate_research_graph(5)
+        for model in (Message, Mentor, CoWorker, Collaboration):
+            with self.subTest(model=model.__name__):
+                with self.assertQueryBudget(1):
+                    labels = [str(obj) for obj in model.objects.for_display()]
+                self.assertEqual(len(labels), 5)
+
+
+# ============================================================================
+# ADMIN RELATION WIDGETS
+# ============================================================================
+class AdminRelationWidgetTests(TestCase):
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin_user)
+        self.researcher = Researcher.objects.create(
+            name='Target', email='target@example.com',
+            country='Bangladesh', institution='BRAC University', interest='-',
+        )
+
+    def create_researchers(self, count):
+        Researcher.objects.bulk_create(
+            Researcher(
+                name='Researcher %d' % i, email='r%d@example.com' % i,
+                country='Bangladesh', institution='BRAC University', interest='-',
+            )
+            for i in range(count)
+        )
+
+    def change_form_size(self, model, obj):
+        url = reverse('admin:playground_%s_change' % model._meta.model_name, args=[obj.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(response.content.replace(response.wsgi_request.META['CSRF_COOKIE'].encode(), b''))
+
+    def test_change_forms_do_not_grow_with_the_researcher_table(self):
+        conversation = Conversation.objects.create(title='Chat')
+        before = (
+            self.change_form_size(Researcher, self.researcher),
+            self.change_form_size(Conversation, conversation),
+        )
+        self.create_researchers(50)
+        after = (
+            self.change_form_size(Researcher, self.researcher),
+            self.change_form_size(Conversation, conversation),
+        )
+        self.assertEqual(before, after)
+
+    def test_autocomplete_is_paginated(self):
+        self.create_researchers(50)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'playground', 'model_name': 'researcher',
+            'field_name': 'friends', 'term': 'Researcher',
+        })
+        data = response.json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertTrue(data['pagination']['more'])
+
+
+# ============================================================================
+# ADMIN FACET COUNTS
+# ============================================================================
+class AdminFacetCountTests(TestCase):
+
+    def setUp(self):
+        facet_counts.clear()
+        self.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin_user)
+        for i, country in enumerate(['Bangladesh', 'Bangladesh', 'Japan']):
+            Researcher.objects.create(
+                name='Researcher %d' % i, email='r%d@example.com' % i,
+                country=country, institution='BRAC University', interest='-',
+            )
+
+    def tearDown(self):
+        facet_counts.clear()
+
+    def changelist(self, model, **params):
+        return self.client.get(reverse('admin:playground_%s_changelist' % model._meta.model_name), params)
+
+    def test_sidebar_shows_counts_and_filters(self):
+        response = self.changelist(Researcher)
+        self.assertContains(response, 'Bangladesh (2)')
+        self.assertContains(response, 'Japan (1)')
+        response = self.changelist(Researcher, country='Japan')
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_counts_are_cached_between_page_views(self):
+        self.changelist(Researcher)
+        with CaptureQueriesContext(connection) as captured:
+            self.changelist(Researcher)
+        facet_sql = [
+            q['sql'] for q in captured
+            if q['sql'].startswith(('SELECT DISTINCT', 'SELECT "researcher"."country"',
+                                    'SELECT "researcher"."institution"'))
+        ]
+        self.assertEqual(facet_sql, [])
+
+    def test_counts_follow_save_and_delete(self):
+        facet_counts.counts(Researcher, 'country')
+        researcher = Researcher.objects.create(
+            name='New', email='new@example.com',
+            country='Japan', institution='BRAC University', interest='-',
+        )
+        researcher.country = 'Canada'
+        researcher.save()
+        Researcher.objects.filter(country='Bangladesh').first().delete()
+        with self.assertNumQueries(0):
+            counts = facet_counts.counts(Researcher, 'country')
+        self.assertEqual(dict(counts), {'Bangladesh': 1, 'Japan': 1, 'Canada': 1})
+
+    def test_foreign_key_facet_lists_only_parents_with_rows(self):
+        for name in ('Used', 'Unused'):
+            Field.objects.create(name=name, domain='CS', area='-', field_type='Applied')
+        Subfield.objects.create(name='Child', field_id='Used', domain='CS', field_type='Applied')
+        response = self.changelist(Subfield)
+        self.assertContains(response, 'Used (CS) (1)')
+        self.assertNotContains(response, 'Unused (CS)')
+
+    def test_every_cached_facet_model_is_connected(self):
+        for model, model_admin in admin.site._registry.items():
+            if any(isinstance(item, tuple) and item[1] is CachedFacetListFilter
+                   for item in model_admin.list_filter):
+                self.assertIn(model, FACETS)
+
+
+# ============================================================================
+# ORDERING INDEXES
+# ============================================================================
+class OrderingIndexTests(TestCase):
+    """The first page of each default ordering is read in index order"""
+
+    def test_default_orderings_do_not_sort(self):
+        querysets = {
+            'researcher': Researcher.objects.all(),
+            'researcher by country': Researcher.objects.filter(country='Japan'),
+            'research work': ResearchWork.objects.all(),
+            'research work by status': ResearchWork.objects.filter(status='published'),
+            'research work by vacancy': ResearchWork.objects.filter(vacancy_status=True),
+            'problem': Problem.objects.all(),
+            'problem by subfield': Problem.objects.filter(subfield='x').most_critical(),
+            'query post by is_answered': QueryPost.objects.filter(is_answered=False).order_by('-pk'),
+            'proposal by status': FundingProposal.objects.filter(proposal_status='pending').order_by('-pk'),
+            'conversation': Conversation.objects.all(),
+            'message': Message.objects.all(),
+        }
+        for label, queryset in querysets.items():
+            with self.subTest(label):
+                page = queryset if queryset.query.is_sliced else queryset[:100]
+                self.assertEqual(sort_plan(page), 'index')
+
+
+# ============================================================================
+# PROBLEM SEVERITY RANK
+# ============================================================================
+class ProblemSeverityRankTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Field.objects.create(name='CS', domain='CS', area='-', field_type='Applied')
+        cls.subfields = [
+            Subfield.objects.create(name=name, field_id='CS', domain='CS', field_type='Applied')
+            for name in ('AI', 'Systems')
+        ]
+        for i, color in enumerate(['green', 'yellow', 'orange', 'red']):
+            for subfield in cls.subfields:
+                Problem.objects.create(
+                    name='%s %s' % (subfield.name, color), current_proceedings='-',
+                    description='-', severity_color=color, subfield=subfield,
+                )
+
+    def test_default_ordering_is_most_critical_first(self):
+        colors = [problem.severity_color for problem in Problem.objects.all()]
+        self.assertEqual(colors, ['red'] * 2 + ['orange'] * 2 + ['yellow'] * 2 + ['green'] * 2)
+
+    def test_rank_follows_color_changes(self):
+        problem = Problem.objects.get(name='AI green')
+        problem.severity_color = 'red'
+        problem.save()
+        Problem.objects.filter(name='Systems red').update(severity_color='green')
+        ranks = dict(Problem.objects.values_list('name', 'severity_rank'))
+        self.assertEqual(ranks['AI green'], 4)
+        self.assertEqual(ranks['Systems red'], 1)
+
+    def test_most_critical_per_subfield(self):
+        top = self.subfields[1].problems.most_critical(2)
+        self.assertEqual([p.name for p in top], ['Systems red', 'Systems orange'])
+
+
+# ============================================================================
+# COUNTER CACHES
+# ============================================================================
+class CounterCacheTests(TestCase):
+
+    def assertCountersExact(self):
+        for counter in COUNTERS:
+            pks = list(counter.model.objects.values_list('pk', flat=True))
+            with self.subTest(counter=str(counter)):
+                self.assertEqual(counter.drifted(pks), [])
+
+    def researcher(self, i):
+        return Researcher.objects.create(
+            name='Researcher %d' % i, email='r%d@example.com' % i,
+            country='Bangladesh', institution='BRAC University', interest='-',
+        )
+
+    def test_graph_counters_are_exact(self):
+        populate_research_graph(5)
+        self.assertCountersExact()
+        self.assertEqual(Researcher.objects.get(name='Researcher 0').friend_count, 4)
+
+    def test_foreign_key_counter_follows_move_and_delete(self):
+        Field.objects.create(name='A', domain='CS', area='-', field_type='Applied')
+        Field.objects.create(name='B', domain='CS', area='-', field_type='Applied')
+        subfield = Subfield.objects.create(name='S', field_id='A', domain='CS', field_type='Applied')
+        self.assertEqual(Field.objects.get(name='A').subfield_count, 1)
+        subfield.field_id = 'B'
+        subfield.save()
+        self.assertEqual(
+            dict(Field.objects.values_list('name', 'subfield_count')), {'A': 0, 'B': 1},
+        )
+        subfield.delete()
+        self.assertEqual(Field.objects.get(name='B').subfield_count, 0)
+
+    def test_m2m_counters_follow_add_remove_and_clear(self):
+        a, b, c = self.researcher(0), self.researcher(1), self.researcher(2)
+        a.friends.add(b, c)
+        c.friends.remove(a, b)  # b was never c's friend
+        b.friends.clear()
+        counts = dict(Researcher.objects.values_list('name', 'friend_count'))
+        self.assertEqual(counts, {'Researcher 0': 0, 'Researcher 1': 0, 'Researcher 2': 0})
+        conversation = Conversation.objects.create(title='Chat')
+        a.conversations.add(conversation)  # reverse side
+        self.assertEqual(Conversation.objects.get().participant_count, 1)
+        self.assertCountersExact()
+
+    def test_deleting_a_researcher_updates_the_other_side(self):
+        a, b = self.researcher(0), self.researcher(1)
+        a.friends.add(b)
+        conversation = Conversation.objects.create(title='Chat')
+        conversation.participants.add(a, b)
+        a.delete()
+        self.assertEqual(Researcher.objects.get().friend_count, 0)
+        self.assertEqual(Conversation.objects.get().participant_count, 1)
+
+    def test_rebuild_command_repairs_signal_less_writes(self):
+        populate_research_graph(3)
+        Researcher.objects.update(friend_count=99)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--verify', stdout=out)
+        self.assertIn('Researcher.friend_count: 3 rows checked, 3 drifted', out.getvalue())
+        call_command('rebuild_counters', '--batch-size', '2', stdout=StringIO())
+        self.assertCountersExact()
+
+
+# ============================================================================
+# INBOX
+# ============================================================================
+class InboxTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob = [
+            Researcher.objects.create(
+                name=name, email='%s@example.com' % name,
+                country='Bangladesh', institution='BRAC University', interest='-',
+            )
+            for name in ('Alice', 'Bob')
+        ]
+        cls.conversations = []
+        for i in range(5):
+            conversation = Conversation.objects.create(title='Chat %d' % i)
+            conversation.participants.add(cls.alice, cls.bob)
+            cls.conversations.append(conversation)
+
+    def send(self, conversation, body):
+        return Message.objects.create(
+            body=body, sender=self.alice, receiver=self.bob, conversation=conversation,
+        )
+
+    def test_new_message_moves_pointer_and_activity(self):
+        conversation = self.conversations[0]
+        message = self.send(conversation, 'hello')
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message, message)
+        self.assertEqual(conversation.last_activity_at, message.time_date)
+
+    def test_deleting_last_message_repoints_to_previous(self):
+        conversation = self.conversations[0]
+        first = self.send(conversation, 'first')
+        second = self.send(conversation, 'second')
+        second.delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message, first)
+        first.delete()
+        conversation.refresh_from_db()
+        self.assertIsNone(conversation.last_message)
+
+    def test_inbox_is_most_recent_first_in_one_query(self):
+        for i in (3, 1, 4):
+            self.send(self.conversations[i], 'ping %d' % i)
+        with self.assertQueryBudget(1):
+            page, next_cursor = inbox(self.alice.pk, size=10)
+            senders = [c.last_message.sender.name for c in page if c.last_message]
+        self.assertEqual([c.title for c in page[:3]], ['Chat 4', 'Chat 1', 'Chat 3'])
+        self.assertEqual(senders, ['Alice'] * 3)
+        self.assertIsNone(next_cursor)
+
+    def test_inbox_pages_cover_every_conversation_once(self):
+        self.send(self.conversations[2], 'ping')
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = inbox(self.bob.pk, cursor, size=2)
+            seen.extend(c.pk for c in page)
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(c.pk for c in self.conversations))
+        self.assertEqual(seen[0], self.conversations[2].pk)
+
+    def test_inbox_view(self):
+        self.send(self.conversations[0], 'hello')
+        url = reverse('researcher_inbox')
+        self.assertEqual(self.client.get(url, {'researcher': self.bob.pk}).status_code, 403)
+        # Signed in as Bob (same email): his inbox, not Alice's
+        self.client.force_login(User.objects.create_user('bob', 'Bob@example.com'))
+        data = self.client.get(url, {'researcher': self.bob.pk, 'limit': 1}).json()
+        self.assertEqual(data['conversations'][0]['last_message']['body'], 'hello')
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(self.client.get(url, {'researcher': self.alice.pk}).status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get(url, {'researcher': self.alice.pk}).status_code, 200)
+
+
+# ============================================================================
+# MESSAGE HISTORY
+# ============================================================================
+class MessageHistoryTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        researcher = Researcher.objects.create(
+            name='Alice', email='alice@example.com',
+            country='Bangladesh', institution='BRAC University', interest='-',
+        )
+        cls.conversation = Conversation.objects.create(title='Thread')
+        cls.conversation.participants.add(researcher)
+        other = Conversation.objects.create(title='Other')
+        # bulk_create stamps near-identical times, so (time_date, id) ties are exercised too
+        Message.objects.bulk_create(
+            Message(body='m%d' % i, sender=researcher, receiver=researcher,
+                    conversation=other if i % 5 == 0 else cls.conversation)
+            for i in range(30)
+        )
+        cls.expected = list(
+            cls.conversation.messages.order_by('time_date', 'message_id').values_list('body', flat=True)
+        )
+
+    def test_newest_page_first(self):
+        with self.assertQueryBudget(1):
+            page, older, newer = message_history(self.conversation.pk, size=10)
+            bodies = [m.body for m in page]
+            [m.sender.name for m in page]
+        self.assertEqual(bodies, self.expected[-10:])
+        self.assertIsNotNone(older)
+        self.assertIsNone(newer)
+
+    def test_scroll_back_then_forward(self):
+        pages = []
+        page, older, newer = message_history(self.conversation.pk, size=10)
+        pages.append(page)
+        while older:
+            page, older, newer = message_history(self.conversation.pk, before=older, size=10)
+            pages.insert(0, page)
+        self.assertEqual([m.body for page in pages for m in page], self.expected)
+
+        forward = list(page)
+        while newer:
+            page, older, newer = message_history(self.conversation.pk, after=newer, size=10)
+            forward.extend(page)
+        self.assertEqual([m.body for m in forward], self.expected)
+
+    def test_view(self):
+        url = reverse('conversation_messages', args=[self.conversation.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_user('alice', 'alice@example.com'))
+        data = self.client.get(url, {'limit': 5}).json()
+        self.assertEqual([m['body'] for m in data['messages']], self.expected[-5:])
+        data = self.client.get(url, {'limit': 5, 'before': data['older']}).json()
+        self.assertEqual([m['body'] for m in data['messages']], self.expected[-10:-5])
+        self.assertIsNotNone(data['newer'])
+        # Alice isn't a participant of the other conversation
+        other = Conversation.objects.get(title='Other')
+        self.assertEqual(self.client.get(reverse('conversation_messages', args=[other.pk])).status_code, 403)
+
+
+class UnreadCounterTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = [
+            Researcher.objects.create(
+                name=name, email='%s@example.com' % name,
+                country='Bangladesh', institution='BRAC University', interest='-',
+            )
+            for name in ('Alice', 'Bob', 'Carol')
+        ]
+        cls.lab = Conversation.objects.create(title='Lab')
+        cls.lab.participants.add(cls.alice, cls.bob, cls.carol)
+        cls.pair = Conversation.objects.create(title='Pair')
+        cls.pair.participants.add(cls.alice, cls.bob)
+
+    def send(self, conversation, sender, receiver, body='hi'):
+        return Message.objects.create(body=body, sender=sender, receiver=receiver, conversation=conversation)
+
+    def unread(self, researcher, conversation=None):
+        if conversation is None:
+            return Researcher.objects.get(pk=researcher.pk).unread_count
+        return ReadMarker.objects.get(researcher=researcher, conversation=conversation).unread_count
+
+    def test_new_messages_are_unread_for_everyone_but_the_sender(self):
+        self.send(self.lab, self.alice, self.bob)
+        self.send(self.lab, self.alice, self.bob)
+        self.send(self.pair, self.bob, self.alice)
+        self.assertEqual(self.unread(self.bob, self.lab), 2)
+        self.assertEqual(self.unread(self.carol, self.lab), 2)
+        self.assertEqual(self.unread(self.alice, self.pair), 1)
+        self.assertEqual(
+            [self.unread(r) for r in (self.alice, self.bob, self.carol)], [1, 2, 2],
+        )
+
+    def test_mark_read_is_bounded_and_sets_receipt(self):
+        self.send(self.lab, self.alice, self.bob)
+        last = self.send(self.lab, self.alice, self.bob)
+        self.send(self.pair, self.alice, self.bob)
+        # Marker lookup + marker UPDATE + total UPDATE (+ the savepoint pair),
+        # however long the history
+        with self.assertQueryBudget(5):
+            self.assertEqual(mark_read(self.bob.pk, self.lab.pk), 2)
+        self.assertEqual(self.unread(self.bob, self.lab), 0)
+        self.assertEqual(self.unread(self.bob), 1)
+        self.assertEqual(self.unread(self.carol), 2)
+        self.assertEqual(read_receipts(self.lab.pk)[self.bob.pk], last.pk)
+        self.assertEqual(mark_read(self.bob.pk, self.lab.pk), 0)
+
+    def test_deleting_a_message_uncounts_it_only_where_unread(self):
+        first = self.send(self.lab, self.alice, self.bob)
+        mark_read(self.bob.pk, self.lab.pk)
+        second = self.send(self.lab, self.alice, self.bob)
+        first.delete()
+        self.assertEqual(self.unread(self.bob), 1)
+        self.assertEqual(self.unread(self.carol), 1)
+        second.delete()
+        self.assertEqual([self.unread(r) for r in (self.bob, self.carol)], [0, 0])
+
+    def test_deleting_a_conversation_releases_its_unread(self):
+        self.send(self.lab, self.alice, self.bob)
+        self.send(self.pair, self.alice, self.bob)
+        self.lab.delete()
+        self.assertEqual(self.unread(self.bob), 1)
+        self.assertEqual(self.unread(self.carol), 0)
+
+    def test_badge_is_one_lookup(self):
+        self.send(self.lab, self.alice, self.bob)
+        url = reverse('unread_badge')
+        self.assertEqual(self.client.get(url, {'researcher': self.carol.pk}).status_code, 403)
+        self.client.force_login(User.objects.create_user('carol', 'Carol@example.com'))
+        # Session, user and their researcher, then the counter itself
+        with self.assertQueryBudget(4):
+            data = self.client.get(url, {'researcher': self.carol.pk}).json()
+        self.assertEqual(data['unread'], 1)
+        self.assertEqual(self.client.get(url, {'researcher': self.bob.pk}).status_code, 403)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get(url, {'researcher': 0}).status_code, 404)
+
+    def test_inbox_and_mark_read_views(self):
+        self.send(self.lab, self.alice, self.bob)
+        self.client.force_login(User.objects.create_user('bob', 'Bob@example.com'))
+        data = self.client.get(reverse('researcher_inbox'), {'researcher': self.bob.pk}).json()
+        self.assertEqual({c['title']: c['unread'] for c in data['conversations']}, {'Lab': 1, 'Pair': 0})
+
+        url = reverse('mark_conversation_read', args=[self.lab.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(url, {'researcher': self.carol.pk}).status_code, 403)
+        self.assertEqual(self.client.post(url, {'researcher': self.bob.pk}).json()['marked'], 1)
+        self.assertEqual(self.unread(self.bob), 0)
+        self.assertEqual(self.unread(self.carol), 1)
+
+    def test_only_participants_at_send_time_count(self):
+        outsider = Researcher.objects.create(
+            name='Dan', email='dan@example.com', country='Bangladesh', institution='BRAC University', interest='-',
+        )
+        # Sent to someone outside the conversation: not on their badge,
+        # since inbox() would never list it
+        early = self.send(self.pair, self.alice, outsider)
+        self.assertEqual(self.unread(outsider), 0)
+        self.assertFalse(ReadMarker.objects.filter(researcher=outsider).exists())
+
+        # Joining later doesn't make the earlier message theirs to uncount
+        self.pair.participants.add(self.carol)
+        self.send(self.pair, self.alice, self.bob)
+        self.assertEqual(self.unread(self.carol, self.pair), 1)
+        early.delete()
+        self.assertEqual(self.unread(self.carol, self.pair), 1)
+        self.assertEqual(self.unread(self.bob, self.pair), 1)
+
+
+class BulkImportTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(text)
+        return path
+
+    def jsonl(self, name, records):
+        return self.write(name, ''.join(json.dumps(record) + '\n' for record in records))
+
+    def load_people(self):
+        import_file('field', self.write('fields.csv', (
+            'name,domain,area,field_type\n'
+            'Robotics,Engineering,Automation,Applied\n'
+            'Genomics,Biology,Genetics,Basic\n'
+        )))
+        import_file('subfield', self.jsonl('subfields.jsonl', [
+            {'name': 'Swarm Robotics', 'field': 'Robotics', 'domain': 'Engineering', 'field_type': 'Applied'},
+            {'name': 'Soft Robotics', 'field': 'Robotics', 'domain': 'Engineering', 'field_type': 'Applied'},
+        ]))
+        import_file('researcher', self.jsonl('people.jsonl', [
+            {'name': name, 'email': '%s@example.com' % name.lower(), 'country': 'Bangladesh',
+             'institution': 'BRAC University', 'interest': '-'}
+            for name in ('Alice', 'Bob', 'Carol')
+        ]))
+
+    def test_entities_and_links_with_maintained_caches(self):
+        self.load_people()
+        import_file('expert_fields', self.write('expertise.csv', (
+            'researcher,field\n'
+            'alice@example.com,Robotics\n'
+            'alice@example.com,Genomics\n'
+            'bob@example.com,Robotics\n'
+        )))
+        import_file('friends', self.write('friends.csv', 'researcher,friend\nalice@example.com,bob@example.com\n'))
+
+        self.assertEqual(Field.objects.get(pk='Robotics').subfield_count, 2)
+        alice = Researcher.objects.get(email='alice@example.com')
+        bob = Researcher.objects.get(email='bob@example.com')
+        self.assertEqual(alice.expert_field_count, 2)
+        self.assertEqual(list(bob.friends.all()), [alice])
+        self.assertEqual((alice.friend_count, bob.friend_count), (1, 1))
+        self.assertTrue(NameTrigram.objects.filter(kind='researcher', object_pk=str(alice.pk)).exists())
+        self.assertTrue(NameTrigram.objects.filter(kind='field', object_pk='Genomics').exists())
+
+    def test_reimport_updates_on_natural_key(self):
+        self.load_people()
+        import_file('subfield', self.jsonl('moved.jsonl', [
+            {'name': 'Soft Robotics', 'field': 'Genomics', 'domain': 'Biology', 'field_type': 'Applied'},
+        ]))
+        self.assertEqual(Subfield.objects.count(), 2)
+        self.assertEqual(Subfield.objects.get(pk='Soft Robotics').domain, 'Biology')
+        self.assertEqual(
+            dict(Field.objects.values_list('name', 'subfield_count')), {'Robotics': 1, 'Genomics': 1},
+        )
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        self.load_people()
+        path = self.write('bad.jsonl', '\n'.join([
+            json.dumps({'name': 'Dan', 'email': 'not-an-email', 'country': 'BD', 'institution': 'X', 'interest': '-'}),
+            '{broken',
+            json.dumps({'name': 'Eve', 'email': 'eve@example.com', 'country': 'BD', 'institution': 'X', 'interest': '-'}),
+        ]))
+        run = import_file('researcher', path)
+        self.assertEqual((run.rows, run.imported), (3, 1))
+        self.assertEqual([number for number, message in run.errors], [1, 2])
+        self.assertIn('email', run.errors[0][1])
+
+        run = import_file('subfield', self.write('orphan.csv', 'name,field,domain,field_type\nX,Nowhere,D,T\n'))
+        self.assertIn("no field 'Nowhere'", run.errors[0][1])
+
+    def test_failed_run_resumes_after_last_committed_chunk(self):
+        self.load_people()
+        # Works have no natural key, so re-reading a committed row would duplicate it
+        path = self.write('works.csv', 'title,name,author_name,publisher,subfield\n' + ''.join(
+            'Paper %d,Swarms,Alice,IEEE,Swarm Robotics\n' % i for i in range(5)
+        ))
+
+        def crash(run, errors):
+            raise RuntimeError('connection lost')
+
+        with self.assertRaises(RuntimeError):
+            import_file('research_work', path, batch_size=2, on_chunk=crash)
+        self.assertEqual(ResearchWork.objects.count(), 2)
+
+        run = import_file('research_work', path, batch_size=2)
+        self.assertEqual((run.resumed_from, run.rows), (2, 3))
+        self.assertEqual(
+            sorted(ResearchWork.objects.values_list('title', flat=True)),
+            ['Paper %d' % i for i in range(5)],
+        )
+        self.assertEqual(import_file('research_work', path).rows, 0)
+        self.assertEqual(import_file('research_work', path, restart=True).rows, 5)
+
+    def test_rows_the_database_refuses_are_reported_and_skipped(self):
+        self.load_people()
+        import_file('problem', self.write('problems.csv', (
+            'name,current_proceedings,description,subfield\n'
+            'Flocking,Open,-,Swarm Robotics\n'
+        )))
+        # solves_problem is unique, which the row checks don't cover
+        path = self.write('works.csv', 'title,name,author_name,publisher,subfield,solves_problem\n' + ''.join(
+            'Paper %d,Swarms,Alice,IEEE,Swarm Robotics,Flocking\n' % i for i in range(3)
+        ) + 'Paper 3,Swarms,Alice,IEEE,Swarm Robotics,\n')
+        run = import_file('research_work', path, batch_size=2)
+        self.assertEqual((run.rows, run.imported), (4, 2))
+        self.assertEqual([number for number, message in run.errors], [2, 3])
+        self.assertEqual(
+            sorted(ResearchWork.objects.values_list('title', flat=True)), ['Paper 0', 'Paper 3'],
+        )
+
+    def test_upsert_without_a_conflict_target(self):
+        self.load_people()
+        alice = Researcher.objects.get(email='alice@example.com')
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            run = import_file('researcher', self.jsonl('updates.jsonl', [
+                {'name': 'Alice Smith', 'email': 'alice@example.com', 'country': 'Japan',
+                 'institution': 'BRAC University', 'interest': '-'},
+                {'name': 'Dan', 'email': 'dan@example.com', 'country': 'Bangladesh',
+                 'institution': 'BRAC University', 'interest': '-'},
+            ]))
+        self.assertEqual(run.imported, 2)
+        alice.refresh_from_db()
+        self.assertEqual((alice.name, alice.country), ('Alice Smith', 'Japan'))
+        self.assertGreater(alice.updated_at, alice.created_at)
+        self.assertEqual(Researcher.objects.count(), 4)
+
+    def test_command_reports_rate(self):
+        path = self.write('fields.csv', 'name,domain,area,field_type\nRobotics,Engineering,Automation,Applied\n')
+        out = StringIO()
+        call_command('import_data', 'field', path, stdout=out)
+        self.assertRegex(out.getvalue(), r'field: 1 rows read, 1 imported, 0 rejected \(\d+ rows/s\)')
+        with self.assertRaises(CommandError):
+            call_command('import_data', 'field', path + '.missing')
+
+
+class BulkExportTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.researchers = [
+            Researcher.objects.create(
+                name='R%d' % i, email='r%d@example.com' % i,
+                country='Bangladesh', institution='BUET', interest='-',
+            )
+            for i in range(5)
+        ]
+        cls.researchers[0].friends.add(*cls.researchers[1:3])
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+
+    def test_csv_pages_through_the_table_in_pk_order(self):
+        # One query per page, plus the empty one that ends it
+        with self.assertQueryBudget(4):
+            text = ''.join(export_stream('researcher', chunk_size=2))
+        rows = list(csv.DictReader(text.splitlines()))
+        self.assertEqual([row['email'] for row in rows], ['r%d@example.com' % i for i in range(5)])
+        self.assertIn('friend_count', rows[0])
+
+    def test_incremental_jsonl(self):
+        cutoff = timezone.now()
+        Researcher.objects.filter(pk=self.researchers[3].pk).update(updated_at=cutoff + datetime.timedelta(seconds=1))
+        lines = ''.join(export_stream('researcher', 'jsonl', since=cutoff)).splitlines()
+        self.assertEqual([json.loads(line)['email'] for line in lines], ['r3@example.com'])
+
+        with self.assertRaises(ValueError):
+            export_stream('friends', since=cutoff)
+
+    def test_gzip_and_link_tables(self):
+        plain = ''.join(export_stream('friends'))
+        packed = b''.join(export_stream('friends', compress=True))
+        self.assertEqual(gzip.decompress(packed).decode('utf-8'), plain)
+        # Both directions of the two symmetrical friendships
+        self.assertEqual(len(plain.splitlines()), 1 + 4)
+
+    async def test_async_iteration_yields_the_same_chunks(self):
+        chunks = [chunk async for chunk in iterate_in_thread(iter(['a', 'b']))]
+        self.assertEqual(chunks, ['a', 'b'])
+
+    def test_view_is_staff_only_and_streams(self):
+        url = reverse('export_data', args=['researcher'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {'format': 'jsonl', 'gzip': '1'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="researcher.jsonl.gz"')
+        body = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertEqual(len(body.splitlines()), 5)
+
+        self.assertEqual(self.client.get(url, {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_data', args=['nothing'])).status_code, 404)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'researchers.csv')
+            call_command('export_data', 'researcher', '--output', path)
+            with open(path, encoding='utf-8') as handle:
+                self.assertEqual(len(handle.read().splitlines()), 6)
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'friends', '--since', '2026-01-01T00:00:00')
+
+
+class ChangeFeedTests(QueryBudgetMixin, TestCase):
+    """Feeds read with settle=0 so rows saved by the test are visible"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.researchers = [
+            Researcher.objects.create(
+                name='R%d' % i, email='r%d@example.com' % i,
+                country='Bangladesh', institution='BUET', interest='-',
+            )
+            for i in range(4)
+        ]
+        cls.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+
+    def read(self, kind, cursor=None, limit=100):
+        return changes(kind, cursor, limit, settle=datetime.timedelta(0))
+
+    def drain(self, kind, cursor=None, limit=100):
+        """Every event after cursor, page by page; (events, last cursor)"""
+        seen = []
+        while True:
+            events, cursor, more = self.read(kind, cursor, limit)
+            seen.extend(events)
+            if not more:
+                return seen, cursor
+
+    def test_upserts_in_updated_at_then_pk_order(self):
+        # The same timestamp for all but one row: ties fall back to the pk
+        moment = timezone.now() - datetime.timedelta(minutes=1)
+        Researcher.objects.update(updated_at=moment)
+        Researcher.objects.filter(pk=self.researchers[0].pk).update(updated_at=moment + datetime.timedelta(seconds=1))
+        # Two queries per page: rows and tombstones
+        with self.assertQueryBudget(2):
+            events, cursor, more = self.read('researcher', limit=2)
+        self.assertTrue(more)
+        events += self.drain('researcher', cursor, limit=2)[0]
+        self.assertEqual(
+            [event['pk'] for event in events],
+            [r.pk for r in self.researchers[1:]] + [self.researchers[0].pk],
+        )
+        self.assertEqual({event['op'] for event in events}, {'upsert'})
+        self.assertEqual(events[0]['row']['email'], 'r1@example.com')
+
+    def test_cursor_resumes_with_only_later_changes(self):
+        events, cursor = self.drain('researcher')
+        self.assertEqual(len(events), 4)
+        self.assertEqual(self.read('researcher', cursor)[0], [])
+
+        researcher = self.researchers[2]
+        researcher.name = 'Renamed'
+        researcher.save()
+        events, cursor, more = self.read('researcher', cursor)
+        self.assertEqual([(e['op'], e['pk'], e['row']['name']) for e in events], [('upsert', researcher.pk, 'Renamed')])
+
+    def test_deletes_leave_tombstones_in_the_timeline(self):
+        events, cursor = self.drain('field')
+        Field.objects.create(name='Physics', domain='Science', area='Physical', field_type='Basic')
+        Field.objects.filter(name='Physics').delete()
+        Field.objects.create(name='Physics', domain='Science', area='Physical', field_type='Applied')
+        events, cursor, more = self.read('field', cursor)
+        # String primary keys, and the re-created row after its tombstone
+        self.assertEqual([(e['op'], e['pk']) for e in events], [('delete', 'Physics'), ('upsert', 'Physics')])
+
+    def test_models_outside_the_feed_keep_fast_deletes(self):
+        for model in (NameTrigram, Tombstone, ReadMarker):
+            self.assertTrue(Collector(using='default').can_fast_delete(model.objects.all()), model)
+
+    def test_recent_rows_wait_for_the_settle_lag(self):
+        self.assertEqual(changes('researcher')[0], [])
+
+    def test_view(self):
+        url = reverse('change_feed', args=['researcher'])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        Researcher.objects.update(updated_at=timezone.now() - datetime.timedelta(minutes=1))
+        body = self.client.get(url, {'limit': 3}).json()
+        self.assertEqual(len(body['events']), 3)
+        self.assertTrue(body['more'])
+        body = self.client.get(url, {'cursor': body['cursor']}).json()
+        self.assertEqual([event['pk'] for event in body['events']], [self.researchers[3].pk])
+        self.assertFalse(body['more'])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('change_feed', args=['tombstone'])).status_code, 404)
+
+    def test_prune_command(self):
+        old, recent = self.researchers[0].pk, self.researchers[1].pk
+        Researcher.objects.get(pk=old).delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=40))
+        Researcher.objects.get(pk=recent).delete()
+        out = StringIO()
+        call_command('prune_tombstones', '--days', '30', stdout=out)
+        self.assertIn('Removed 1 tombstones', out.getvalue())
+        self.assertEqual(list(Tombstone.objects.values_list('kind', 'object_pk')), [('researcher', str(recent))])
+
+
+class FriendGraphTests(TestCase):
+    """
+    Friendships: a chain 0-1-2-3-4-5-6-7, plus 0-2, 0-8, 8-2 (so 0 and 2
+    share 1 and 8) and an island 9-10
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.r = [
+            Researcher.objects.create(
+                name='R%d' % i, email='r%d@example.com' % i,
+                country='Bangladesh', institution='BUET', interest='-',
+            )
+            for i in range(12)
+        ]
+        for a, b in [(i, i + 1) for i in range(7)] + [(0, 2), (0, 8), (8, 2), (9, 10)]:
+            cls.r[a].friends.add(cls.r[b])
+
+    def pks(self, *indexes):
+        return [self.r[i].pk for i in indexes]
+
+    def graph(self):
+        graph = FriendGraph()
+        with self.assertNumQueries(1):
+            graph.build()
+        return graph
+
+    def test_queries(self):
+        graph = self.graph()
+        with self.assertNumQueries(0):
+            self.assertEqual(graph.friends(self.r[0].pk), self.pks(1, 2, 8))
+            self.assertEqual(graph.within(self.r[0].pk, 2), dict(zip(self.pks(1, 2, 8, 3), [1, 1, 1, 2])))
+            self.assertEqual(graph.mutual_friends(self.r[0].pk, self.r[2].pk), self.pks(1, 8))
+            # 3 is reachable through 2 only; 1 and 8 are already friends
+            self.assertEqual(graph.suggestions(self.r[0].pk), [(self.r[3].pk, 1)])
+            self.assertEqual(graph.suggestions(self.r[1].pk), [(self.r[8].pk, 2), (self.r[3].pk, 1)])
+            self.assertEqual(graph.friends(self.r[11].pk), [])
+
+    def test_shortest_paths(self):
+        graph = self.graph()
+        self.assertEqual(graph.shortest_path(self.r[0].pk, self.r[0].pk), self.pks(0))
+        self.assertEqual(graph.shortest_path(self.r[0].pk, self.r[1].pk), self.pks(0, 1))
+        # The 0-2 shortcut beats walking the chain
+        self.assertEqual(graph.shortest_path(self.r[1].pk, self.r[7].pk), self.pks(1, 2, 3, 4, 5, 6, 7))
+        self.assertEqual(graph.separation(self.r[8].pk, self.r[7].pk), 6)
+        self.assertIsNone(graph.separation(self.r[1].pk, self.r[7].pk, max_hops=5))
+        self.assertIsNone(graph.shortest_path(self.r[0].pk, self.r[9].pk))
+        self.assertIsNone(graph.shortest_path(self.r[0].pk, self.r[11].pk))
+
+    def assertMatchesDatabase(self):
+        fresh = self.graph()
+        for researcher in Researcher.objects.all():
+            with self.subTest(researcher=researcher.name):
+                self.assertEqual(friend_graph.friends(researcher.pk), fresh.friends(researcher.pk))
+                self.assertEqual(friend_graph.within(researcher.pk, 3), fresh.within(researcher.pk, 3))
+
+    def change_friendships(self):
+        # Applied on commit; TestCase never commits, so run the callbacks
+        with self.captureOnCommitCallbacks(execute=True):
+            self.r[11].friends.add(self.r[0], self.r[9])  # a researcher new to the graph
+            self.r[3].friends.remove(self.r[2])
+            self.r[2].friends.add(self.r[3])  # back again
+            self.r[4].friends.remove(self.r[5])
+            self.r[8].friends.clear()
+            Researcher.objects.get(pk=self.r[6].pk).delete()
+
+    def test_signals_keep_the_graph_current(self):
+        friend_graph.build()
+        self.change_friendships()
+        self.assertMatchesDatabase()
+        self.assertEqual(friend_graph.shortest_path(self.r[1].pk, self.r[10].pk), self.pks(1, 0, 11, 9, 10))
+
+    def test_overlay_compaction(self):
+        friend_graph.build()
+        with mock.patch('playground.friend_graph.COMPACT_AFTER', 2):
+            self.change_friendships()
+        self.assertLessEqual(friend_graph._overlay_edges, 2)
+        self.assertMatchesDatabase()
+
+    def test_views(self):
+        friend_graph.build()
+        body = self.client.get(reverse('friend_suggestions', args=[self.r[1].pk])).json()
+        self.assertEqual(body['suggestions'][0], {'id': self.r[8].pk, 'name': 'R8', 'mutual_friends': 2})
+
+        body = self.client.get(reverse('researcher_connection', args=[self.r[8].pk, self.r[3].pk])).json()
+        self.assertEqual(body['separation'], 2)
+        self.assertEqual([step['name'] for step in body['path']], ['R8', 'R2', 'R3'])
+        self.assertEqual(body['mutual_friends'], [{'id': self.r[2].pk, 'name': 'R2'}])
+
+        body = self.client.get(reverse('researcher_connection', args=[self.r[0].pk, self.r[9].pk])).json()
+        self.assertIsNone(body['path'])
+
+
+class CollaboratorRecommendationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        ml = Field.objects.create(name='Machine Learning', domain='CS', area='AI', field_type='Applied')
+        bio = Field.objects.create(name='Biology', domain='Life', area='-', field_type='Basic')
+        subfield = Subfield.objects.create(name='Computer Vision', field=ml, domain='CS', field_type='Applied')
+
+        def researcher(name, interest, star, fields=()):
+            researcher = Researcher.objects.create(
+                name=name, email='%s@example.com' % name.lower(), country='Bangladesh',
+                institution='BUET', interest=interest, total_star=star,
+            )
+            researcher.expert_fields.add(*fields)
+            return researcher
+
+        cls.vision = researcher('Vision', 'deep learning for medical images', 4, [ml])
+        cls.optimizer = researcher('Databases', 'query optimization', 5, [ml])
+        cls.radiology = researcher('Radiology', 'medical image segmentation', 1)
+        cls.genomics = researcher('Genomics', 'genome assembly', 5, [bio])
+        cls.member = researcher('Member', 'deep learning', 5, [ml])
+        cls.work = ResearchWork.objects.create(
+            title='Deep learning for medical image analysis', author_name='-', publisher='-',
+            name='-', subfield=subfield, vacancy_status=True,
+        )
+        cls.work.researchers.add(cls.member)
+        cls.closed = ResearchWork.objects.create(
+            title='Deep learning', author_name='-', publisher='-', name='-', subfield=subfield,
+        )
+
+    def setUp(self):
+        collaborator_cache.cache.clear()
+        collaborator_index.build(collaborator_cache.generation())
+
+    @contextmanager
+    def assertScoringQueries(self, count, cache_reads=None):
+        """Queries outside the 'recommend' cache table, and optionally reads of it"""
+        with CaptureQueriesContext(connection) as captured:
+            yield
+        cache_queries = [
+            query for query in captured
+            if 'recommend_cache' in query['sql'] or query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        self.assertEqual(len(captured) - len(cache_queries), count)
+        if cache_reads is not None:
+            self.assertEqual(len(cache_queries), cache_reads)
+
+    def test_ranking_combines_field_text_and_stars(self):
+        results = recommend_collaborators(self.work.pk)
+        # Genomics matches on neither field nor text; Member is already on the work
+        self.assertEqual(
+            [result['researcher'] for result in results],
+            [self.vision.pk, self.optimizer.pk, self.radiology.pk],
+        )
+        vision, databases, radiology = results
+        self.assertEqual((vision['field'], databases['field'], radiology['field']), (1, 1, 0))
+        self.assertGreater(vision['text'], radiology['text'])
+        self.assertGreater(radiology['text'], 0)
+        self.assertEqual(databases['text'], 0)
+        self.assertEqual(databases['star'], 1)
+        self.assertEqual(recommend_collaborators(self.closed.pk), [])
+
+    def test_results_are_cached_per_work(self):
+        with self.assertScoringQueries(2):
+            first = recommend_collaborators(self.work.pk)
+        # The generation, the work's generation and the entry
+        with self.assertScoringQueries(0, cache_reads=3):
+            self.assertEqual(recommend_collaborators(self.work.pk), first)
+
+        # Joining the work drops its entry
+        self.work.researchers.add(self.vision)
+        self.assertNotIn(self.vision.pk, [r['researcher'] for r in recommend_collaborators(self.work.pk)])
+
+        # Researcher-side changes rebuild the matrices (after the throttle)
+        self.radiology.expert_fields.add(Field.objects.get(name='Machine Learning'))
+        with mock.patch('playground.recommend.MIN_REBUILD_SECONDS', 0):
+            results = recommend_collaborators(self.work.pk)
+        self.assertEqual(results[0]['researcher'], self.radiology.pk)
+
+    def test_batch_matches_single_work_scoring(self):
+        batch = recommend_all()
+        self.assertEqual(list(batch), [self.work.pk])
+        with self.assertScoringQueries(0, cache_reads=3):
+            self.assertEqual(recommend_collaborators(self.work.pk, limit=50), batch[self.work.pk])
+
+        out = StringIO()
+        call_command('recommend_collaborators', stdout=out)
+        self.assertIn('Scored 1 open works against 5 researchers', out.getvalue())
+
+    def test_researchers_created_during_a_build_are_skipped(self):
+        term_matrix = recommend.term_matrix
+
+        def create_researcher(*args, **kwargs):
+            # Between the researcher read and the expert-field read
+            late = Researcher.objects.create(
+                name='Late', email='late@example.com', country='Bangladesh',
+                institution='BUET', interest='-',
+            )
+            late.expert_fields.add(Field.objects.get(name='Machine Learning'))
+            return term_matrix(*args, **kwargs)
+
+        with mock.patch('playground.recommend.term_matrix', side_effect=create_researcher):
+            collaborator_index.build(collaborator_cache.generation())
+        self.assertEqual(collaborator_index.expertise.shape[1], len(collaborator_index.pks))
+        late = Researcher.objects.get(email='late@example.com')
+        self.assertNotIn(late.pk, [r['researcher'] for r in recommend_collaborators(self.work.pk)])
+
+    def test_view(self):
+        body = self.client.get(reverse('work_collaborators', args=[self.work.pk]), {'limit': 2}).json()
+        self.assertEqual([r['name'] for r in body['recommendations']], ['Vision', 'Databases'])
+
+
+class ReputationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = [
+            Researcher.objects.create(
+                name=name, email='%s@example.com' % name.lower(),
+                country='Bangladesh', institution='BUET', interest='-',
+            )
+            for name in ('Alice', 'Bob', 'Carol')
+        ]
+        field = Field.objects.create(name='F', domain='-', area='-', field_type='Applied')
+        subfield = Subfield.objects.create(name='S', field=field, domain='-', field_type='Applied')
+        cls.work = ResearchWork.objects.create(title='W', author_name='-', publisher='-', name='-', subfield=subfield)
+
+    def mentor(self, researcher, rating, scores, work=None):
+        punctual, consistency, hard_working = scores
+        return Mentor.objects.create(
+            researcher=researcher, research_work=work or self.work, content='-', rating=rating,
+            punctual_score=punctual, consistency=consistency, hard_working=hard_working,
+        )
+
+    def coworker(self, researcher, rating, hard_working):
+        return CoWorker.objects.create(
+            researcher=researcher, research_work=self.work, content='-', strength='-',
+            rating=rating, hard_working=hard_working,
+        )
+
+    def ratings(self, researcher):
+        researcher.refresh_from_db()
+        return researcher.total_star, researcher.peer_rating
+
+    def test_reviews_set_the_ratings(self):
+        self.assertEqual(self.ratings(self.alice), (0, 0))
+        # 60 points = 5 stars, against 3 phantom reviews of 3 stars
+        self.mentor(self.alice, 5, (10, 10, 10))
+        self.assertEqual(self.ratings(self.alice), (Decimal('3.50'), 0))
+        # 6 * 4 + 3 * 6 = 42 points = 3.5 stars
+        self.coworker(self.alice, 4, 6)
+        self.assertEqual(self.ratings(self.alice), (Decimal('3.50'), Decimal('3.50')))
+        self.assertEqual(
+            (self.alice.mentor_review_count, self.alice.mentor_review_points,
+             self.alice.peer_review_count, self.alice.peer_review_points),
+            (1, 60, 1, 42),
+        )
+
+    def test_edit_move_and_delete(self):
+        review = self.mentor(self.alice, 5, (10, 10, 10))
+        review.rating = 1
+        review.save()
+        self.assertEqual(Researcher.objects.get(pk=self.alice.pk).mentor_review_points, 36)
+
+        review.researcher = self.bob
+        review.save()
+        self.assertEqual(self.ratings(self.alice), (0, 0))
+        self.assertEqual(self.ratings(self.bob), (Decimal('3.00'), 0))
+
+        review.delete()
+        self.assertEqual(self.ratings(self.bob), (0, 0))
+
+        # Reviews deleted along with their work
+        self.coworker(self.carol, 5, 10)
+        self.work.delete()
+        self.assertEqual(self.ratings(self.carol), (0, 0))
+
+    def test_incremental_update_touches_one_row(self):
+        touched = self.bob.updated_at
+        with self.assertNumQueries(2):
+            move(Mentor, self.bob.pk, 1, 60)
+        self.assertEqual(self.ratings(self.bob), (Decimal('3.50'), 0))
+        self.assertEqual(self.ratings(self.alice), (0, 0))
+        # Reaches the change feed
+        self.assertGreater(self.bob.updated_at, touched)
+
+    def test_ranking_and_rebuild(self):
+        self.mentor(self.alice, 3, (5, 5, 5))
+        for i in range(3):
+            self.coworker(self.bob, 5, 10)
+        self.coworker(self.carol, 5, 10)
+        # More good reviews rank higher than one
+        self.assertEqual(list(Researcher.objects.values_list('name', flat=True)), ['Bob', 'Carol', 'Alice'])
+
+        expected = list(Researcher.objects.order_by('pk').values_list(
+            'total_star', 'peer_rating', 'mentor_review_points', 'peer_review_points',
+        ))
+        Researcher.objects.update(total_star=0, peer_rating=0, peer_review_count=0, peer_review_points=0)
+        out = StringIO()
+        call_command('rebuild_reputation', '--batch-size', '2', stdout=out)
+        self.assertIn('Rerated 3 researchers', out.getvalue())
+        self.assertEqual(list(Researcher.objects.order_by('pk').values_list(
+            'total_star', 'peer_rating', 'mentor_review_points', 'peer_review_points',
+        )), expected)
+
+        # Only rows whose values changed are touched
+        touched = dict(Researcher.objects.values_list('pk', 'updated_at'))
+        Researcher.objects.filter(pk=self.carol.pk).update(peer_rating=0)
+        call_command('rebuild_reputation', stdout=StringIO())
+        now_touched = dict(Researcher.objects.values_list('pk', 'updated_at'))
+        self.assertEqual(
+            [pk for pk in touched if now_touched[pk] != touched[pk]], [self.carol.pk],
+        )
+
+
+class CoauthorshipTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.a, cls.b, cls.c, cls.d, cls.e, cls.f = [
+            Researcher.objects.create(
+                name=name, email='%s@example.com' % name.lower(),
+                country='Bangladesh', institution='BUET', interest='-',
+            )
+            for name in ('Ana', 'Ben', 'Cal', 'Dev', 'Eli', 'Fay')
+        ]
+        field = Field.objects.create(name='F', domain='-', area='-', field_type='Applied')
+        subfield = Subfield.objects.create(name='S', field=field, domain='-', field_type='Applied')
+        # Ana and Ben wrote two works together, one of them with Cal; Dev
+        # and Eli one; Fay none
+        for members in ([cls.a, cls.b, cls.c], [cls.a, cls.b], [cls.d, cls.e]):
+            work = ResearchWork.objects.create(title='W', author_name='-', publisher='-', name='-', subfield=subfield)
+            work.researchers.set(members)
+
+    def columns(self):
+        return {
+            researcher.name: (
+                researcher.coauthor_count, researcher.collaboration_count,
+                researcher.network_component, researcher.network_size,
+            )
+            for researcher in Researcher.objects.all()
+        }
+
+    def test_counts_and_components(self):
+        written = coauthorship.store(coauthorship.analyze(), batch_size=4)
+        self.assertEqual(written, 6)
+        self.assertEqual(self.columns(), {
+            'Ana': (2, 3, self.a.pk, 3),
+            'Ben': (2, 3, self.a.pk, 3),
+            'Cal': (2, 2, self.a.pk, 3),
+            'Dev': (1, 1, self.d.pk, 2),
+            'Eli': (1, 1, self.d.pk, 2),
+            'Fay': (0, 0, self.f.pk, 1),
+        })
+        # Nothing changed, nothing written
+        self.assertEqual(coauthorship.store(coauthorship.analyze()), 0)
+
+    def test_pagerank(self):
+        coauthorship.store(coauthorship.analyze())
+        ranks = dict(Researcher.objects.values_list('name', 'pagerank'))
+        # Scaled so the average is 1
+        self.assertAlmostEqual(sum(ranks.values()), 6, places=4)
+        self.assertAlmostEqual(ranks['Ana'], ranks['Ben'])
+        self.assertAlmostEqual(ranks['Dev'], ranks['Eli'])
+        self.assertGreater(ranks['Ben'], ranks['Cal'])
+        self.assertGreater(ranks['Dev'], ranks['Fay'])
+        top = Researcher.objects.order_by('-pagerank', 'name')
+        self.assertEqual(list(top.values_list('name', flat=True)[:2]), ['Ana', 'Ben'])
+        self.assertEqual(sort_plan(top[:100]), 'index')
+
+    def test_researchers_missing_from_the_first_read_are_skipped(self):
+        # Joined a work after the researchers were read
+        late = Researcher.objects.create(
+            name='Gus', email='gus@example.com', country='Bangladesh', institution='BUET', interest='-',
+        )
+        ResearchWork.objects.filter(researchers=self.a).first().researchers.add(late)
+        unseen = Researcher._base_manager.exclude(pk=late.pk)
+        with mock.patch.object(Researcher.objects, 'order_by', side_effect=unseen.order_by):
+            pks, matrix = coauthorship.load_matrix()
+        self.assertNotIn(late.pk, pks.tolist())
+        self.assertEqual(matrix.shape, (6, 6))
+        self.assertEqual(matrix.nnz // 2, 4)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('analyze_coauthorship', '--batch-size', '2', stdout=out)
+        self.assertIn('6 researchers, 4 co-author pairs, 3 components (largest 3)', out.getvalue())
+        self.assertIn('updated 6 researchers', out.getvalue())
+        self.assertEqual(self.columns()['Cal'], (2, 2, self.a.pk, 3))
+
+
+class RealtimeDeliveryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice, cls.bob, cls.carol = [
+            Researcher.objects.create(
+                name=name, email='%s@example.com' % name,
+                country='Bangladesh', institution='BRAC University', interest='-',
+            )
+            for name in ('Alice', 'Bob', 'Carol')
+        ]
+        cls.conversation = Conversation.objects.create(title='Lab')
+        cls.conversation.participants.add(cls.alice, cls.bob, cls.carol)
+
+    def send(self, body='hi'):
+        # Published on commit; TestCase never commits, so run the callbacks
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(
+                body=body, sender=self.alice, receiver=self.bob, conversation=self.conversation,
+            )
+
+    async def next_chunk(self, events):
+        return await asyncio.wait_for(events.__anext__(), 5)
+
+    async def test_participant_receives_new_message(self):
+        events = message_events(self.carol.pk)
+        self.assertEqual(await self.next_chunk(events), ': connected\n\n')
+        message = await sync_to_async(self.send)('hello')
+        chunk = await self.next_chunk(events)
+        self.assertIn('id: %d\nevent: message\n' % message.pk, chunk)
+        self.assertIn('"body": "hello"', chunk)
+        await events.aclose()
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    async def test_idle_stream_sends_heartbeat(self):
+        events = message_events(self.carol.pk, heartbeat=0.01)
+        await self.next_chunk(events)
+        self.assertEqual(await self.next_chunk(events), ': ping\n\n')
+        await events.aclose()
+
+    async def test_overflow_asks_client_to_resync(self):
+        events = message_events(self.carol.pk)
+        with mock.patch('playground.realtime.SUBSCRIPTION_QUEUE_SIZE', 1):
+            await self.next_chunk(events)
+        for body in ('one', 'two', 'three'):
+            await sync_to_async(self.send)(body)
+        self.assertIn('"body": "one"', await self.next_chunk(events))
+        self.assertIn('event: resync', await self.next_chunk(events))
+        await events.aclose()
+
+    async def session_cookie(self, email, **extra):
+        user = await sync_to_async(User.objects.create_user)(email.split('@')[0], email, **extra)
+        await sync_to_async(self.client.force_login)(user)
+        return '%s=%s' % (settings.SESSION_COOKIE_NAME, self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+    def stream_scope(self, researcher_id, cookie=None):
+        return {
+            'type': 'http', 'path': '/stream/', 'query_string': b'researcher=%d' % researcher_id,
+            'headers': [(b'cookie', cookie.encode('latin-1'))] if cookie else [],
+        }
+
+    async def test_asgi_stream_until_disconnect(self):
+        disconnect = asyncio.Event()
+        sent = []
+        connected = asyncio.Event()
+
+        async def receive():
+            if not sent:
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(event):
+            sent.append(event)
+            if event.get('body', b'').startswith(b': connected'):
+                connected.set()
+
+        scope = self.stream_scope(self.bob.pk, await self.session_cookie('Bob@example.com'))
+        stream = asyncio.ensure_future(stream_application(scope, receive, send))
+        await asyncio.wait_for(connected.wait(), 5)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        self.assertEqual(get_broker().subscriber_count(), 1)
+
+        disconnect.set()
+        await asyncio.wait_for(stream, 5)
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    async def test_asgi_stream_rejects_bad_researcher(self):
+        sent = []
+
+        async def send(event):
+            sent.append(event)
+
+        await stream_application({'type': 'http', 'path': '/stream/', 'query_string': b''}, None, send)
+        self.assertEqual(sent[0]['status'], 400)
+
+    async def test_asgi_stream_needs_the_researchers_session(self):
+        async def status(scope):
+            sent = []
+
+            async def send(event):
+                sent.append(event)
+
+            await stream_application(scope, None, send)
+            return sent[0]['status']
+
+        self.assertEqual(await status(self.stream_scope(self.bob.pk)), 403)
+        cookie = await self.session_cookie('Bob@example.com')
+        self.assertEqual(await status(self.stream_scope(self.alice.pk, cookie)), 403)
+        self.assertEqual(await status(self.stream_scope(self.bob.pk, 'sessionid=forged')), 403)
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    def test_view_needs_asgi(self):
+        # WSGI would buffer the endless stream forever
+        response = self.client.get(reverse('message_stream'), {'researcher': self.alice.pk})
+        self.assertEqual(response.status_code, 501)
 
-# Create your tests here.
+    async def test_view_validation(self):
+        url = reverse('message_stream')
+        self.assertEqual((await self.async_client.get(url)).status_code, 400)
+        self.assertEqual((await self.async_client.get(url, {'researcher': self.alice.pk})).status_code, 403)
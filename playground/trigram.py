@@ -0,0 +1,134 @@
+# trigram.py
+# Typo-tolerant name matching with a stored character-trigram index
+#
+# Each Field and Researcher name is split into pg_trgm-style trigrams and
+# stored in the name_trigram table (model NameTrigram). A fuzzy lookup only
+# reads the index rows for the query's own trigrams and scores candidates
+# in SQL by Jaccard similarity:
+#     shared / (query trigrams + name trigrams - shared)
+
+from django.db import connection, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Value
+
+from .models import Field, Researcher, NameTrigram
+from .search import tokenize
+
+# Same default cut-off as PostgreSQL's pg_trgm
+SIMILARITY_THRESHOLD = 0.3
+FUZZY_LIMIT = 10
+
+# kind -> (model, name attribute)
+SOURCES = {
+    'field': (Field, 'name'),
+    'researcher': (Researcher, 'name'),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, attr) in SOURCES.items()}
+
+
+def trigrams(text):
+    """Distinct trigrams of every word, padded like pg_trgm ('  ab', 'ab ')"""
+    grams = set()
+    for word in tokenize(text):
+        padded = '  %s ' % word
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def index_rows(kind, pk, name):
+    grams = trigrams(name)
+    return [
+        NameTrigram(kind=kind, object_pk=str(pk), trigram=gram, name_trigrams=len(grams))
+        for gram in grams
+    ]
+
+
+def index_instance(instance):
+    """(Re)index one saved Field or Researcher"""
+    kind = KIND_BY_MODEL[type(instance)]
+    model, attr = SOURCES[kind]
+    with transaction.atomic():
+        NameTrigram.objects.filter(kind=kind, object_pk=str(instance.pk)).delete()
+        NameTrigram.objects.bulk_create(index_rows(kind, instance.pk, getattr(instance, attr)))
+
+
+def unindex_instance(instance):
+    kind = KIND_BY_MODEL[type(instance)]
+    NameTrigram.objects.filter(kind=kind, object_pk=str(instance.pk)).delete()
+
+
+def bulk_index(kind, names, replace=True):
+    """
+    Index many rows at once, {pk: name}, for bulk loads: plain SQL rather
+    than a model instance per trigram. With `replace`, their old rows are
+    dropped first (skip it for rows that were just inserted).
+    """
+    table = connection.ops.quote_name(NameTrigram._meta.db_table)
+    with connection.cursor() as cursor:
+        pks = [str(pk) for pk in names]
+        for start in range(0, len(pks) if replace else 0, 500):
+            batch = pks[start:start + 500]
+            cursor.execute(
+                'DELETE FROM %s WHERE kind = %%s AND object_pk IN (%s)' % (table, ', '.join(['%s'] * len(batch))),
+                [kind] + batch,
+            )
+        rows = []
+        for pk, name in names.items():
+            grams = trigrams(name)
+            rows.extend((kind, str(pk), gram, len(grams)) for gram in grams)
+        if rows:
+            cursor.executemany(
+                'INSERT INTO %s (kind, object_pk, trigram, name_trigrams) VALUES (%%s, %%s, %%s, %%s)' % table,
+                rows,
+            )
+
+
+def rebuild(kind, batch_size=1000):
+    """Rebuild one kind from scratch (after bulk loads that skip signals)"""
+    model, attr = SOURCES[kind]
+    with transaction.atomic():
+        NameTrigram.objects.filter(kind=kind).delete()
+        batch = []
+        for pk, name in model.objects.order_by().values_list('pk', attr).iterator(chunk_size=batch_size):
+            batch.extend(index_rows(kind, pk, name))
+            if len(batch) >= batch_size:
+                NameTrigram.objects.bulk_create(batch)
+                batch = []
+        NameTrigram.objects.bulk_create(batch)
+
+
+def similar(kind, query, limit=FUZZY_LIMIT, threshold=SIMILARITY_THRESHOLD):
+    """[(pk, similarity), ...] of names similar to `query`, best first"""
+    grams = trigrams(query)
+    if not grams:
+        return []
+
+    shared = Count('trigram_id')
+    rows = (
+        NameTrigram.objects
+        .filter(kind=kind, trigram__in=grams)
+        .values('object_pk')
+        .annotate(shared=shared, name_trigrams=Max('name_trigrams'))
+        .annotate(similarity=ExpressionWrapper(
+            F('shared') * 1.0 / (Value(len(grams)) + F('name_trigrams') - F('shared')),
+            output_field=FloatField(),
+        ))
+        .filter(similarity__gte=threshold)
+        .order_by('-similarity', 'object_pk')
+        .values_list('object_pk', 'similarity')[:limit]
+    )
+    model = SOURCES[kind][0]
+    to_python = model._meta.pk.to_python
+    return [(to_python(pk), similarity) for pk, similarity in rows]
+
+
+def similar_objects(kind, query, limit=FUZZY_LIMIT, threshold=SIMILARITY_THRESHOLD):
+    """Model instances for similar(), best first, each with a .similarity"""
+    scored = similar(kind, query, limit, threshold)
+    objects = SOURCES[kind][0].objects.order_by().in_bulk([pk for pk, similarity in scored])
+    results = []
+    for pk, similarity in scored:
+        obj = objects.get(pk)
+        if obj is not None:
+            obj.similarity = similarity
+            results.append(obj)
+    return results
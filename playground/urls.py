@@ -11,4 +11,17 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('search/', views.field_search, name='field_search'),
+    path('search/subfields/', views.field_subfields, name='field_subfields'),
+    path('search/suggest/', views.search_suggest, name='search_suggest'),
+    path('search/all/', views.entity_search, name='entity_search'),
+    path('researchers/<int:researcher_id>/suggested-friends/', views.friend_suggestions, name='friend_suggestions'),
+    path('researchers/<int:researcher_id>/connection/<int:other_id>/', views.researcher_connection, name='researcher_connection'),
+    path('works/<int:work_id>/collaborators/', views.work_collaborators, name='work_collaborators'),
+    path('inbox/', views.researcher_inbox, name='researcher_inbox'),
+    path('conversations/<int:conversation_id>/messages/', views.conversation_messages, name='conversation_messages'),
+    path('conversations/<int:conversation_id>/read/', views.mark_conversation_read, name='mark_conversation_read'),
+    path('inbox/unread/', views.unread_badge, name='unread_badge'),
+    path('export/<str:kind>/', views.export_data, name='export_data'),
+    path('changes/<str:kind>/', views.change_feed, name='change_feed'),
+    path('stream/', views.message_stream, name='message_stream'),
 ]
\ No newline at end of file
@@ -1,40 +1,435 @@
 # views.py
 # Add this to your playground/views.py
 
+from asgiref.sync import sync_to_async
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render
-from django.db.models import Q
-from .models import Field, Subfield
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from .cache import field_search_cache
+from .changes import CHANGES_PAGE_SIZE, FEEDS, MAX_CHANGES_PAGE_SIZE, CursorError, changes
+from .exporter import EXPORTS, export_stream, iterate_in_thread
+from .friend_graph import SUGGESTION_LIMIT, friend_graph
+from .recommend import MAX_RECOMMEND_LIMIT, RECOMMEND_LIMIT, recommend_collaborators
+from .realtime import SSE_HEADERS, message_events
+from .messaging import (
+    HISTORY_PAGE_SIZE, INBOX_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE, MAX_INBOX_PAGE_SIZE,
+    clamp_size, inbox, mark_read, may_act_as, may_read_conversation, message_history, read_receipts,
+)
+from .models import Researcher, Subfield
+from .search import (
+    ENTITY_HITS_PER_TYPE, ENTITY_TYPES_BY_KIND, MAX_ENTITY_HITS_PER_TYPE,
+    SEARCH_PAGE_SIZE, clamp_page_size, search_entities, search_fields_page,
+)
+from .suggest import MAX_SUGGEST_LIMIT, SUGGEST_LIMIT, suggestion_index
+from .trigram import SOURCES as TRIGRAM_SOURCES, similar_objects
+
+# Subfields shown per field card; the rest load through field_subfields
+SUBFIELD_PREVIEW_SIZE = 6
+SUBFIELD_PAGE_SIZE = 24
+
+
+def subfield_previews(fields, size=SUBFIELD_PREVIEW_SIZE):
+    """
+    First `size` subfields (by name) and the total subfield count of every
+    field, in ONE query: {field_name: ([subfield, ...], total)}
+    """
+    rows = (
+        Subfield.objects
+        .filter(field__in=[field.name for field in fields])
+        .annotate(
+            position=Window(RowNumber(), partition_by=[F('field_id')], order_by=F('name').asc()),
+            total=Window(Count('name'), partition_by=[F('field_id')]),
+        )
+        .filter(position__lte=size)
+        .order_by('field_id', 'name')
+    )
+    previews = {}
+    for subfield in rows:
+        previews.setdefault(subfield.field_id, ([], subfield.total))[0].append(subfield)
+    return previews
+
+
+def search_page_with_subfields(query, cursor=None, size=SEARCH_PAGE_SIZE):
+    """
+    One page of matching fields paired with a preview of their subfields:
+    ([(field, [subfield, ...], subfield_total), ...], next_cursor, fuzzy)
+
+    When nothing matches exactly, falls back to fields whose names are
+    similar (typo-tolerant trigram match) and sets `fuzzy`.
+    """
+    fields, next_cursor = search_fields_page(query, cursor, size)
+    fuzzy = False
+    if not fields and not cursor:
+        fields = similar_objects('field', query, limit=size)
+        fuzzy = bool(fields)
+    previews = subfield_previews(fields)
+    results = []
+    for field in fields:
+        subfields, total = previews.get(field.name, ([], 0))
+        results.append((field, subfields, total))
+    return results, next_cursor, fuzzy
+
 
 def field_search(request):
     """
     Search for fields and display their subfields
     """
     query = request.GET.get('q', '')  # Get search query from URL parameter
+    cursor = request.GET.get('after', '')  # Keyset cursor of the previous page
+    size = clamp_page_size(request.GET.get('size', SEARCH_PAGE_SIZE))
     fields = []
-    subfields_by_field = {}
+    results = []
+    next_cursor = None
+    fuzzy = False
     
     if query:
-        # Search for fields that match the query (case-insensitive)
-        fields = Field.objects.filter(
-            Q(name__icontains=query) | 
-            Q(domain__icontains=query) | 
-            Q(area__icontains=query)
+        # Repeated searches are served from the versioned result cache
+        results, next_cursor, fuzzy = field_search_cache.get_or_compute(
+            query,
+            lambda query: search_page_with_subfields(query, cursor, size),
+            variant='%s:%d' % (cursor, size),
         )
-        
-        # For each field found, get its subfields
-        for field in fields:
-            subfields = field.subfields.all()  # Using the related_name we defined
-            subfields_by_field[field] = subfields
+        fields = [field for field, subfields, total in results]
     
     context = {
         'query': query,
         'fields': fields,
-        'subfields_by_field': subfields_by_field,
+        'results': results,  # [(field, [subfield, ...], subfield_total), ...]
+        'cursor': cursor,
+        'next_cursor': next_cursor,
+        'size': size,
+        'fuzzy': fuzzy,  # True when showing similar names, not exact matches
     }
     
     return render(request, 'playground/field_search.html', context)
 
 
+def field_subfields(request):
+    """
+    JSON page of one field's subfields, for the "load more subfields" link.
+    ?field=<field name>&after=<last subfield name already shown>
+    """
+    field_name = request.GET.get('field', '')
+    after = request.GET.get('after', '')
+
+    subfields = Subfield.objects.filter(field_id=field_name)
+    if after:
+        subfields = subfields.filter(name__gt=after)
+    rows = list(
+        subfields.order_by('name')
+        .values('name', 'domain', 'field_type')[:SUBFIELD_PAGE_SIZE + 1]
+    )
+
+    more = len(rows) > SUBFIELD_PAGE_SIZE
+    rows = rows[:SUBFIELD_PAGE_SIZE]
+    return JsonResponse({
+        'field': field_name,
+        'subfields': rows,
+        'next': rows[-1]['name'] if more else None,
+    })
+
+
+def search_suggest(request):
+    """
+    JSON autocomplete for the search box: ?q=<prefix>&limit=<n>
+    Served from the in-memory prefix index, never from the database.
+    """
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', SUGGEST_LIMIT)), MAX_SUGGEST_LIMIT))
+    except ValueError:
+        limit = SUGGEST_LIMIT
+
+    suggestion_index.ensure_ready()  # builds if warm-up failed or the index is stale
+    return JsonResponse({
+        'query': query,
+        'suggestions': suggestion_index.lookup(query, limit),
+    })
+
+
+def entity_search(request):
+    """
+    JSON search across every entity type: ?q=<query>&type=<kind>&limit=<n>
+    Hits from all types are merged best first; `facets` holds the total
+    number of matches per type. Repeat `type` to narrow to some types.
+    Fields and researchers with no exact match fall back to similar names
+    (marked "fuzzy": true; they are not counted in the facets).
+    """
+    query = request.GET.get('q', '')
+    kinds = [kind for kind in request.GET.getlist('type') if kind in ENTITY_TYPES_BY_KIND] or None
+    try:
+        per_type = max(1, min(int(request.GET.get('limit', ENTITY_HITS_PER_TYPE)), MAX_ENTITY_HITS_PER_TYPE))
+    except ValueError:
+        per_type = ENTITY_HITS_PER_TYPE
+
+    results = search_entities(query, kinds, per_type)
+    hits = [
+        {'kind': hit['kind'], 'pk': hit['pk'], 'label': hit['label'],
+         'score': hit['score'], 'fuzzy': False}
+        for hit in results['hits']
+    ]
+    for kind in TRIGRAM_SOURCES:
+        if (kinds is None or kind in kinds) and kind not in results['facets']:
+            label = ENTITY_TYPES_BY_KIND[kind].label
+            hits.extend(
+                {'kind': kind, 'pk': obj.pk, 'label': getattr(obj, label),
+                 'score': obj.similarity, 'fuzzy': True}
+                for obj in similar_objects(kind, query, limit=per_type)
+            )
+
+    return JsonResponse({
+        'query': query,
+        'facets': results['facets'],
+        'hits': hits,
+    })
+
+
+def forbidden():
+    return JsonResponse({'error': 'not allowed'}, status=403)
+
+
+def researcher_inbox(request):
+    """
+    JSON inbox: ?researcher=<id>&cursor=<next from previous page>&limit=<n>
+    The researcher's conversations, most recently active first, each with
+    its last message and how many messages the researcher hasn't read.
+    Only for that researcher's own user (same email) or staff.
+    """
+    try:
+        researcher_id = int(request.GET.get('researcher', ''))
+    except ValueError:
+        return JsonResponse({'error': 'researcher must be an id'}, status=400)
+    if not may_act_as(request.user, researcher_id):
+        return forbidden()
+    size = clamp_size(request.GET.get('limit'), INBOX_PAGE_SIZE, MAX_INBOX_PAGE_SIZE)
+
+    conversations, next_cursor = inbox(researcher_id, request.GET.get('cursor'), size)
+    return JsonResponse({
+        'researcher': researcher_id,
+        'conversations': [
+            {
+                'id': conversation.pk,
+                'title': conversation.title,
+                'last_activity_at': conversation.last_activity_at,
+                'message_count': conversation.message_count,
+                'unread': conversation.unread,
+                'last_message': conversation.last_message and {
+                    'id': conversation.last_message.pk,
+                    'sender': conversation.last_message.sender.name,
+                    'body': conversation.last_message.body,
+                    'time_date': conversation.last_message.time_date,
+                },
+            }
+            for conversation in conversations
+        ],
+        'next': next_cursor,
+    })
+
+
+def researcher_names(pks):
+    """{pk: name} in one query"""
+    return dict(Researcher.objects.filter(pk__in=pks).values_list('pk', 'name'))
+
+
+def friend_suggestions(request, researcher_id):
+    """
+    JSON "people you may know": friends of friends who aren't friends yet,
+    most mutual friends first (?limit=<n>)
+    """
+    size = clamp_size(request.GET.get('limit'), SUGGESTION_LIMIT, 100)
+    suggestions = friend_graph.suggestions(researcher_id, size)
+    names = researcher_names([pk for pk, mutual in suggestions])
+    return JsonResponse({
+        'researcher': researcher_id,
+        'suggestions': [
+            {'id': pk, 'name': names.get(pk), 'mutual_friends': mutual}
+            for pk, mutual in suggestions
+        ],
+    })
+
+
+def researcher_connection(request, researcher_id, other_id):
+    """
+    JSON "how am I connected to X": a shortest chain of friends between two
+    researchers (null when more than six apart) and their mutual friends
+    """
+    path = friend_graph.shortest_path(researcher_id, other_id)
+    mutual = friend_graph.mutual_friends(researcher_id, other_id)
+    names = researcher_names(set(path or ()) | set(mutual))
+    return JsonResponse({
+        'researcher': researcher_id,
+        'other': other_id,
+        'separation': None if path is None else len(path) - 1,
+        'path': path and [{'id': pk, 'name': names.get(pk)} for pk in path],
+        'mutual_friends': [{'id': pk, 'name': names.get(pk)} for pk in mutual],
+    })
+
+
+def work_collaborators(request, work_id):
+    """
+    JSON collaborator recommendations for a work open for collaboration
+    (?limit=<n>), best first, with the score of each signal. Empty when
+    the work isn't open.
+    """
+    size = clamp_size(request.GET.get('limit'), RECOMMEND_LIMIT, MAX_RECOMMEND_LIMIT)
+    recommendations = recommend_collaborators(work_id, size)
+    names = researcher_names([recommendation['researcher'] for recommendation in recommendations])
+    return JsonResponse({
+        'work': work_id,
+        'recommendations': [
+            dict(recommendation, name=names.get(recommendation['researcher']))
+            for recommendation in recommendations
+        ],
+    })
+
+
+def conversation_messages(request, conversation_id):
+    """
+    JSON page of a conversation's messages, oldest first:
+    ?before=<older cursor> scrolls back, ?after=<newer cursor> forward,
+    neither gives the newest page. &limit=<n> sets the page size.
+    `read_receipts` maps each participant to the newest message they've read.
+    Only for the participants' own users and staff.
+    """
+    if not may_read_conversation(request.user, conversation_id):
+        return forbidden()
+    size = clamp_size(request.GET.get('limit'), HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE)
+    messages, older, newer = message_history(
+        conversation_id, request.GET.get('before'), request.GET.get('after'), size,
+    )
+    return JsonResponse({
+        'conversation': conversation_id,
+        'messages': [
+            {
+                'id': message.pk,
+                'sender': message.sender.name,
+                'receiver_id': message.receiver_id,
+                'body': message.body,
+                'time_date': message.time_date,
+            }
+            for message in messages
+        ],
+        'older': older,
+        'newer': newer,
+        'read_receipts': read_receipts(conversation_id),
+    })
+
+
+@require_POST
+def mark_conversation_read(request, conversation_id):
+    """
+    POST researcher=<id>: mark the conversation read up to its last message.
+    `marked` is how many messages were unread. Only for the researcher's
+    own user and staff.
+    """
+    try:
+        researcher_id = int(request.POST.get('researcher', ''))
+    except ValueError:
+        return JsonResponse({'error': 'researcher must be an id'}, status=400)
+    if not may_act_as(request.user, researcher_id):
+        return forbidden()
+    return JsonResponse({
+        'conversation': conversation_id,
+        'researcher': researcher_id,
+        'marked': mark_read(researcher_id, conversation_id),
+    })
+
+
+def unread_badge(request):
+    """
+    JSON unread total for the message badge: ?researcher=<id>
+    One primary-key lookup of the maintained counter. Only for the
+    researcher's own user and staff.
+    """
+    try:
+        researcher_id = int(request.GET.get('researcher', ''))
+    except ValueError:
+        return JsonResponse({'error': 'researcher must be an id'}, status=400)
+    if not may_act_as(request.user, researcher_id):
+        return forbidden()
+    unread = Researcher.objects.filter(pk=researcher_id).values_list('unread_count', flat=True).first()
+    if unread is None:
+        return JsonResponse({'error': 'no such researcher'}, status=404)
+    return JsonResponse({'researcher': researcher_id, 'unread': unread})
+
+
+async def message_stream(request):
+    """
+    Server-Sent Events stream of new messages: ?researcher=<id>
+    Every message in a conversation the researcher takes part in arrives as
+    a "message" event; only for the researcher's own user and staff. Needs
+    ASGI: storefront/asgi.py answers /stream/ with
+    realtime.stream_application before Django, and this view covers
+    Django's ASGI handler mounted on its own. Under WSGI the never-ending
+    stream would be read to the end before a byte is sent, so it's a 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'the message stream needs an ASGI server'}, status=501)
+    try:
+        researcher_id = int(request.GET.get('researcher', ''))
+    except ValueError:
+        return JsonResponse({'error': 'researcher must be an id'}, status=400)
+    if not await sync_to_async(may_act_as)(await request.auser(), researcher_id):
+        return forbidden()
+
+    return StreamingHttpResponse(message_events(researcher_id), headers=SSE_HEADERS)
+
+
+@staff_member_required
+def export_data(request, kind):
+    """
+    Streamed download of one table: /export/<kind>/?format=csv|jsonl
+    &since=<ISO datetime> for rows changed since then, &gzip=1 to compress.
+    """
+    if kind not in EXPORTS:
+        raise Http404('No export named %r' % kind)
+    format = request.GET.get('format', 'csv')
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return JsonResponse({'error': 'since must be an ISO datetime'}, status=400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    compress = request.GET.get('gzip') in ('1', 'true')
+    try:
+        stream = export_stream(kind, format, since or None, compress)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if isinstance(request, ASGIRequest):
+        stream = iterate_in_thread(stream)
+    filename = '%s.%s%s' % (kind, format, '.gz' if compress else '')
+    content_type = 'text/csv; charset=utf-8' if format == 'csv' else 'application/x-ndjson'
+    return StreamingHttpResponse(stream, headers={
+        'Content-Type': 'application/gzip' if compress else content_type,
+        'Content-Disposition': 'attachment; filename="%s"' % filename,
+    })
+
+
+@staff_member_required
+def change_feed(request, kind):
+    """
+    JSON page of one table's change feed: /changes/<kind>/?cursor=<cursor>
+    &limit=<n>. Apply `events` in order, keep `cursor` for the next call;
+    `more` means another page is ready now.
+    """
+    if kind not in FEEDS:
+        raise Http404('No change feed named %r' % kind)
+    size = clamp_size(request.GET.get('limit'), CHANGES_PAGE_SIZE, MAX_CHANGES_PAGE_SIZE)
+    try:
+        events, cursor, more = changes(kind, request.GET.get('cursor'), size)
+    except CursorError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'kind': kind, 'events': events, 'cursor': cursor, 'more': more})
+
+
 def home(request):
     """
     Home page with search box
@@ -3,6 +3,11 @@ ASGI config for storefront project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the site through this entry point (uvicorn / daphne): /stream/, the
+Server-Sent Events endpoint, is answered here without going through
+Django's handler (it checks the session cookie itself), so an idle client
+holds no thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -13,4 +18,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storefront.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from playground.realtime import stream_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/stream/':
+        await stream_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
+
+# Build the in-memory autocomplete index once per worker, before traffic
+from playground.suggest import suggestion_index  # noqa: E402
+
+suggestion_index.warm()
@@ -89,6 +89,46 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+#
+# 'search' holds field_search results (see playground/cache.py) and the
+# autocomplete index generation (playground/suggest.py). Swap the backend
+# for 'django.core.cache.backends.filebased.FileBasedCache' with a
+# directory LOCATION to share both between worker processes; otherwise
+# other workers only pick up autocomplete changes after SUGGEST_TTL.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'field-search',
+        'TIMEOUT': 300,  # seconds an entry may live (TTL)
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,  # size bound before the oldest entries are culled
+        },
+    },
+    # Collaborator recommendations, one entry per open research work. In
+    # the database so every worker (and `manage.py recommend_collaborators`)
+    # shares them; create the table once with `manage.py createcachetable`.
+    'recommend': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'recommend_cache',
+        'TIMEOUT': 3600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    },
+}
+
+SEARCH_CACHE_ALIAS = 'search'
+
+# Pub/sub behind the /stream/ endpoint (playground/realtime.py). The
+# in-process broker only reaches clients connected to the same worker.
+REALTIME_BROKER = 'playground.realtime.InProcessBroker'
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
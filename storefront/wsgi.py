@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storefront.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory autocomplete index once per worker, before traffic
+from playground.suggest import suggestion_index  # noqa: E402
+
+suggestion_index.warm()